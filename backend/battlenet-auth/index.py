@@ -11,7 +11,7 @@ import base64
 from typing import Dict, Any, Optional
 from urllib.parse import urlencode
 import urllib.request
-import psycopg2
+import db
 from psycopg2.extras import RealDictCursor
 
 BATTLENET_AUTH_URL = 'https://oauth.battle.net/authorize'
@@ -23,7 +23,7 @@ def get_user_by_steam_id(steam_id: str) -> Optional[Dict[str, Any]]:
     if not db_url:
         return None
     
-    conn = psycopg2.connect(db_url)
+    conn = db.connect(db_url)
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
@@ -43,7 +43,7 @@ def get_user_by_battlenet_id(battlenet_id: str) -> Optional[Dict[str, Any]]:
     if not db_url:
         return None
     
-    conn = psycopg2.connect(db_url)
+    conn = db.connect(db_url)
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
@@ -63,7 +63,7 @@ def register_or_update_battlenet_user(battlenet_id: str, battletag: str) -> Dict
     if not db_url:
         raise Exception('DATABASE_URL not configured')
     
-    conn = psycopg2.connect(db_url)
+    conn = db.connect(db_url)
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
@@ -95,7 +95,7 @@ def link_battlenet_to_steam(steam_id: str, battlenet_id: str, battletag: str) ->
     if not db_url:
         return False
     
-    conn = psycopg2.connect(db_url)
+    conn = db.connect(db_url)
     cursor = conn.cursor()
     
     try:
@@ -126,7 +126,7 @@ def link_steam_to_battlenet(battlenet_id: str, steam_id: str, persona_name: str,
     if not db_url:
         return False
     
-    conn = psycopg2.connect(db_url)
+    conn = db.connect(db_url)
     cursor = conn.cursor()
     
     try:
@@ -0,0 +1,76 @@
+'''
+Business: Move hidden and old chat messages from chat_messages into chat_messages_archive in bulk batches
+Args: CHAT_ARCHIVE_KEEP - newest messages never moved; CHAT_ARCHIVE_AFTER_DAYS - age at which visible ones move;
+      CHAT_ARCHIVE_BATCH - rows moved per statement
+Returns: archive_messages(conn) -> how many rows were moved, in how many batches, and whether it caught up
+'''
+
+import os
+import time
+from typing import Dict, Any
+
+ARCHIVE_KEEP = int(os.environ.get('CHAT_ARCHIVE_KEEP', '1000'))
+ARCHIVE_AFTER_DAYS = float(os.environ.get('CHAT_ARCHIVE_AFTER_DAYS', '7'))
+ARCHIVE_BATCH = int(os.environ.get('CHAT_ARCHIVE_BATCH', '5000'))
+
+# One batch: pick hidden rows by (is_hidden, id) and old ones by created_at, both below the
+# newest ARCHIVE_KEEP ids, then delete and insert them in the same statement and transaction.
+MOVE_BATCH = '''
+    WITH boundary AS (
+        SELECT id FROM t_p15345778_news_shop_project.chat_messages
+        ORDER BY id DESC
+        OFFSET %(keep)s
+        LIMIT 1
+    ), batch AS (
+        (SELECT id FROM t_p15345778_news_shop_project.chat_messages
+         WHERE is_hidden = TRUE AND id <= (SELECT id FROM boundary)
+         ORDER BY id
+         LIMIT %(batch)s)
+        UNION
+        (SELECT id FROM t_p15345778_news_shop_project.chat_messages
+         WHERE created_at < NOW() - %(after_days)s * INTERVAL '1 day' AND id <= (SELECT id FROM boundary)
+         ORDER BY created_at
+         LIMIT %(batch)s)
+    ), moved AS (
+        DELETE FROM t_p15345778_news_shop_project.chat_messages
+        WHERE id IN (SELECT id FROM batch)
+        RETURNING id, steam_id, persona_name, avatar_url, message, created_at,
+                  is_hidden, reply_to_message_id, hidden_seq
+    ), archived AS (
+        INSERT INTO t_p15345778_news_shop_project.chat_messages_archive
+        (id, steam_id, persona_name, avatar_url, message, created_at, is_hidden, reply_to_message_id, hidden_seq)
+        SELECT id, steam_id, persona_name, avatar_url, message, created_at, is_hidden, reply_to_message_id, hidden_seq
+        FROM moved
+        RETURNING is_hidden
+    )
+    SELECT COUNT(*), COUNT(*) FILTER (WHERE is_hidden) FROM archived
+'''
+
+
+def archive_messages(conn, keep: int = ARCHIVE_KEEP, after_days: float = ARCHIVE_AFTER_DAYS,
+                     batch: int = ARCHIVE_BATCH, time_budget: float = 20.0) -> Dict[str, Any]:
+    '''
+    Move batches until nothing is left to move or time_budget seconds are spent (0: no limit).
+    Each batch commits on its own, so an interrupted run keeps what it moved and locks are short.
+    '''
+    started = time.monotonic()
+    result = {'moved': 0, 'hidden': 0, 'batches': 0, 'done': False}
+
+    with conn.cursor() as cur:
+        while True:
+            cur.execute(MOVE_BATCH, {'keep': keep, 'after_days': after_days, 'batch': batch})
+            moved, hidden = cur.fetchone()
+            conn.commit()
+
+            result['moved'] += moved
+            result['hidden'] += hidden
+            result['batches'] += 1
+
+            if moved == 0:
+                result['done'] = True
+                break
+            if time_budget and time.monotonic() - started >= time_budget:
+                break
+
+    result['seconds'] = round(time.monotonic() - started, 2)
+    return result
@@ -0,0 +1,145 @@
+'''
+Business: Ring buffer of the latest visible chat messages kept in a warm function instance
+Args: CHAT_CACHE_SIZE - messages kept; CHAT_CACHE_TTL - seconds a snapshot is trusted before it is revalidated
+Returns: RecentMessages serving the last-N window and since_id deltas from memory, with hit/miss counters
+'''
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+CACHE_SIZE = int(os.environ.get('CHAT_CACHE_SIZE', '200'))
+# Other instances post and hide too; after this long the snapshot is checked against the database again
+CACHE_TTL = float(os.environ.get('CHAT_CACHE_TTL', '2'))
+
+# (max message id including hidden ones, chat_settings.hidden_seq, chat_settings.is_frozen)
+State = Tuple[int, int, bool]
+
+OUTCOMES = {'hit': 'hits', 'revalidated': 'revalidations', 'extended': 'extensions', 'miss': 'misses'}
+
+
+class RecentMessages:
+    '''
+    The newest visible messages in id order, as message_from_row() dicts with reply previews
+    resolved. Appends are only accepted when the new id directly follows the highest id seen;
+    anything else (another instance posted, a hide, a freeze) drops it and the next read reloads.
+
+    Revalidation and extension only look at ids above the snapshot's highest id. That is complete
+    because post_message draws ids under the chat_settings row lock, so a message is committed
+    before any higher id is; without that lock a late commit below the snapshot would be missed
+    until the next reload (tools/chatordertest.py checks it).
+    '''
+
+    def __init__(self, size: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.messages: deque = deque(maxlen=size)
+        self.state: Optional[State] = None
+        self.complete = False
+        self.checked_at = 0.0
+        self.stats = {'hits': 0, 'revalidations': 0, 'extensions': 0, 'misses': 0, 'appends': 0, 'invalidations': 0}
+
+    def current(self) -> Optional[State]:
+        '''The cached state if it is recent enough to serve without asking the database.'''
+        with self.lock:
+            if self.state is not None and time.monotonic() - self.checked_at < self.ttl:
+                return self.state
+        return None
+
+    def revalidate(self, state: State) -> bool:
+        '''Keep serving the snapshot if the database state has not moved since it was taken.'''
+        with self.lock:
+            if self.state != state:
+                return False
+            self.checked_at = time.monotonic()
+            return True
+
+    def extendable_from(self, state: State) -> Optional[int]:
+        '''The cached highest id when only new messages arrived since the snapshot, so fetching past it is enough.'''
+        with self.lock:
+            if self.state is None or self.state[1:] != state[1:] or self.state[0] >= state[0]:
+                return None
+            return self.state[0]
+
+    def extend(self, after_id: int, state: State, messages: List[Dict[str, Any]]) -> None:
+        '''
+        Append messages fetched with id > after_id; ones appended by a concurrent post meanwhile are skipped.
+        Nothing at or below after_id can still show up, since ids commit in id order (see post_message).
+        '''
+        with self.lock:
+            if self.state is None or self.state[0] < after_id or self.state[1:] != state[1:]:
+                self.drop()
+                return
+            added = [message for message in messages if message['id'] > self.state[0]]
+            if len(self.messages) + len(added) > self.size:
+                self.complete = False
+            self.messages.extend(added)
+            self.state = (max(self.state[0], state[0]),) + state[1:]
+            self.checked_at = time.monotonic()
+
+    def load(self, state: State, messages: List[Dict[str, Any]]) -> None:
+        with self.lock:
+            # A slower concurrent reload must not replace a newer snapshot
+            if self.state is not None and state[0] < self.state[0]:
+                return
+            self.messages = deque(messages[-self.size:], maxlen=self.size)
+            self.complete = len(messages) < self.size
+            self.state = state
+            self.checked_at = time.monotonic()
+
+    def append(self, message: Dict[str, Any]) -> None:
+        with self.lock:
+            if self.state is None:
+                return
+            high_id, hidden_seq, is_frozen = self.state
+            if message['id'] <= high_id:
+                # A reload that ran after the insert committed already has it
+                return
+            if message['id'] != high_id + 1:
+                self.drop()
+                return
+            if len(self.messages) == self.size:
+                self.complete = False
+            self.messages.append(message)
+            self.state = (message['id'], hidden_seq, is_frozen)
+            self.stats['appends'] += 1
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.drop()
+
+    def drop(self) -> None:
+        if self.state is not None:
+            self.stats['invalidations'] += 1
+        self.state = None
+        self.messages.clear()
+
+    def window(self, limit: int) -> Optional[List[Dict[str, Any]]]:
+        '''The latest `limit` messages, or None when the buffer does not hold that many.'''
+        with self.lock:
+            if self.state is None or (limit > len(self.messages) and not self.complete):
+                return None
+            return list(self.messages)[-limit:] if limit > 0 else []
+
+    def since(self, since_id: int, limit: int) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+        '''Messages newer than since_id and whether more follow, or None when older ones were evicted.'''
+        with self.lock:
+            if self.state is None:
+                return None
+            if not self.complete and (not self.messages or since_id < self.messages[0]['id'] - 1):
+                return None
+            newer = [message for message in self.messages if message['id'] > since_id]
+            return newer[:limit], len(newer) > limit
+
+    def count(self, outcome: str) -> None:
+        '''Record how a read was served: hit, revalidated, extended or miss.'''
+        with self.lock:
+            self.stats[OUTCOMES[outcome]] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return dict(self.stats, size=len(self.messages), capacity=self.size, ttl=self.ttl,
+                        cached=self.state is not None)
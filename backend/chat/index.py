@@ -6,14 +6,19 @@ Returns: HTTP response with chat messages or operation confirmation
 
 import json
 import os
-import psycopg2
+from datetime import datetime
+import db
+import roles
+from archive import archive_messages
+from cache import RecentMessages, State
+from ratelimit import RateLimiter, retry_after_header
 from typing import Dict, Any
 
 def get_db_connection():
     dsn = os.environ.get('DATABASE_URL')
     if not dsn:
         raise ValueError('DATABASE_URL environment variable is not set')
-    return psycopg2.connect(dsn)
+    return db.connect(dsn)
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
@@ -30,8 +35,14 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'body': ''
         }
     
-    if method == 'GET':
+    params = event.get('queryStringParameters') or {}
+    
+    if method == 'GET' and params.get('archive') == 'true':
+        return get_history(event)
+    elif method == 'GET':
         return get_messages(event)
+    elif method == 'POST' and params.get('action') == 'archive':
+        return run_archive(event)
     elif method == 'POST':
         return post_message(event)
     elif method == 'DELETE':
@@ -48,98 +59,315 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         'body': json.dumps({'error': 'Method not allowed'})
     }
 
-def get_messages(event: Dict[str, Any]) -> Dict[str, Any]:
-    params = event.get('queryStringParameters') or {}
-    limit = int(params.get('limit', '50'))
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute('SELECT is_frozen FROM t_p15345778_news_shop_project.chat_settings LIMIT 1')
-    is_frozen_row = cur.fetchone()
-    is_frozen = is_frozen_row[0] if is_frozen_row else False
+MESSAGE_COLUMNS = '''
+    cm.id, cm.steam_id, COALESCE(u.nickname, cm.persona_name) as persona_name, cm.avatar_url, cm.message, 
+    to_char(cm.created_at, 'YYYY-MM-DD"T"HH24:MI:SS"+00:00"') as created_at,
+    cm.reply_to_message_id,
+    COALESCE(u.is_admin, false) as is_admin,
+    COALESCE(u.is_moderator, false) as is_moderator,
+    COALESCE(rm.id, ra.id) as reply_id,
+    COALESCE(ru.nickname, rm.persona_name, ra.persona_name) as reply_persona_name,
+    COALESCE(rm.message, ra.message) as reply_message
+'''
+
+# Reply previews come from a self-join, so a page of messages is one statement whatever its size.
+# A reply to a message that was archived since takes the preview from the archive.
+MESSAGE_JOINS = '''
+    LEFT JOIN t_p15345778_news_shop_project.users u ON cm.steam_id = u.steam_id
+    LEFT JOIN t_p15345778_news_shop_project.chat_messages rm ON rm.id = cm.reply_to_message_id
+    LEFT JOIN t_p15345778_news_shop_project.chat_messages_archive ra
+        ON ra.id = cm.reply_to_message_id AND rm.id IS NULL
+    LEFT JOIN t_p15345778_news_shop_project.users ru ON ru.steam_id = COALESCE(rm.steam_id, ra.steam_id)
+'''
+
+MAX_WINDOW_SIZE = 200
+MAX_DELTA_SIZE = 200
+MAX_HISTORY_PAGE = 200
+
+# Latest messages of this warm instance, see cache.py
+recent = RecentMessages()
+
+# Posts per second (and burst) for one steam_id and for the whole chat of one instance
+CHAT_RATE_PER_USER = float(os.environ.get('CHAT_RATE_PER_USER', '1'))
+CHAT_BURST_PER_USER = float(os.environ.get('CHAT_BURST_PER_USER', '5'))
+CHAT_RATE_GLOBAL = float(os.environ.get('CHAT_RATE_GLOBAL', '50'))
+CHAT_BURST_GLOBAL = float(os.environ.get('CHAT_BURST_GLOBAL', '100'))
+
+limiter = RateLimiter(CHAT_RATE_PER_USER, CHAT_BURST_PER_USER, CHAT_RATE_GLOBAL, CHAT_BURST_GLOBAL)
+
+def message_from_row(row) -> Dict[str, Any]:
+    reply_to = None
+    if row[9]:
+        reply_to = {
+            'id': row[9],
+            'personaName': row[10],
+            'message': row[11]
+        }
     
+    return {
+        'id': row[0],
+        'steamId': row[1],
+        'personaName': row[2],
+        'avatarUrl': row[3],
+        'message': row[4],
+        'createdAt': row[5],
+        'replyTo': reply_to,
+        'isAdmin': row[7],
+        'isModerator': row[8]
+    }
+
+def load_state(cur) -> State:
     cur.execute('''
-        SELECT cm.id, cm.steam_id, COALESCE(u.nickname, cm.persona_name) as persona_name, cm.avatar_url, cm.message, 
-               to_char(cm.created_at, 'YYYY-MM-DD"T"HH24:MI:SS"+00:00"') as created_at,
-               cm.reply_to_message_id,
-               COALESCE(u.is_admin, false) as is_admin,
-               COALESCE(u.is_moderator, false) as is_moderator
-        FROM t_p15345778_news_shop_project.chat_messages cm
-        LEFT JOIN t_p15345778_news_shop_project.users u ON cm.steam_id = u.steam_id
-        WHERE cm.is_hidden = FALSE
-        ORDER BY cm.created_at DESC
-        LIMIT %s
-    ''', (limit,))
+        SELECT s.is_frozen, s.hidden_seq, (SELECT MAX(id) FROM t_p15345778_news_shop_project.chat_messages)
+        FROM t_p15345778_news_shop_project.chat_settings s
+        LIMIT 1
+    ''')
+    row = cur.fetchone()
+    if not row:
+        return (0, 0, False)
+    return (row[2] or 0, row[1], row[0])
+
+def get_messages(event: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Without since_id: the latest `limit` messages. With since_id (and hidden_since from the
+    previous response's hiddenSeq): only messages newer than since_id plus ids hidden since,
+    so an idle poll is a settings read and an empty index range scan.
+    
+    Both are answered from the instance's RecentMessages buffer when it can: with no query
+    while the snapshot is younger than CHAT_CACHE_TTL, with one state read after that, and
+    with a reload when the state moved. fresh=true skips the TTL (the chat stream uses it).
+    '''
+    params = event.get('queryStringParameters') or {}
     
-    rows = cur.fetchall()
+    if params.get('cache_stats') == 'true':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'isBase64Encoded': False,
+            'body': json.dumps(recent.as_dict())
+        }
     
-    messages = []
-    for row in rows:
-        reply_to = None
-        if row[6]:
-            cur.execute('''
-                SELECT cm.id, COALESCE(u.nickname, cm.persona_name) as persona_name, cm.message
+    # Checked before a connection is borrowed, so a bad query string costs nothing
+    try:
+        limit = int(params.get('limit', '50'))
+        since_id = int(params['since_id']) if params.get('since_id') is not None else None
+        hidden_since = int(params.get('hidden_since') or 0)
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'limit, since_id and hidden_since must be numbers'})
+        }
+    limit = max(1, min(limit, MAX_WINDOW_SIZE if since_id is None else MAX_DELTA_SIZE))
+    
+    conn = None
+    cur = None
+    outcome = 'hit'
+    state = None if params.get('fresh') == 'true' else recent.current()
+    
+    if state is None:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        state = load_state(cur)
+        outcome = 'revalidated'
+        
+        revalidated = recent.revalidate(state)
+        after_id = None if revalidated else recent.extendable_from(state)
+        
+        if after_id is not None:
+            # Only messages posted since the snapshot (e.g. by another instance) need fetching
+            outcome = 'extended'
+            cur.execute(f'''
+                SELECT {MESSAGE_COLUMNS}
                 FROM t_p15345778_news_shop_project.chat_messages cm
-                LEFT JOIN t_p15345778_news_shop_project.users u ON cm.steam_id = u.steam_id
-                WHERE cm.id = %s
-            ''', (row[6],))
-            reply_row = cur.fetchone()
-            if reply_row:
-                reply_to = {
-                    'id': reply_row[0],
-                    'personaName': reply_row[1],
-                    'message': reply_row[2]
-                }
+                {MESSAGE_JOINS}
+                WHERE cm.is_hidden = FALSE AND cm.id > %s AND cm.id <= %s
+                ORDER BY cm.id DESC
+                LIMIT %s
+            ''', (after_id, state[0], recent.size))
+            added = [message_from_row(row) for row in cur.fetchall()]
+            added.reverse()
+            recent.extend(after_id, state, added)
+        elif not revalidated:
+            outcome = 'miss'
+            cur.execute(f'''
+                SELECT {MESSAGE_COLUMNS}
+                FROM t_p15345778_news_shop_project.chat_messages cm
+                {MESSAGE_JOINS}
+                WHERE cm.is_hidden = FALSE
+                ORDER BY cm.id DESC
+                LIMIT %s
+            ''', (recent.size,))
+            window = [message_from_row(row) for row in cur.fetchall()]
+            window.reverse()
+            recent.load(state, window)
+    
+    _, hidden_seq, is_frozen = state
+    
+    if since_id is None:
+        messages = recent.window(limit)
         
-        messages.append({
-            'id': row[0],
-            'steamId': row[1],
-            'personaName': row[2],
-            'avatarUrl': row[3],
-            'message': row[4],
-            'createdAt': row[5],
-            'replyTo': reply_to,
-            'isAdmin': row[7],
-            'isModerator': row[8]
-        })
-    
-    messages.reverse()
+        if messages is None:
+            outcome = 'miss'
+            if conn is None:
+                conn = get_db_connection()
+                cur = conn.cursor()
+            cur.execute(f'''
+                SELECT {MESSAGE_COLUMNS}
+                FROM t_p15345778_news_shop_project.chat_messages cm
+                {MESSAGE_JOINS}
+                WHERE cm.is_hidden = FALSE
+                ORDER BY cm.id DESC
+                LIMIT %s
+            ''', (limit,))
+            
+            messages = [message_from_row(row) for row in cur.fetchall()]
+            messages.reverse()
+        
+        if conn is not None:
+            cur.close()
+            conn.close()
+        recent.count(outcome)
+        
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*',
+                'X-Chat-Cache': outcome
+            },
+            'isBase64Encoded': False,
+            'body': json.dumps({
+                'messages': messages,
+                'isFrozen': is_frozen,
+                'lastId': max([message['id'] for message in messages], default=0),
+                'hiddenSeq': hidden_seq
+            })
+        }
     
-    cur.close()
-    conn.close()
+    cached = recent.since(since_id, limit)
+    if cached is not None:
+        messages, has_more = cached
+    else:
+        outcome = 'miss'
+        if conn is None:
+            conn = get_db_connection()
+            cur = conn.cursor()
+        cur.execute(f'''
+            SELECT {MESSAGE_COLUMNS}
+            FROM t_p15345778_news_shop_project.chat_messages cm
+            {MESSAGE_JOINS}
+            WHERE cm.is_hidden = FALSE AND cm.id > %s
+            ORDER BY cm.id
+            LIMIT %s
+        ''', (since_id, limit + 1))
+        
+        rows = cur.fetchall()
+        messages = [message_from_row(row) for row in rows[:limit]]
+        has_more = len(rows) > limit
+    
+    # Hides bump chat_settings.hidden_seq, so the hidden ids are only looked up when something changed.
+    # A message hidden after the client's cursor may have been archived since, so both tables are asked.
+    hidden_ids = []
+    if hidden_seq > hidden_since:
+        if conn is None:
+            conn = get_db_connection()
+            cur = conn.cursor()
+        cur.execute('''
+            SELECT id FROM t_p15345778_news_shop_project.chat_messages
+            WHERE hidden_seq > %s AND id <= %s
+            UNION ALL
+            SELECT id FROM t_p15345778_news_shop_project.chat_messages_archive
+            WHERE hidden_seq > %s AND id <= %s
+        ''', (hidden_since, since_id, hidden_since, since_id))
+        hidden_ids = [row[0] for row in cur.fetchall()]
+    
+    if conn is not None:
+        cur.close()
+        conn.close()
+    recent.count(outcome)
     
     return {
         'statusCode': 200,
         'headers': {
             'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*'
+            'Access-Control-Allow-Origin': '*',
+            'X-Chat-Cache': outcome
         },
         'isBase64Encoded': False,
-        'body': json.dumps({'messages': messages, 'isFrozen': is_frozen})
+        'body': json.dumps({
+            'messages': messages,
+            'hiddenIds': hidden_ids,
+            'isFrozen': is_frozen,
+            'lastId': messages[-1]['id'] if messages else since_id,
+            'hiddenSeq': hidden_seq,
+            'hasMore': has_more
+        })
     }
 
-def post_message(event: Dict[str, Any]) -> Dict[str, Any]:
-    body_data = json.loads(event.get('body', '{}'))
+def get_history(event: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Full chat history for moderators, newest first: live and archived messages, hidden ones
+    included and flagged. Pages with before_id (the previous page's nextBeforeId); steam_id,
+    from and to (ISO dates, to exclusive) and hidden_only=true narrow it down.
+    '''
+    headers = event.get('headers', {})
+    moderator_steam_id = headers.get('x-admin-steam-id') or headers.get('X-Admin-Steam-Id')
     
-    steam_id = body_data.get('steam_id')
-    persona_name = body_data.get('persona_name')
-    avatar_url = body_data.get('avatar_url')
-    message = body_data.get('message', '').strip()
-    reply_to_message_id = body_data.get('reply_to_message_id')
+    if not moderator_steam_id:
+        return {
+            'statusCode': 401,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'Moderator authentication required'})
+        }
     
-    conn = get_db_connection()
-    cur = conn.cursor()
+    params = event.get('queryStringParameters') or {}
+    conditions = []
+    values = []
+    
+    try:
+        limit = max(1, min(int(params.get('limit', '50')), MAX_HISTORY_PAGE))
+        if params.get('before_id'):
+            conditions.append('id < %s')
+            values.append(int(params['before_id']))
+        if params.get('from'):
+            conditions.append('created_at >= %s')
+            values.append(datetime.fromisoformat(params['from']))
+        if params.get('to'):
+            conditions.append('created_at < %s')
+            values.append(datetime.fromisoformat(params['to']))
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'before_id and limit must be numbers, from and to ISO dates'})
+        }
     
-    cur.execute('SELECT is_frozen FROM t_p15345778_news_shop_project.chat_settings LIMIT 1')
-    is_frozen_row = cur.fetchone()
-    is_frozen = is_frozen_row[0] if is_frozen_row else False
+    if params.get('steam_id'):
+        conditions.append('steam_id = %s')
+        values.append(params['steam_id'])
+    if params.get('hidden_only') == 'true':
+        conditions.append('is_hidden = TRUE')
     
-    cur.execute('SELECT is_admin FROM t_p15345778_news_shop_project.users WHERE steam_id = %s', (steam_id,))
-    result = cur.fetchone()
-    is_admin = result[0] if result else False
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
     
-    if is_frozen and not is_admin:
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    moderator_roles = roles.user_roles(cur, moderator_steam_id)
+    if not (moderator_roles['is_admin'] or moderator_roles['is_moderator']):
         cur.close()
         conn.close()
         return {
@@ -148,12 +376,79 @@ def post_message(event: Dict[str, Any]) -> Dict[str, Any]:
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps({'error': 'Chat is frozen by administrator'})
+            'body': json.dumps({'error': 'Moderator access required'})
         }
     
+    # Each table gives its own newest page by primary key (or (steam_id, id) in the archive),
+    # so a page costs the same at any depth of history
+    history_columns = 'id, steam_id, persona_name, avatar_url, message, created_at, reply_to_message_id, is_hidden'
+    cur.execute(f'''
+        SELECT {MESSAGE_COLUMNS}, cm.is_hidden, cm.archived
+        FROM (
+            (SELECT {history_columns}, false as archived
+             FROM t_p15345778_news_shop_project.chat_messages
+             {where}
+             ORDER BY id DESC
+             LIMIT %s)
+            UNION ALL
+            (SELECT {history_columns}, true as archived
+             FROM t_p15345778_news_shop_project.chat_messages_archive
+             {where}
+             ORDER BY id DESC
+             LIMIT %s)
+        ) cm
+        {MESSAGE_JOINS}
+        ORDER BY cm.id DESC
+        LIMIT %s
+    ''', values + [limit + 1] + values + [limit + 1, limit + 1])
+    
+    rows = cur.fetchall()
     cur.close()
     conn.close()
     
+    messages = []
+    for row in rows[:limit]:
+        message = message_from_row(row)
+        message['isHidden'] = bool(row[12])
+        message['archived'] = row[13]
+        messages.append(message)
+    has_more = len(rows) > limit
+    
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'isBase64Encoded': False,
+        'body': json.dumps({
+            'messages': messages,
+            'hasMore': has_more,
+            'nextBeforeId': messages[-1]['id'] if has_more else None
+        })
+    }
+
+def rate_limited_response(retry_after: float) -> Dict[str, Any]:
+    return {
+        'statusCode': 429,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Expose-Headers': 'Retry-After',
+            'Retry-After': retry_after_header(retry_after)
+        },
+        'body': json.dumps({'error': 'Too many messages, slow down', 'retryAfter': round(retry_after, 1)})
+    }
+
+def post_message(event: Dict[str, Any]) -> Dict[str, Any]:
+    body_data = json.loads(event.get('body', '{}'))
+    
+    steam_id = body_data.get('steam_id')
+    persona_name = body_data.get('persona_name')
+    avatar_url = body_data.get('avatar_url')
+    message = body_data.get('message', '').strip()
+    reply_to_message_id = body_data.get('reply_to_message_id')
+    
     if not steam_id or not persona_name:
         return {
             'statusCode': 400,
@@ -174,24 +469,81 @@ def post_message(event: Dict[str, Any]) -> Dict[str, Any]:
             'body': json.dumps({'error': 'Message must be 1-500 characters'})
         }
     
+    # Floods are turned away here, before they cost a connection
+    retry_after = limiter.check(f'chat:{steam_id}')
+    if retry_after:
+        return rate_limited_response(retry_after)
+    
+    frozen_response = {
+        'statusCode': 403,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({'error': 'Chat is frozen by administrator'})
+    }
+    
     conn = get_db_connection()
     cur = conn.cursor()
     
-    cur.execute('''
-        INSERT INTO t_p15345778_news_shop_project.chat_messages 
-        (steam_id, persona_name, avatar_url, message, reply_to_message_id)
-        VALUES (%s, %s, %s, %s, %s)
-        RETURNING id, to_char(created_at, 'YYYY-MM-DD"T"HH24:MI:SS"+00:00"') as created_at
-    ''', (steam_id, persona_name, avatar_url, message, reply_to_message_id))
+    # Cached flags only turn posts away early during a freeze; the insert checks them itself
+    if roles.chat_is_frozen(cur) and not roles.user_roles(cur, steam_id)['is_admin']:
+        cur.close()
+        conn.close()
+        return frozen_response
+    
+    # The notification is delivered to LISTEN-ers (tools/chatstream.py) when the insert commits;
+    # the new row comes back fully resolved so it can go straight into the recent messages buffer.
+    # The shared bucket holds the poster to the same rate across instances.
+    # since_id readers and the cache never look below an id they have seen, so ids must become visible
+    # in id order: the chat_settings row is locked before the id is drawn and stays locked until commit,
+    # the same way hide_message takes it around hidden_seq.
+    bucket_sql, bucket_params = limiter.bucket_cte(f'chat:{steam_id}')
+    cur.execute(f'''
+        WITH {bucket_sql}, settings AS (
+            SELECT is_frozen FROM t_p15345778_news_shop_project.chat_settings LIMIT 1 FOR UPDATE
+        ), inserted AS (
+            INSERT INTO t_p15345778_news_shop_project.chat_messages
+            (steam_id, persona_name, avatar_url, message, reply_to_message_id)
+            SELECT %s, %s, %s, %s, %s
+            FROM (SELECT 1) one
+            LEFT JOIN settings ON true
+            WHERE EXISTS (SELECT 1 FROM bucket) AND (
+                NOT COALESCE(settings.is_frozen, false)
+                OR COALESCE((SELECT is_admin FROM t_p15345778_news_shop_project.users WHERE steam_id = %s), false)
+            )
+            RETURNING *
+        )
+        SELECT {MESSAGE_COLUMNS},
+               EXISTS (SELECT 1 FROM bucket) as allowed,
+               CASE WHEN cm.id IS NOT NULL
+                    THEN pg_notify('chat_events', json_build_object('type', 'message', 'id', cm.id)::text)
+               END
+        FROM (SELECT 1) one
+        LEFT JOIN inserted cm ON true
+        {MESSAGE_JOINS}
+    ''', bucket_params + (steam_id, persona_name, avatar_url, message, reply_to_message_id, steam_id))
     
     row = cur.fetchone()
-    message_id = row[0]
-    created_at = row[1]
-    
-    conn.commit()
+    if row[12] and row[0] is None:
+        # The freeze check turned the post away after the bucket took its token; give it back
+        conn.rollback()
+    else:
+        conn.commit()
     cur.close()
     conn.close()
     
+    if not row[12]:
+        return rate_limited_response(limiter.shared_retry_after())
+    
+    if row[0] is None:
+        # Frozen by another instance since our settings were cached
+        roles.invalidate_chat_settings()
+        return frozen_response
+    
+    posted = message_from_row(row)
+    recent.append(posted)
+    
     return {
         'statusCode': 201,
         'headers': {
@@ -201,8 +553,8 @@ def post_message(event: Dict[str, Any]) -> Dict[str, Any]:
         'isBase64Encoded': False,
         'body': json.dumps({
             'message': 'Message posted successfully',
-            'id': message_id,
-            'createdAt': created_at
+            'id': posted['id'],
+            'createdAt': posted['createdAt']
         })
     }
 
@@ -223,11 +575,7 @@ def hide_message(event: Dict[str, Any]) -> Dict[str, Any]:
     conn = get_db_connection()
     cur = conn.cursor()
     
-    cur.execute('SELECT is_admin FROM t_p15345778_news_shop_project.users WHERE steam_id = %s', (admin_steam_id,))
-    result = cur.fetchone()
-    is_admin = result[0] if result else False
-    
-    if not is_admin:
+    if not roles.user_roles(cur, admin_steam_id)['is_admin']:
         cur.close()
         conn.close()
         return {
@@ -254,9 +602,50 @@ def hide_message(event: Dict[str, Any]) -> Dict[str, Any]:
             'body': json.dumps({'error': 'message_id required'})
         }
     
-    cur.execute('UPDATE t_p15345778_news_shop_project.chat_messages SET is_hidden = TRUE WHERE id = %s', (message_id,))
+    # Every hide takes the next moderation sequence number, which delta polls compare against.
+    # The admin flag is checked again here, the cached one may be up to ROLES_CACHE_TTL old.
+    # Archived messages (found through the history view) are hidden in place.
+    cur.execute('''
+        WITH seq AS (
+            UPDATE t_p15345778_news_shop_project.chat_settings
+            SET hidden_seq = hidden_seq + 1
+            WHERE EXISTS (
+                SELECT 1 FROM t_p15345778_news_shop_project.users WHERE steam_id = %s AND is_admin = true
+            )
+            RETURNING hidden_seq
+        ), hidden AS (
+            UPDATE t_p15345778_news_shop_project.chat_messages
+            SET is_hidden = TRUE, hidden_seq = (SELECT MAX(hidden_seq) FROM seq)
+            WHERE id = %s AND EXISTS (SELECT 1 FROM seq)
+            RETURNING id, hidden_seq
+        ), hidden_archived AS (
+            UPDATE t_p15345778_news_shop_project.chat_messages_archive
+            SET is_hidden = TRUE, hidden_seq = (SELECT MAX(hidden_seq) FROM seq)
+            WHERE id = %s AND EXISTS (SELECT 1 FROM seq)
+            RETURNING id, hidden_seq
+        )
+        SELECT EXISTS (SELECT 1 FROM seq),
+               (SELECT pg_notify('chat_events', json_build_object('type', 'hidden', 'id', id, 'seq', hidden_seq)::text)
+                FROM (SELECT * FROM hidden UNION ALL SELECT * FROM hidden_archived) h)
+    ''', (admin_steam_id, message_id, message_id))
+    allowed = cur.fetchone()[0]
     conn.commit()
     
+    if not allowed:
+        roles.invalidate_user(admin_steam_id)
+        cur.close()
+        conn.close()
+        return {
+            'statusCode': 403,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'Admin access required'})
+        }
+    
+    recent.invalidate()
+    
     cur.close()
     conn.close()
     
@@ -287,11 +676,7 @@ def toggle_chat_freeze(event: Dict[str, Any]) -> Dict[str, Any]:
     conn = get_db_connection()
     cur = conn.cursor()
     
-    cur.execute('SELECT is_admin FROM t_p15345778_news_shop_project.users WHERE steam_id = %s', (admin_steam_id,))
-    result = cur.fetchone()
-    is_admin = result[0] if result else False
-    
-    if not is_admin:
+    if not roles.user_roles(cur, admin_steam_id)['is_admin']:
         cur.close()
         conn.close()
         return {
@@ -306,9 +691,36 @@ def toggle_chat_freeze(event: Dict[str, Any]) -> Dict[str, Any]:
     body_data = json.loads(event.get('body', '{}'))
     is_frozen = body_data.get('is_frozen', False)
     
-    cur.execute('UPDATE t_p15345778_news_shop_project.chat_settings SET is_frozen = %s, updated_at = NOW()', (is_frozen,))
+    cur.execute('''
+        WITH updated AS (
+            UPDATE t_p15345778_news_shop_project.chat_settings SET is_frozen = %s, updated_at = NOW()
+            WHERE EXISTS (
+                SELECT 1 FROM t_p15345778_news_shop_project.users WHERE steam_id = %s AND is_admin = true
+            )
+            RETURNING is_frozen
+        )
+        SELECT EXISTS (SELECT 1 FROM updated),
+               (SELECT pg_notify('chat_events', json_build_object('type', 'settings', 'isFrozen', is_frozen)::text) FROM updated LIMIT 1)
+    ''', (is_frozen, admin_steam_id))
+    allowed = cur.fetchone()[0]
     conn.commit()
     
+    if not allowed:
+        roles.invalidate_user(admin_steam_id)
+        cur.close()
+        conn.close()
+        return {
+            'statusCode': 403,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'Admin access required'})
+        }
+    
+    roles.invalidate_chat_settings()
+    recent.invalidate()
+    
     cur.close()
     conn.close()
     
@@ -320,4 +732,51 @@ def toggle_chat_freeze(event: Dict[str, Any]) -> Dict[str, Any]:
         },
         'isBase64Encoded': False,
         'body': json.dumps({'message': 'Chat freeze status updated', 'isFrozen': is_frozen})
-    }
\ No newline at end of file
+    }
+
+def run_archive(event: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Mover job: moves hidden and old messages to chat_messages_archive in batches (see archive.py)
+    until caught up or out of time. Meant for a scheduled call; an admin can also trigger it.
+    '''
+    headers = event.get('headers', {})
+    admin_steam_id = headers.get('x-admin-steam-id') or headers.get('X-Admin-Steam-Id')
+    
+    if not admin_steam_id:
+        return {
+            'statusCode': 401,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'Admin authentication required'})
+        }
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    if not roles.user_roles(cur, admin_steam_id)['is_admin']:
+        cur.close()
+        conn.close()
+        return {
+            'statusCode': 403,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': 'Admin access required'})
+        }
+    
+    cur.close()
+    result = archive_messages(conn)
+    conn.close()
+    
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'isBase64Encoded': False,
+        'body': json.dumps(result)
+    }
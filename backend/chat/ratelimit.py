@@ -0,0 +1,125 @@
+'''
+Business: Token-bucket rate limiting of posts - in memory per warm instance, in Postgres across instances
+Args: RateLimiter(user_rate, user_burst, global_rate, global_burst) - rates in tokens per second
+Returns: RateLimiter.check(key) -> seconds to wait (0 when allowed); bucket_cte() for the shared per-user bucket
+
+The in-memory buckets turn a flood away before it touches the database. A request they let through
+also takes a token from its rate_limits row inside the write statement itself, so one user spread
+over several instances is still held to user_rate without an extra round trip.
+
+rate_limits rows idle long enough to be full again are the same as no row. The same write statement
+deletes a batch of them, at most once per RATE_LIMIT_PRUNE_INTERVAL seconds per instance, so the table
+stays the size of the recently active users without a separate cleanup job.
+'''
+
+import math
+import os
+import threading
+import time
+from typing import Dict, Tuple
+
+# Buckets back at full burst are the same as no bucket, so they are dropped when the map grows
+MAX_BUCKETS = 10000
+
+# Shared rows not touched for this long (and at least burst / rate) are deleted by the writes themselves
+SHARED_IDLE_AFTER = float(os.environ.get('RATE_LIMIT_IDLE_AFTER', '3600'))
+PRUNE_INTERVAL = float(os.environ.get('RATE_LIMIT_PRUNE_INTERVAL', '60'))
+PRUNE_BATCH = 1000
+
+
+class RateLimiter:
+    def __init__(self, user_rate: float, user_burst: float, global_rate: float, global_burst: float):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.lock = threading.Lock()
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+        self.global_bucket = (global_burst, time.monotonic())
+        self.idle_after = max(SHARED_IDLE_AFTER, user_burst / user_rate)
+        self.pruned_at = time.monotonic() - PRUNE_INTERVAL
+        self.stats = {'allowed': 0, 'limited_user': 0, 'limited_global': 0}
+
+    def refill(self, bucket: Tuple[float, float], rate: float, burst: float, now: float) -> float:
+        tokens, updated_at = bucket
+        return min(burst, tokens + (now - updated_at) * rate)
+
+    def check(self, key: str) -> float:
+        '''Take one token from the key's bucket and the global one, or return how long to wait.'''
+        now = time.monotonic()
+        with self.lock:
+            user_tokens = self.refill(self.buckets.get(key, (self.user_burst, now)), self.user_rate, self.user_burst, now)
+            global_tokens = self.refill(self.global_bucket, self.global_rate, self.global_burst, now)
+
+            if user_tokens < 1:
+                self.stats['limited_user'] += 1
+                return (1 - user_tokens) / self.user_rate
+            if global_tokens < 1:
+                self.stats['limited_global'] += 1
+                return (1 - global_tokens) / self.global_rate
+
+            if len(self.buckets) >= MAX_BUCKETS:
+                self.prune(now)
+            self.buckets[key] = (user_tokens - 1, now)
+            self.global_bucket = (global_tokens - 1, now)
+            self.stats['allowed'] += 1
+            return 0.0
+
+    def prune(self, now: float) -> None:
+        full = [key for key, bucket in self.buckets.items()
+                if self.refill(bucket, self.user_rate, self.user_burst, now) >= self.user_burst]
+        for key in full:
+            del self.buckets[key]
+        if len(self.buckets) >= MAX_BUCKETS:
+            self.buckets.clear()
+
+    def bucket_cte(self, key: str) -> Tuple[str, tuple]:
+        '''
+        SQL for a "bucket" CTE that yields one row when the shared bucket had a token for key (and
+        takes it), and no row otherwise. The write it guards should require EXISTS (SELECT 1 FROM bucket).
+        When a prune is due a "pruned" CTE follows it and deletes idle rows of other keys.
+        '''
+        refilled = 'LEAST(%s, rate_limits.tokens + EXTRACT(EPOCH FROM now() - rate_limits.updated_at) * %s)'
+        sql = f'''
+            bucket AS (
+                INSERT INTO t_p15345778_news_shop_project.rate_limits AS rate_limits (bucket_key, tokens, updated_at)
+                VALUES (%s, %s - 1, now())
+                ON CONFLICT (bucket_key) DO UPDATE
+                SET tokens = {refilled} - 1, updated_at = now()
+                WHERE {refilled} >= 1
+                RETURNING tokens
+            )
+        '''
+        params = (key, self.user_burst, self.user_burst, self.user_rate, self.user_burst, self.user_rate)
+        if not self.prune_due():
+            return sql, params
+
+        # idx_rate_limits_updated_at keeps this a range scan; rows other writes hold are skipped, not waited for
+        sql += f'''
+            , pruned AS (
+                DELETE FROM t_p15345778_news_shop_project.rate_limits
+                WHERE bucket_key IN (
+                    SELECT bucket_key FROM t_p15345778_news_shop_project.rate_limits
+                    WHERE updated_at < now() - make_interval(secs => %s) AND bucket_key <> %s
+                    LIMIT {PRUNE_BATCH}
+                    FOR UPDATE SKIP LOCKED
+                )
+            )
+        '''
+        return sql, params + (self.idle_after, key)
+
+    def prune_due(self) -> bool:
+        now = time.monotonic()
+        with self.lock:
+            if now - self.pruned_at < PRUNE_INTERVAL:
+                return False
+            self.pruned_at = now
+            return True
+
+    def shared_retry_after(self) -> float:
+        '''Wait suggested when only the shared bucket said no: the time one token takes to come back.'''
+        return 1 / self.user_rate
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
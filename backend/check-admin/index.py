@@ -1,6 +1,7 @@
 import json
 import os
-import psycopg2
+import db
+import roles
 from typing import Dict, Any
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -44,20 +45,14 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     
     dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
+    conn = db.connect(dsn)
     
     try:
         with conn.cursor() as cur:
-            # Escape single quotes for simple query protocol
-            escaped_steam_id = steam_id.replace("'", "''")
-            query = f"SELECT COALESCE(is_admin, false) FROM t_p15345778_news_shop_project.users WHERE steam_id = '{escaped_steam_id}'"
-            
             print(f"Checking admin for steam_id: {steam_id}")
-            print(f"Query: {query}")
             
-            cur.execute(query)
-            result = cur.fetchone()
-            is_admin = result[0] if result else False
+            # Every page load asks this, so the flag comes from the roles cache (ROLES_CACHE_TTL)
+            is_admin = roles.user_roles(cur, steam_id)['is_admin']
             
             print(f"Result is_admin: {is_admin}")
             
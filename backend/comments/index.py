@@ -1,7 +1,183 @@
+import base64
 import json
 import os
-import psycopg2
-from typing import Dict, Any, List
+from datetime import datetime
+import db
+import roles
+from ratelimit import RateLimiter, retry_after_header
+from typing import Dict, Any, List, Optional, Tuple
+
+PAGE_SIZE = int(os.environ.get('COMMENTS_PAGE_SIZE', '20'))
+MAX_PAGE_SIZE = 100
+REPLY_PREVIEW_SIZE = int(os.environ.get('COMMENTS_REPLY_PREVIEW', '3'))
+
+# Comments per second (and burst) for one author and for all news of one instance
+COMMENTS_RATE_PER_USER = float(os.environ.get('COMMENTS_RATE_PER_USER', '0.2'))
+COMMENTS_BURST_PER_USER = float(os.environ.get('COMMENTS_BURST_PER_USER', '5'))
+COMMENTS_RATE_GLOBAL = float(os.environ.get('COMMENTS_RATE_GLOBAL', '20'))
+COMMENTS_BURST_GLOBAL = float(os.environ.get('COMMENTS_BURST_GLOBAL', '50'))
+
+limiter = RateLimiter(COMMENTS_RATE_PER_USER, COMMENTS_BURST_PER_USER, COMMENTS_RATE_GLOBAL, COMMENTS_BURST_GLOBAL)
+
+COMMENT_COLUMNS = '''
+    c.id, c.news_id, COALESCE(u.nickname, c.author) as author, c.text, c.avatar, c.steam_id, c.avatar_url,
+    to_char(c.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as created_at,
+    c.parent_comment_id,
+    COALESCE(u.is_admin, false) as is_admin,
+    COALESCE(u.is_moderator, false) as is_moderator,
+    c.likes_count,
+    my.comment_id IS NOT NULL as is_liked,
+    to_char(c.created_at, 'YYYY-MM-DD HH24:MI:SS.US') as cursor_at
+'''
+
+# likes_count is maintained by the like toggle; is_liked is one unique-key lookup per comment
+COMMENT_JOINS = '''
+    LEFT JOIN t_p15345778_news_shop_project.users u ON c.steam_id = u.steam_id
+    LEFT JOIN t_p15345778_news_shop_project.comment_likes my ON my.comment_id = c.id AND my.steam_id = %s
+'''
+
+
+def rate_limited_response(retry_after: float) -> Dict[str, Any]:
+    return {
+        'statusCode': 429,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Expose-Headers': 'Retry-After',
+            'Retry-After': retry_after_header(retry_after)
+        },
+        'body': json.dumps({'error': 'Too many comments, slow down', 'retryAfter': round(retry_after, 1)})
+    }
+
+def comment_from_row(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    return {
+        'id': row[0],
+        'news_id': row[1],
+        'author': row[2],
+        'text': row[3],
+        'avatar': row[4],
+        'steam_id': row[5],
+        'avatar_url': row[6],
+        'date': row[7],
+        'parent_comment_id': row[8],
+        'likes_count': row[11],
+        'is_liked': row[12],
+        'is_admin': row[9],
+        'is_moderator': row[10]
+    }
+
+
+def encode_cursor(row: Tuple[Any, ...]) -> str:
+    return base64.urlsafe_b64encode(f'{row[13]}|{row[0]}'.encode()).decode()
+
+
+# Sorts before every comment, so a replies page from it starts at the first reply
+THREAD_START_CURSOR = base64.urlsafe_b64encode(b'0001-01-01 00:00:00.000000|0').decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    created_at, _, comment_id = base64.urlsafe_b64decode(cursor.encode()).decode().partition('|')
+    return datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S.%f'), int(comment_id)
+
+
+def load_comment_page(cur, news_id: int, parent_id: Optional[int], steam_id: Optional[str],
+                      cursor: Optional[str], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    '''
+    One keyset page of top-level comments (newest first) or of the replies to parent_id
+    (oldest first), each with a preview of its first replies and a replies_cursor to
+    continue that thread. Two statements per page regardless of thread size.
+    '''
+    conditions = ['c.news_id = %s']
+    args: List[Any] = [steam_id, news_id]
+    
+    if parent_id is None:
+        conditions.append('c.parent_comment_id IS NULL')
+        order, direction = 'c.created_at DESC, c.id DESC', '<'
+    else:
+        conditions.append('c.parent_comment_id = %s')
+        args.append(parent_id)
+        order, direction = 'c.created_at, c.id', '>'
+    
+    if cursor:
+        conditions.append(f'(c.created_at, c.id) {direction} (%s::timestamp, %s)')
+        args.extend(decode_cursor(cursor))
+    
+    cur.execute(f'''
+        SELECT {COMMENT_COLUMNS}
+        FROM t_p15345778_news_shop_project.comments c
+        {COMMENT_JOINS}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY {order}
+        LIMIT %s
+    ''', args + [limit + 1])
+    
+    rows = cur.fetchall()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    page = []
+    for row in rows[:limit]:
+        comment = comment_from_row(row)
+        comment['replies'] = []
+        comment['replies_cursor'] = None
+        page.append(comment)
+    
+    if not page:
+        return page, next_cursor
+    
+    cur.execute(f'''
+        SELECT {COMMENT_COLUMNS},
+               EXISTS (
+                   SELECT 1 FROM t_p15345778_news_shop_project.comments cr
+                   WHERE cr.news_id = c.news_id AND cr.parent_comment_id = c.id
+               ) as has_replies
+        FROM unnest(%s::integer[]) p(id)
+        CROSS JOIN LATERAL (
+            SELECT * FROM t_p15345778_news_shop_project.comments r
+            WHERE r.news_id = %s AND r.parent_comment_id = p.id
+            ORDER BY r.created_at, r.id
+            LIMIT %s
+        ) c
+        {COMMENT_JOINS}
+        ORDER BY c.parent_comment_id, c.created_at, c.id
+    ''', ([comment['id'] for comment in page], news_id, REPLY_PREVIEW_SIZE + 1, steam_id))
+    
+    by_id = {comment['id']: comment for comment in page}
+    last_preview: Dict[int, Tuple[Any, ...]] = {}
+    for row in cur.fetchall():
+        parent = by_id[row[8]]
+        if len(parent['replies']) < REPLY_PREVIEW_SIZE:
+            reply = comment_from_row(row)
+            reply['has_replies'] = row[14]
+            parent['replies'].append(reply)
+            last_preview[row[8]] = row
+        elif row[8] in last_preview:
+            parent['replies_cursor'] = encode_cursor(last_preview[row[8]])
+        else:
+            # Nothing previewed (COMMENTS_REPLY_PREVIEW=0): the thread continues from its start
+            parent['replies_cursor'] = THREAD_START_CURSOR
+    
+    return page, next_cursor
+
+
+def build_comment_tree(comments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    '''
+    Nest comments under their parents in one pass; every comment gets a 'replies' list.
+    Replies keep the order of the input, comments whose parent is missing become roots.
+    '''
+    by_id: Dict[int, Dict[str, Any]] = {}
+    for comment in comments:
+        comment['replies'] = []
+        by_id[comment['id']] = comment
+    
+    roots: List[Dict[str, Any]] = []
+    for comment in comments:
+        parent = by_id.get(comment['parent_comment_id'])
+        if parent is not None and parent is not comment:
+            parent['replies'].append(comment)
+        else:
+            roots.append(comment)
+    
+    return roots
+
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -24,7 +200,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     
     db_url = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(db_url)
+    conn = db.connect(db_url)
     cur = conn.cursor()
     
     try:
@@ -43,55 +219,55 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 }
             
             steam_id = params.get('steam_id')
+            as_tree = params.get('tree') == 'true'
             
-            cur.execute('''
-                SELECT c.id, c.news_id, COALESCE(u.nickname, c.author) as author, c.text, c.avatar, c.steam_id, c.avatar_url,
-                       to_char(c.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as created_at,
-                       c.parent_comment_id,
-                       COALESCE(u.is_admin, false) as is_admin,
-                       COALESCE(u.is_moderator, false) as is_moderator
+            if 'limit' in params or 'cursor' in params or 'parent_id' in params:
+                try:
+                    limit = max(1, min(int(params.get('limit') or PAGE_SIZE), MAX_PAGE_SIZE))
+                    parent_id = int(params['parent_id']) if params.get('parent_id') else None
+                    comments, next_cursor = load_comment_page(
+                        cur, int(news_id), parent_id, steam_id, params.get('cursor'), limit
+                    )
+                except ValueError:
+                    return {
+                        'statusCode': 400,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': json.dumps({'error': 'Invalid limit, parent_id or cursor'})
+                    }
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'isBase64Encoded': False,
+                    'body': json.dumps({'comments': comments, 'next_cursor': next_cursor})
+                }
+            
+            cur.execute(f'''
+                SELECT {COMMENT_COLUMNS}
                 FROM t_p15345778_news_shop_project.comments c
-                LEFT JOIN t_p15345778_news_shop_project.users u ON c.steam_id = u.steam_id
+                {COMMENT_JOINS}
                 WHERE c.news_id = %s
                 ORDER BY c.created_at DESC
-            ''', (int(news_id),))
+            ''', (steam_id, int(news_id)))
             
-            rows = cur.fetchall()
-            comments: List[Dict[str, Any]] = []
+            comments: List[Dict[str, Any]] = [comment_from_row(row) for row in cur.fetchall()]
             
-            for row in rows:
-                created_at = row[7]
-                comment_id = row[0]
-                
-                cur.execute('''
-                    SELECT COUNT(*) FROM t_p15345778_news_shop_project.comment_likes
-                    WHERE comment_id = %s
-                ''', (comment_id,))
-                likes_count = cur.fetchone()[0]
-                
-                is_liked = False
-                if steam_id:
-                    cur.execute('''
-                        SELECT COUNT(*) FROM t_p15345778_news_shop_project.comment_likes
-                        WHERE comment_id = %s AND steam_id = %s
-                    ''', (comment_id, steam_id))
-                    is_liked = cur.fetchone()[0] > 0
-                
-                comments.append({
-                    'id': row[0],
-                    'news_id': row[1],
-                    'author': row[2],
-                    'text': row[3],
-                    'avatar': row[4],
-                    'steam_id': row[5],
-                    'avatar_url': row[6],
-                    'date': created_at,
-                    'parent_comment_id': row[8],
-                    'likes_count': likes_count,
-                    'is_liked': is_liked,
-                    'is_admin': row[9],
-                    'is_moderator': row[10]
-                })
+            if as_tree:
+                return {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'isBase64Encoded': False,
+                    'body': json.dumps({'comments': build_comment_tree(comments), 'total': len(comments)})
+                }
             
             return {
                 'statusCode': 200,
@@ -126,17 +302,38 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             if not author:
                 author = 'Аноним'
             
-            cur.execute('''
-                INSERT INTO t_p15345778_news_shop_project.comments 
-                (news_id, author, text, avatar, steam_id, avatar_url, parent_comment_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                RETURNING id, news_id, author, text, avatar, steam_id, avatar_url, parent_comment_id,
-                          to_char(created_at, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as created_at
-            ''', (int(news_id), author, text, avatar, steam_id, avatar_url, parent_comment_id))
+            # Anonymous comments are limited by address instead of steam_id
+            source_ip = ((event.get('requestContext') or {}).get('identity') or {}).get('sourceIp', '')
+            limit_key = f"comments:{steam_id or source_ip}"
+            
+            retry_after = limiter.check(limit_key)
+            if retry_after:
+                return rate_limited_response(retry_after)
+            
+            bucket_sql, bucket_params = limiter.bucket_cte(limit_key)
+            cur.execute(f'''
+                WITH {bucket_sql}, inserted AS (
+                    INSERT INTO t_p15345778_news_shop_project.comments 
+                    (news_id, author, text, avatar, steam_id, avatar_url, parent_comment_id)
+                    SELECT %s, %s, %s, %s, %s, %s, %s
+                    WHERE EXISTS (SELECT 1 FROM bucket)
+                    RETURNING id, news_id, author, text, avatar, steam_id, avatar_url, parent_comment_id,
+                              to_char(created_at, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as created_at
+                ), counted AS (
+                    INSERT INTO t_p15345778_news_shop_project.news_comment_stats (news_id, comments_count)
+                    SELECT news_id, 1 FROM inserted
+                    ON CONFLICT (news_id) DO UPDATE
+                    SET comments_count = news_comment_stats.comments_count + 1, updated_at = CURRENT_TIMESTAMP
+                )
+                SELECT * FROM inserted
+            ''', bucket_params + (int(news_id), author, text, avatar, steam_id, avatar_url, parent_comment_id))
             
             row = cur.fetchone()
             conn.commit()
             
+            if not row:
+                return rate_limited_response(limiter.shared_retry_after())
+            
             return {
                 'statusCode': 201,
                 'headers': {
@@ -178,32 +375,51 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'body': json.dumps({'error': 'comment_id and steam_id required'})
                     }
                 
+                # One statement toggles the like and moves the comment and news counters by the
+                # rows actually deleted or inserted, so concurrent clicks can neither lose nor double a like.
+                # An insert that loses a race to the same user's like hits the unique key and
+                # changes nothing: the like exists, so the result is liked.
                 cur.execute('''
-                    SELECT COUNT(*) FROM t_p15345778_news_shop_project.comment_likes
-                    WHERE comment_id = %s AND steam_id = %s
-                ''', (comment_id, steam_id))
-                
-                if cur.fetchone()[0] > 0:
-                    cur.execute('''
+                    WITH removed AS (
                         DELETE FROM t_p15345778_news_shop_project.comment_likes
                         WHERE comment_id = %s AND steam_id = %s
-                    ''', (comment_id, steam_id))
-                    is_liked = False
-                else:
-                    cur.execute('''
-                        INSERT INTO t_p15345778_news_shop_project.comment_likes
-                        (comment_id, steam_id)
-                        VALUES (%s, %s)
-                    ''', (comment_id, steam_id))
-                    is_liked = True
+                        RETURNING comment_id
+                    ), added AS (
+                        INSERT INTO t_p15345778_news_shop_project.comment_likes (comment_id, steam_id)
+                        SELECT id, %s FROM t_p15345778_news_shop_project.comments
+                        WHERE id = %s AND NOT EXISTS (SELECT 1 FROM removed)
+                        ON CONFLICT (comment_id, steam_id) DO NOTHING
+                        RETURNING comment_id
+                    ), counted AS (
+                        UPDATE t_p15345778_news_shop_project.comments
+                        SET likes_count = likes_count + (SELECT COUNT(*) FROM added) - (SELECT COUNT(*) FROM removed)
+                        WHERE id = %s
+                        RETURNING news_id, likes_count, NOT EXISTS (SELECT 1 FROM removed) as is_liked
+                    ), news_counted AS (
+                        UPDATE t_p15345778_news_shop_project.news_comment_stats s
+                        SET likes_count = s.likes_count + (SELECT COUNT(*) FROM added) - (SELECT COUNT(*) FROM removed),
+                            updated_at = CURRENT_TIMESTAMP
+                        FROM counted
+                        WHERE s.news_id = counted.news_id
+                          AND EXISTS (SELECT 1 FROM added UNION ALL SELECT 1 FROM removed)
+                    )
+                    SELECT likes_count, is_liked FROM counted
+                ''', (comment_id, steam_id, steam_id, comment_id, comment_id))
                 
+                row = cur.fetchone()
                 conn.commit()
                 
-                cur.execute('''
-                    SELECT COUNT(*) FROM t_p15345778_news_shop_project.comment_likes
-                    WHERE comment_id = %s
-                ''', (comment_id,))
-                likes_count = cur.fetchone()[0]
+                if not row:
+                    return {
+                        'statusCode': 404,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'body': json.dumps({'error': 'Comment not found'})
+                    }
+                
+                likes_count, is_liked = row
                 
                 return {
                     'statusCode': 200,
@@ -261,11 +477,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             
             comment_owner_steam_id = result[0]
             
-            escaped_steam_id = steam_id.replace("'", "''")
-            cur.execute(f"SELECT COUNT(*) FROM t_p15345778_news_shop_project.users WHERE steam_id = '{escaped_steam_id}' AND is_admin = true")
-            is_admin = cur.fetchone()[0] > 0
-            
-            if comment_owner_steam_id != steam_id and not is_admin:
+            # Owners never need the admin flag; for others it comes from the roles cache
+            if comment_owner_steam_id != steam_id and not roles.user_roles(cur, steam_id)['is_admin']:
                 return {
                     'statusCode': 403,
                     'headers': {
@@ -275,12 +488,38 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'You can only delete your own comments'})
                 }
             
+            # Ownership or the admin flag is checked again in the delete, the cached flag may be stale
             cur.execute('''
-                DELETE FROM t_p15345778_news_shop_project.comments 
-                WHERE id = %s
-            ''', (comment_id,))
+                WITH deleted AS (
+                    DELETE FROM t_p15345778_news_shop_project.comments 
+                    WHERE id = %s AND (steam_id = %s OR EXISTS (
+                        SELECT 1 FROM t_p15345778_news_shop_project.users WHERE steam_id = %s AND is_admin = true
+                    ))
+                    RETURNING news_id, likes_count
+                ), stats AS (
+                    UPDATE t_p15345778_news_shop_project.news_comment_stats s
+                    SET comments_count = s.comments_count - 1,
+                        likes_count = s.likes_count - deleted.likes_count,
+                        updated_at = CURRENT_TIMESTAMP
+                    FROM deleted
+                    WHERE s.news_id = deleted.news_id
+                )
+                SELECT COUNT(*) FROM deleted
+            ''', (comment_id, steam_id, steam_id))
+            deleted_count = cur.fetchone()[0]
             conn.commit()
             
+            if not deleted_count:
+                roles.invalidate_user(steam_id)
+                return {
+                    'statusCode': 403,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'error': 'You can only delete your own comments'})
+                }
+            
             return {
                 'statusCode': 200,
                 'headers': {
@@ -0,0 +1,80 @@
+'''
+Business: Short-lived cache of user role flags and chat settings kept across warm invocations of the function
+Args: ROLES_CACHE_TTL - seconds a cached value is trusted
+Returns: user_roles(cur, steam_id), chat_is_frozen(cur) and explicit invalidate_user / invalidate_chat_settings
+
+Every function instance has its own copy, so a role change (made through the users function) is picked
+up when the entry expires, within the TTL; there is no cross-instance invalidation. Writes that depend on
+a role re-check it in their own SQL, so a stale entry can delay a change but never keep a revoked right
+alive, and a write whose re-check disagrees drops the entry with invalidate_user.
+'''
+
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+CACHE_TTL = float(os.environ.get('ROLES_CACHE_TTL', '10'))
+MAX_USERS = 10000
+
+_users: Dict[str, Tuple[float, Dict[str, bool]]] = {}
+_chat_settings: Optional[Tuple[float, bool]] = None
+_lock = threading.Lock()
+
+stats = {'hits': 0, 'misses': 0}
+
+
+def user_roles(cur, steam_id: str) -> Dict[str, bool]:
+    '''{'is_admin', 'is_moderator'} for a steam id; unknown users have neither.'''
+    now = time.monotonic()
+    with _lock:
+        entry = _users.get(steam_id)
+        if entry and now - entry[0] < CACHE_TTL:
+            stats['hits'] += 1
+            return entry[1]
+
+    # A plain cursor on the same connection, whatever cursor_factory the caller uses
+    with cur.connection.cursor() as plain:
+        plain.execute('''
+            SELECT COALESCE(is_admin, false), COALESCE(is_moderator, false)
+            FROM t_p15345778_news_shop_project.users WHERE steam_id = %s
+        ''', (steam_id,))
+        row = plain.fetchone()
+    roles = {'is_admin': bool(row and row[0]), 'is_moderator': bool(row and row[1])}
+
+    with _lock:
+        stats['misses'] += 1
+        if len(_users) >= MAX_USERS:
+            _users.clear()
+        _users[steam_id] = (now, roles)
+    return roles
+
+
+def chat_is_frozen(cur) -> bool:
+    global _chat_settings
+    now = time.monotonic()
+    with _lock:
+        if _chat_settings and now - _chat_settings[0] < CACHE_TTL:
+            stats['hits'] += 1
+            return _chat_settings[1]
+
+    with cur.connection.cursor() as plain:
+        plain.execute('SELECT is_frozen FROM t_p15345778_news_shop_project.chat_settings LIMIT 1')
+        row = plain.fetchone()
+    is_frozen = bool(row and row[0])
+
+    with _lock:
+        stats['misses'] += 1
+        _chat_settings = (now, is_frozen)
+    return is_frozen
+
+
+def invalidate_user(steam_id: str) -> None:
+    with _lock:
+        _users.pop(steam_id, None)
+
+
+def invalidate_chat_settings() -> None:
+    global _chat_settings
+    with _lock:
+        _chat_settings = None
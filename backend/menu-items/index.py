@@ -8,7 +8,7 @@ Returns: HTTP response with menu items data
 import json
 import os
 from typing import Dict, Any
-import psycopg2
+import db
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
@@ -56,7 +56,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     }
 
 def get_menu_items(db_url: str) -> Dict[str, Any]:
-    conn = psycopg2.connect(db_url)
+    conn = db.connect(db_url)
     cursor = conn.cursor()
     
     try:
@@ -107,7 +107,7 @@ def get_menu_items(db_url: str) -> Dict[str, Any]:
         }
 
 def update_menu_items(db_url: str, data: Dict[str, Any]) -> Dict[str, Any]:
-    conn = psycopg2.connect(db_url)
+    conn = db.connect(db_url)
     cursor = conn.cursor()
     
     try:
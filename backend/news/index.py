@@ -1,6 +1,6 @@
 import json
 import os
-import psycopg2
+import db
 from psycopg2.extras import RealDictCursor
 from datetime import datetime
 from typing import Dict, Any
@@ -26,7 +26,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     
     dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
+    conn = db.connect(dsn)
     
     try:
         if method == 'GET':
@@ -36,11 +36,15 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 if news_id:
                     cur.execute("""
-                        SELECT id, title, category, image_url, content, badge,
-                               to_char(date, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as date,
-                               to_char(created_at, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as created_at,
-                               to_char(updated_at, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as updated_at
-                        FROM news WHERE id = %s
+                        SELECT n.id, n.title, n.category, n.image_url, n.content, n.badge,
+                               to_char(n.date, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as date,
+                               to_char(n.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as created_at,
+                               to_char(n.updated_at, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as updated_at,
+                               COALESCE(s.comments_count, 0) as comments_count,
+                               COALESCE(s.likes_count, 0) as likes_count
+                        FROM news n
+                        LEFT JOIN news_comment_stats s ON s.news_id = n.id
+                        WHERE n.id = %s
                     """, (int(news_id),))
                     news_item = cur.fetchone()
                     result = dict(news_item) if news_item else None
@@ -53,12 +57,17 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'body': json.dumps({'news': result})
                     }
                 else:
+                    # Comment and like totals come from the counters the comments function maintains
                     cur.execute("""
-                        SELECT id, title, category, image_url, content, badge,
-                               to_char(date, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as date,
-                               to_char(created_at, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as created_at,
-                               to_char(updated_at, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as updated_at
-                        FROM news ORDER BY date DESC
+                        SELECT n.id, n.title, n.category, n.image_url, n.content, n.badge,
+                               to_char(n.date, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as date,
+                               to_char(n.created_at, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as created_at,
+                               to_char(n.updated_at, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as updated_at,
+                               COALESCE(s.comments_count, 0) as comments_count,
+                               COALESCE(s.likes_count, 0) as likes_count
+                        FROM news n
+                        LEFT JOIN news_comment_stats s ON s.news_id = n.id
+                        ORDER BY n.date DESC
                     """)
                     news_list = cur.fetchall()
                     results = [dict(item) for item in news_list]
@@ -7,7 +7,7 @@ Returns: Payment URL or webhook confirmation
 import json
 import os
 import uuid
-import psycopg2
+import db
 from typing import Dict, Any
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -26,7 +26,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     
     dsn = os.environ.get('DATABASE_URL')
-    conn = psycopg2.connect(dsn)
+    conn = db.connect(dsn)
     cur = conn.cursor()
     
     try:
@@ -8,7 +8,7 @@ Returns: HTTP response dict с данными профиля
 import json
 import os
 from typing import Dict, Any
-import psycopg2
+import db
 from psycopg2.extras import RealDictCursor
 
 
@@ -16,7 +16,7 @@ def get_db_connection():
     database_url = os.environ.get('DATABASE_URL')
     if not database_url:
         raise ValueError('DATABASE_URL not configured')
-    return psycopg2.connect(database_url)
+    return db.connect(database_url)
 
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
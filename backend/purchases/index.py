@@ -8,7 +8,7 @@ Returns: HTTP response with purchase confirmation and updated balance
 import json
 import os
 from typing import Dict, Any
-import psycopg2
+import db
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
@@ -66,7 +66,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'isBase64Encoded': False
         }
     
-    conn = psycopg2.connect(db_url)
+    conn = db.connect(db_url)
     cursor = conn.cursor()
     
     try:
@@ -0,0 +1,362 @@
+'''
+Business: Source Query Protocol (A2S) client - A2S_INFO, A2S_PLAYER and A2S_RULES
+Args: targets - list of (ip, port) tuples, timeout - overall deadline in seconds
+Returns: dict mapping every target to its parsed reply or an offline status
+'''
+
+import bz2
+import ipaddress
+import selectors
+import socket
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Any, List, Tuple, Optional, Callable
+
+SIMPLE_HEADER = -1
+SPLIT_HEADER = -2
+
+A2S_INFO = 0x54
+A2S_PLAYER = 0x55
+A2S_RULES = 0x56
+S2C_CHALLENGE = 0x41
+S2A_INFO = 0x49
+S2A_PLAYER = 0x44
+S2A_RULES = 0x45
+
+# Extra data flag (EDF) bits of the A2S_INFO reply
+EDF_PORT = 0x80
+EDF_STEAM_ID = 0x10
+EDF_SOURCETV = 0x40
+EDF_KEYWORDS = 0x20
+EDF_GAME_ID = 0x01
+
+MAX_DATAGRAM = 65535
+
+# Host names are looked up in parallel, at most this many at once
+RESOLVE_WORKERS = 16
+
+Target = Tuple[str, int]
+
+
+class PacketReader:
+    '''Sequential little-endian reader over a packet, slicing through a memoryview without copies.'''
+
+    def __init__(self, data: bytes, offset: int = 0):
+        self.data = data
+        self.view = memoryview(data)
+        self.offset = offset
+
+    def remaining(self) -> int:
+        return len(self.view) - self.offset
+
+    def unpack(self, fmt: str) -> Tuple[Any, ...]:
+        values = struct.unpack_from(fmt, self.view, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return values
+
+    def byte(self) -> int:
+        return self.unpack('<B')[0]
+
+    def short(self) -> int:
+        return self.unpack('<h')[0]
+
+    def long(self) -> int:
+        return self.unpack('<i')[0]
+
+    def float(self) -> float:
+        return self.unpack('<f')[0]
+
+    def longlong(self) -> int:
+        return self.unpack('<Q')[0]
+
+    def char(self) -> str:
+        return chr(self.byte())
+
+    def string(self) -> str:
+        start = self.offset
+        end = self.data.find(b'\x00', start)
+        if end == -1:
+            raise ValueError('Unterminated string')
+        self.offset = end + 1
+        return str(self.view[start:end], 'utf-8', 'replace')
+
+
+def build_request(kind: int, challenge: Optional[bytes] = None) -> bytes:
+    if kind == A2S_INFO:
+        return b'\xFF\xFF\xFF\xFFTSource Engine Query\x00' + (challenge or b'')
+    return b'\xFF\xFF\xFF\xFF' + bytes([kind]) + (challenge or b'\xFF\xFF\xFF\xFF')
+
+
+def parse_info_extra(reader: PacketReader, info: Dict[str, Any]) -> None:
+    info['bots'] = reader.byte()
+    info['server_type'] = reader.char()
+    info['environment'] = reader.char()
+    info['visibility'] = reader.byte()
+    info['vac'] = reader.byte()
+
+    # The Ship carries three extra bytes before the version
+    if info['app_id'] == 2400:
+        info['mode'], info['witnesses'], info['duration'] = reader.unpack('<BBB')
+
+    info['version'] = reader.string()
+
+    if reader.remaining() < 1:
+        return
+
+    edf = reader.byte()
+    if edf & EDF_PORT:
+        info['port'] = reader.short() & 0xFFFF
+    if edf & EDF_STEAM_ID:
+        info['steam_id'] = reader.longlong()
+    if edf & EDF_SOURCETV:
+        info['tv_port'] = reader.short() & 0xFFFF
+        info['tv_name'] = reader.string()
+    if edf & EDF_KEYWORDS:
+        info['keywords'] = reader.string()
+    if edf & EDF_GAME_ID:
+        info['game_id'] = reader.longlong()
+
+
+def parse_info(reader: PacketReader) -> Dict[str, Any]:
+    info: Dict[str, Any] = {'status': 'online'}
+    info['protocol'] = reader.byte()
+    info['name'] = reader.string()
+    info['map'] = reader.string()
+    info['folder'] = reader.string()
+    info['game'] = reader.string()
+    info['app_id'] = reader.short() & 0xFFFF
+    info['players'] = reader.byte()
+    info['max_players'] = reader.byte()
+
+    # Everything past the player counts is optional: older or non-conforming
+    # servers stop early, and the basic status is still usable without it
+    try:
+        parse_info_extra(reader, info)
+    except (ValueError, struct.error):
+        pass
+
+    return info
+
+
+def parse_players(reader: PacketReader) -> List[Dict[str, Any]]:
+    # The count byte wraps past 255 players, so read entries until the data ends
+    reader.byte()
+    players = []
+    while reader.remaining() > 0:
+        reader.byte()
+        name = reader.string()
+        score, duration = reader.unpack('<if')
+        players.append({'name': name, 'score': score, 'duration': round(duration, 1)})
+    return players
+
+
+def parse_rules(reader: PacketReader) -> Dict[str, str]:
+    # Some servers truncate the list, so stop at the first incomplete pair
+    reader.short()
+    rules = {}
+    while reader.remaining() > 0:
+        try:
+            name = reader.string()
+            rules[name] = reader.string()
+        except ValueError:
+            break
+    return rules
+
+
+RESPONSES: Dict[int, Tuple[int, Callable[[PacketReader], Any]]] = {
+    A2S_INFO: (S2A_INFO, parse_info),
+    A2S_PLAYER: (S2A_PLAYER, parse_players),
+    A2S_RULES: (S2A_RULES, parse_rules),
+}
+
+
+def reassemble(splits: Dict[Tuple[Target, int], Dict[str, Any]], addr: Target, data: bytes) -> Optional[bytes]:
+    '''
+    Return the complete packet for a datagram, or None while split fragments
+    are still missing. Fragments are kept as views into their datagrams and
+    joined once when the last one arrives. Fragment numbers outside the
+    announced total, or a total that changes between fragments, are rejected.
+    '''
+    header = struct.unpack_from('<i', data, 0)[0]
+    if header == SIMPLE_HEADER:
+        return data
+    if header != SPLIT_HEADER:
+        raise ValueError('Unknown packet header')
+
+    view = memoryview(data)
+    packet_id, total, number, _ = struct.unpack_from('<IBBh', view, 4)
+    offset = 12
+    if total == 0 or number >= total:
+        raise ValueError(f'Split fragment {number} of {total}')
+
+    split = splits.setdefault((addr, packet_id), {'total': total, 'parts': {}, 'bz2': None})
+    if split['total'] != total:
+        raise ValueError('Split fragment total changed')
+
+    # Compressed responses carry the decompressed size and CRC32 in the first fragment
+    if packet_id & 0x80000000 and number == 0:
+        split['bz2'] = struct.unpack_from('<iI', view, offset)
+        offset += 8
+
+    split['parts'][number] = view[offset:]
+
+    if len(split['parts']) < split['total']:
+        return None
+
+    del splits[(addr, packet_id)]
+    packet = b''.join(split['parts'][i] for i in range(split['total']))
+
+    if packet_id & 0x80000000:
+        size, crc = split['bz2'] or (0, 0)
+        packet = bz2.decompress(packet)
+        if len(packet) != size or zlib.crc32(packet) != crc:
+            raise ValueError('Corrupted compressed response')
+
+    return packet
+
+
+def resolve(targets: List[Target], timeout: float) -> Dict[Target, Any]:
+    '''
+    IPv4 address of every target host, or the exception it failed with. Literal IPs
+    need no lookup; host names are resolved in parallel and get at most `timeout`
+    seconds together, so one slow name server cannot hold up the others.
+    '''
+    addresses: Dict[Target, Any] = {}
+    names = []
+    for target in targets:
+        try:
+            addresses[target] = str(ipaddress.IPv4Address(target[0]))
+        except ValueError:
+            names.append(target)
+    if not names:
+        return addresses
+
+    executor = ThreadPoolExecutor(max_workers=min(RESOLVE_WORKERS, len(names)))
+    lookups = {target: executor.submit(socket.gethostbyname, target[0]) for target in names}
+    wait(lookups.values(), timeout)
+    # A lookup still running keeps its thread until the resolver gives up; its target is offline
+    executor.shutdown(wait=False)
+    for target, lookup in lookups.items():
+        if not lookup.done():
+            addresses[target] = TimeoutError(f'Resolving {target[0]} timed out')
+        elif lookup.exception():
+            addresses[target] = lookup.exception()
+        else:
+            addresses[target] = lookup.result()
+    return addresses
+
+
+def query(targets: List[Target], kind: int = A2S_INFO, timeout: float = 3,
+          timeouts: Optional[Dict[Target, float]] = None) -> Dict[Target, Any]:
+    '''
+    Send one A2S request to every target from a single non-blocking UDP socket
+    and collect the replies until all arrive or their deadlines pass.
+    Challenge replies are answered and split replies reassembled in the same loop.
+    `timeouts` overrides the deadline per target; info replies carry their RTT in ms.
+    Host names are resolved first (see resolve()), before any deadline starts.
+    '''
+    expected, parser = RESPONSES[kind]
+    timeouts = timeouts or {}
+    results: Dict[Target, Any] = {}
+    waiting: Dict[Target, List[Target]] = {}
+    deadlines: Dict[Target, float] = {}
+    sent_at: Dict[Target, float] = {}
+    splits: Dict[Tuple[Target, int], Dict[str, Any]] = {}
+    seen = set()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+    request = build_request(kind)
+
+    def finish(addr: Target, result: Any) -> None:
+        if isinstance(result, dict) and result.get('status') == 'online':
+            result['rtt'] = round((time.monotonic() - sent_at[addr]) * 1000, 1)
+        for target in waiting.pop(addr):
+            results[target] = result
+
+    try:
+        addresses = resolve(list(dict.fromkeys(targets)), timeout)
+        start = time.monotonic()
+
+        for target in targets:
+            if target in seen:
+                continue
+            seen.add(target)
+            ip, port = target
+            try:
+                if isinstance(addresses[target], Exception):
+                    raise addresses[target]
+                addr = (addresses[target], int(port))
+                sock.sendto(request, addr)
+            except Exception as e:
+                results[target] = {'status': 'offline', 'error': str(e)}
+                continue
+            sent_at[addr] = time.monotonic()
+            waiting.setdefault(addr, []).append(target)
+            deadlines[addr] = max(deadlines.get(addr, 0), start + timeouts.get(target, timeout))
+
+        while waiting:
+            now = time.monotonic()
+            for addr in [addr for addr in waiting if deadlines[addr] <= now]:
+                finish(addr, {'status': 'offline', 'error': 'timeout'})
+
+            if not waiting:
+                break
+
+            if not selector.select(min(deadlines[addr] for addr in waiting) - now):
+                continue
+
+            while waiting:
+                try:
+                    data, addr = sock.recvfrom(MAX_DATAGRAM)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError:
+                    continue
+
+                if addr not in waiting or len(data) < 5:
+                    continue
+
+                try:
+                    packet = reassemble(splits, addr, data)
+                    if packet is None:
+                        continue
+                    if len(packet) < 5:
+                        raise ValueError('Truncated response')
+
+                    if packet[4] == S2C_CHALLENGE:
+                        if len(packet) < 9:
+                            raise ValueError('Truncated challenge')
+                        sock.sendto(build_request(kind, packet[5:9]), addr)
+                        sent_at[addr] = time.monotonic()
+                        continue
+
+                    if packet[4] != expected:
+                        continue
+
+                    finish(addr, parser(PacketReader(packet, 5)))
+                except Exception as e:
+                    # Whatever one server sends only takes that server offline, never the whole poll
+                    finish(addr, {'status': 'offline', 'error': f'invalid response: {e}'})
+    finally:
+        selector.close()
+        sock.close()
+
+    return results
+
+
+def query_info(targets: List[Target], timeout: float = 3,
+               timeouts: Optional[Dict[Target, float]] = None) -> Dict[Target, Dict[str, Any]]:
+    return query(targets, A2S_INFO, timeout, timeouts)
+
+
+def query_players(targets: List[Target], timeout: float = 3) -> Dict[Target, Any]:
+    return query(targets, A2S_PLAYER, timeout)
+
+
+def query_rules(targets: List[Target], timeout: float = 3) -> Dict[Target, Any]:
+    return query(targets, A2S_RULES, timeout)
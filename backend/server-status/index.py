@@ -7,10 +7,22 @@ Returns: HTTP response with server status information
 
 import json
 import os
-import socket
-import struct
-from typing import Dict, Any, Tuple, Optional
-import psycopg2
+from typing import Dict, Any, List, Tuple, Optional
+import db
+from psycopg2.extras import Json, execute_values
+import a2s
+
+POLL_TIMEOUT = float(os.environ.get('SERVER_POLL_TIMEOUT', '3'))
+SNAPSHOT_TTL = float(os.environ.get('SERVER_STATUS_TTL', '60'))
+PROBE_TIMEOUT = float(os.environ.get('SERVER_PROBE_TIMEOUT', '0.5'))
+MIN_TIMEOUT = 0.25
+RTT_TIMEOUT_FACTOR = 4
+RTT_SAMPLES = 20
+BACKOFF_BASE = float(os.environ.get('SERVER_BACKOFF_BASE', '60'))
+BACKOFF_MAX = float(os.environ.get('SERVER_BACKOFF_MAX', '3600'))
+HISTORY_RAW_DAYS = int(os.environ.get('SERVER_HISTORY_RAW_DAYS', '2'))
+HISTORY_HOURLY_DAYS = int(os.environ.get('SERVER_HISTORY_HOURLY_DAYS', '90'))
+HISTORY_DAILY_DAYS = int(os.environ.get('SERVER_HISTORY_DAILY_DAYS', '730'))
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
@@ -41,16 +53,33 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         }
     
     if method == 'GET':
-        params = event.get('queryStringParameters', {})
+        params = event.get('queryStringParameters') or {}
         server_id = params.get('server_id')
         
+        if params.get('mode') == 'history':
+            if not server_id:
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'error': 'server_id required'}),
+                    'isBase64Encoded': False
+                }
+            hours = min(max(int(params.get('hours', '24')), 1), HISTORY_DAILY_DAYS * 24)
+            return get_server_history(int(server_id), hours, params.get('resolution'), db_url)
+        
         if server_id:
-            return query_single_server(int(server_id), db_url)
+            with_players = params.get('players') in ('1', 'true')
+            return query_single_server(int(server_id), db_url, with_players)
         else:
-            return query_all_servers(db_url)
+            return get_servers_snapshot(db_url)
     
+    # POST refreshes due servers: used by the scheduled poller; force=true polls all (admin panel)
     if method == 'POST':
-        return query_all_servers(db_url)
+        params = event.get('queryStringParameters') or {}
+        return query_all_servers(db_url, params.get('force') in ('1', 'true'))
     
     return {
         'statusCode': 405,
@@ -62,90 +91,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         'isBase64Encoded': False
     }
 
-def query_source_server(ip: str, port: int, timeout: int = 3) -> Optional[Dict[str, Any]]:
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.settimeout(timeout)
-        
-        # A2S_INFO request packet
-        request = b'\xFF\xFF\xFF\xFFTSource Engine Query\x00'
-        
-        sock.sendto(request, (ip, port))
-        data, _ = sock.recvfrom(4096)
-        sock.close()
-        
-        # Parse response
-        if len(data) < 6:
-            return None
-        
-        # Check for challenge response (0x41 = 'A')
-        if data[4:5] == b'A':
-            # This is a challenge response, we need to send another request with the challenge number
-            challenge = data[5:9]
-            request_with_challenge = b'\xFF\xFF\xFF\xFFTSource Engine Query\x00' + challenge
-            
-            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            sock.settimeout(timeout)
-            sock.sendto(request_with_challenge, (ip, port))
-            data, _ = sock.recvfrom(4096)
-            sock.close()
-        
-        # Skip header (4 bytes FF FF FF FF) and type (1 byte)
-        offset = 5
-        
-        # Read protocol version
-        protocol = data[offset]
-        offset += 1
-        
-        # Read server name (null-terminated string)
-        name_end = data.find(b'\x00', offset)
-        server_name = data[offset:name_end].decode('utf-8', errors='ignore')
-        offset = name_end + 1
-        
-        # Read map (null-terminated string)
-        map_end = data.find(b'\x00', offset)
-        map_name = data[offset:map_end].decode('utf-8', errors='ignore')
-        offset = map_end + 1
-        
-        # Read folder (null-terminated string)
-        folder_end = data.find(b'\x00', offset)
-        offset = folder_end + 1
-        
-        # Read game (null-terminated string)
-        game_end = data.find(b'\x00', offset)
-        game_name = data[offset:game_end].decode('utf-8', errors='ignore')
-        offset = game_end + 1
-        
-        # Read ID (2 bytes, little-endian)
-        if offset + 2 > len(data):
-            return None
-        app_id = struct.unpack('<H', data[offset:offset+2])[0]
-        offset += 2
-        
-        # Read players and max players
-        if offset + 2 <= len(data):
-            players = data[offset]
-            max_players = data[offset + 1]
-            
-            print(f'Server query successful: {ip}:{port} - Map: {map_name}, Players: {players}/{max_players}')
-            
-            return {
-                'status': 'online',
-                'players': players,
-                'max_players': max_players,
-                'map': map_name,
-                'game': game_name
-            }
-        
-        return None
-        
-    except socket.timeout:
-        return {'status': 'offline', 'error': 'timeout'}
-    except Exception as e:
-        return {'status': 'offline', 'error': str(e)}
-
-def query_single_server(server_id: int, db_url: str) -> Dict[str, Any]:
-    conn = psycopg2.connect(db_url)
+def query_single_server(server_id: int, db_url: str, with_players: bool = False) -> Dict[str, Any]:
+    conn = db.connect(db_url)
     cursor = conn.cursor()
     
     try:
@@ -174,7 +121,7 @@ def query_single_server(server_id: int, db_url: str) -> Dict[str, Any]:
         server_id, name, ip_address, port, game_type, map_name, max_players, current_players = server
         
         # Query server status
-        query_result = query_source_server(ip_address, port)
+        query_result = a2s.query_info([(ip_address, port)], POLL_TIMEOUT).get((ip_address, port))
         
         if query_result and query_result['status'] == 'online':
             # Update server status in database
@@ -199,6 +146,10 @@ def query_single_server(server_id: int, db_url: str) -> Dict[str, Any]:
                 'maxPlayers': query_result['max_players'],
                 'map': query_result['map']
             }
+            
+            if with_players:
+                players = a2s.query_players([(ip_address, port)], POLL_TIMEOUT).get((ip_address, port))
+                result['players'] = players if isinstance(players, list) else []
         else:
             # Mark server as offline
             cursor.execute(f"""
@@ -245,73 +196,319 @@ def query_single_server(server_id: int, db_url: str) -> Dict[str, Any]:
             'isBase64Encoded': False
         }
 
-def query_all_servers(db_url: str) -> Dict[str, Any]:
-    conn = psycopg2.connect(db_url)
+def save_server_statuses(cursor, rows: List[Tuple[int, str, int, Optional[int], Optional[str]]]) -> int:
+    '''
+    Write poll results back in a single UPDATE ... FROM (VALUES ...) statement.
+    Rows whose status, players, max players and map are unchanged are skipped.
+    Returns the number of rows actually updated.
+    '''
+    if not rows:
+        return 0
+    
+    updated = execute_values(cursor, """
+        UPDATE t_p15345778_news_shop_project.servers AS s
+        SET status = v.status,
+            current_players = v.current_players,
+            max_players = COALESCE(v.max_players, s.max_players),
+            map = COALESCE(v.map, s.map),
+            updated_at = CURRENT_TIMESTAMP
+        FROM (VALUES %s) AS v (id, status, current_players, max_players, map)
+        WHERE s.id = v.id
+          AND (s.status IS DISTINCT FROM v.status
+               OR s.current_players IS DISTINCT FROM v.current_players
+               OR s.max_players IS DISTINCT FROM COALESCE(v.max_players, s.max_players)
+               OR s.map IS DISTINCT FROM COALESCE(v.map, s.map))
+        RETURNING s.id
+    """, rows, template='(%s::integer, %s::varchar, %s::integer, %s::integer, %s::varchar)', page_size=len(rows), fetch=True)
+    
+    return len(updated)
+
+def save_server_history(cursor, rows: List[Tuple[int, str, int, Optional[int], Optional[str]]]) -> None:
+    '''
+    Append one per-minute sample per server, refresh the hourly and daily
+    rollups of the current buckets and prune data past its retention.
+    '''
+    if not rows:
+        return
+    
+    execute_values(cursor, """
+        INSERT INTO t_p15345778_news_shop_project.server_status_history (server_id, sampled_at, players, is_online)
+        VALUES %s
+        ON CONFLICT (server_id, sampled_at) DO NOTHING
+    """, [(row[0], row[2], row[1] == 'online') for row in rows],
+        template="(%s, date_trunc('minute', CURRENT_TIMESTAMP), %s, %s)", page_size=len(rows))
+    
+    # Hourly buckets are rebuilt from the raw samples of the current hour
+    cursor.execute("""
+        INSERT INTO t_p15345778_news_shop_project.server_status_rollups
+        (server_id, resolution, bucket_start, samples, online_samples, avg_players, max_players)
+        SELECT server_id, 'hour', date_trunc('hour', sampled_at),
+               COUNT(*), COUNT(*) FILTER (WHERE is_online), AVG(players), MAX(players)
+        FROM t_p15345778_news_shop_project.server_status_history
+        WHERE sampled_at >= date_trunc('hour', CURRENT_TIMESTAMP)
+        GROUP BY server_id, date_trunc('hour', sampled_at)
+        ON CONFLICT (server_id, resolution, bucket_start) DO UPDATE
+        SET samples = EXCLUDED.samples,
+            online_samples = EXCLUDED.online_samples,
+            avg_players = EXCLUDED.avg_players,
+            max_players = EXCLUDED.max_players
+    """)
+    
+    # Daily buckets are rebuilt from the hourly rollups of the current day
+    cursor.execute("""
+        INSERT INTO t_p15345778_news_shop_project.server_status_rollups
+        (server_id, resolution, bucket_start, samples, online_samples, avg_players, max_players)
+        SELECT server_id, 'day', date_trunc('day', bucket_start),
+               SUM(samples), SUM(online_samples), SUM(avg_players * samples) / SUM(samples), MAX(max_players)
+        FROM t_p15345778_news_shop_project.server_status_rollups
+        WHERE resolution = 'hour' AND bucket_start >= date_trunc('day', CURRENT_TIMESTAMP)
+        GROUP BY server_id, date_trunc('day', bucket_start)
+        ON CONFLICT (server_id, resolution, bucket_start) DO UPDATE
+        SET samples = EXCLUDED.samples,
+            online_samples = EXCLUDED.online_samples,
+            avg_players = EXCLUDED.avg_players,
+            max_players = EXCLUDED.max_players
+    """)
+    
+    cursor.execute("""
+        DELETE FROM t_p15345778_news_shop_project.server_status_history
+        WHERE sampled_at < CURRENT_TIMESTAMP - make_interval(days => %s)
+    """, (HISTORY_RAW_DAYS,))
+    
+    cursor.execute("""
+        DELETE FROM t_p15345778_news_shop_project.server_status_rollups
+        WHERE (resolution = 'hour' AND bucket_start < CURRENT_TIMESTAMP - make_interval(days => %s))
+           OR (resolution = 'day' AND bucket_start < CURRENT_TIMESTAMP - make_interval(days => %s))
+    """, (HISTORY_HOURLY_DAYS, HISTORY_DAILY_DAYS))
+
+def rtt_timeout(rtt_samples: List[float]) -> float:
+    # 95th percentile of the recent RTTs (ms) with headroom, in seconds
+    ordered = sorted(rtt_samples)
+    return ordered[int(0.95 * (len(ordered) - 1))] / 1000 * RTT_TIMEOUT_FACTOR
+
+def probe_timeout(failures: int, rtt_samples: List[float]) -> float:
+    '''
+    Healthy servers get a timeout derived from the 95th percentile of their
+    recent RTTs, capped by POLL_TIMEOUT. Failing servers get a short probe that
+    does not grow with the misses: PROBE_TIMEOUT, or what their own RTTs need
+    when they have answered before, so a slow server can recover. A server
+    that never answered is probed like a dead one. How often they are probed
+    is up to backoff_delay alone.
+    '''
+    if failures > 0:
+        if rtt_samples:
+            return min(max(rtt_timeout(rtt_samples), PROBE_TIMEOUT), POLL_TIMEOUT)
+        return min(PROBE_TIMEOUT, POLL_TIMEOUT)
+    if not rtt_samples:
+        return POLL_TIMEOUT
+    
+    return min(max(rtt_timeout(rtt_samples), MIN_TIMEOUT), POLL_TIMEOUT)
+
+def backoff_delay(failures: int) -> float:
+    # The first miss is retried on the next cycle, repeated misses back off exponentially
+    if failures < 2:
+        return 0
+    return min(BACKOFF_BASE * 2 ** (failures - 2), BACKOFF_MAX)
+
+def save_poll_health(cursor, rows: List[Tuple[int, int, Optional[float], List[float], float]]) -> None:
+    if not rows:
+        return
+    
+    execute_values(cursor, """
+        INSERT INTO t_p15345778_news_shop_project.server_poll_health AS h
+        (server_id, consecutive_failures, last_rtt_ms, rtt_samples, last_polled_at, next_poll_at)
+        VALUES %s
+        ON CONFLICT (server_id) DO UPDATE
+        SET consecutive_failures = EXCLUDED.consecutive_failures,
+            last_rtt_ms = COALESCE(EXCLUDED.last_rtt_ms, h.last_rtt_ms),
+            rtt_samples = EXCLUDED.rtt_samples,
+            last_polled_at = EXCLUDED.last_polled_at,
+            next_poll_at = EXCLUDED.next_poll_at
+    """, rows, template="(%s, %s, %s, %s::real[], CURRENT_TIMESTAMP, CURRENT_TIMESTAMP + make_interval(secs => %s))",
+        page_size=len(rows))
+
+def refresh_servers(cursor, force: bool = False) -> List[Dict[str, Any]]:
+    '''
+    Poll every active server that is due, write statuses back and store the
+    result as the status snapshot served to GET requests. Servers in backoff
+    keep their last known status until their next_poll_at; `force` polls all.
+    '''
+    # Get all active servers with their polling health
+    cursor.execute("""
+        SELECT s.id, s.name, s.ip_address, s.port, s.game_type, s.map, s.max_players,
+               COALESCE(h.consecutive_failures, 0), COALESCE(h.rtt_samples, '{}'),
+               h.next_poll_at IS NULL OR h.next_poll_at <= CURRENT_TIMESTAMP
+        FROM t_p15345778_news_shop_project.servers s
+        LEFT JOIN t_p15345778_news_shop_project.server_poll_health h ON h.server_id = s.id
+        WHERE s.is_active = true
+        ORDER BY s.order_position, s.id
+    """)
+    
+    servers = cursor.fetchall()
+    results = []
+    
+    due = [server for server in servers if force or server[9]]
+    timeouts = {(server[2], server[3]): probe_timeout(server[7], server[8]) for server in due}
+    
+    # Query all due servers concurrently
+    statuses = a2s.query_info(list(timeouts), POLL_TIMEOUT, timeouts)
+    
+    status_rows = []
+    health_rows = []
+    
+    for server in servers:
+        server_id, name, ip_address, port, game_type, map_name, max_players, failures, rtt_samples, is_due = server
+        
+        query_result = statuses.get((ip_address, port))
+        
+        if force or is_due:
+            if query_result and query_result['status'] == 'online':
+                rtt = query_result['rtt']
+                health_rows.append((server_id, 0, rtt, (list(rtt_samples) + [rtt])[-RTT_SAMPLES:], 0))
+            else:
+                health_rows.append((server_id, failures + 1, None, list(rtt_samples), backoff_delay(failures + 1)))
+        
+        if query_result and query_result['status'] == 'online':
+            status_rows.append((
+                server_id,
+                'online',
+                int(query_result['players']),
+                int(query_result['max_players']),
+                query_result['map']
+            ))
+            
+            results.append({
+                'id': server_id,
+                'name': name,
+                'ipAddress': ip_address,
+                'port': port,
+                'gameType': game_type,
+                'status': 'online',
+                'currentPlayers': query_result['players'],
+                'maxPlayers': query_result['max_players'],
+                'map': query_result['map']
+            })
+        else:
+            # Offline servers keep their last known max players and map
+            status_rows.append((server_id, 'offline', 0, None, None))
+            
+            results.append({
+                'id': server_id,
+                'name': name,
+                'ipAddress': ip_address,
+                'port': port,
+                'gameType': game_type,
+                'status': 'offline',
+                'currentPlayers': 0,
+                'maxPlayers': max_players
+            })
+    
+    updated = save_server_statuses(cursor, status_rows)
+    print(f'Server statuses saved: {updated} updated, {len(status_rows) - updated} unchanged')
+    
+    save_server_history(cursor, status_rows)
+    save_poll_health(cursor, health_rows)
+    print(f'Servers polled: {len(due)} of {len(servers)}, {len(servers) - len(due)} in backoff')
+    
+    cursor.execute("""
+        INSERT INTO t_p15345778_news_shop_project.server_status_snapshot (id, payload, refreshed_at)
+        VALUES (1, %s, CURRENT_TIMESTAMP)
+        ON CONFLICT (id) DO UPDATE
+        SET payload = EXCLUDED.payload,
+            refreshed_at = EXCLUDED.refreshed_at
+    """, (Json(results),))
+    
+    return results
+
+def query_all_servers(db_url: str, force: bool = False) -> Dict[str, Any]:
+    conn = db.connect(db_url)
+    cursor = conn.cursor()
+    
+    try:
+        results = refresh_servers(cursor, force)
+        
+        conn.commit()
+        cursor.close()
+        conn.close()
+        
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'servers': results}),
+            'isBase64Encoded': False
+        }
+        
+    except Exception as e:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': f'Query failed: {str(e)}'}),
+            'isBase64Encoded': False
+        }
+
+def get_servers_snapshot(db_url: str) -> Dict[str, Any]:
+    '''
+    Serve the last status snapshot without touching the game servers. Only the
+    scheduled POST polls and rewrites it; a snapshot older than SNAPSHOT_TTL is
+    still served, marked stale. Before the first poll has stored a snapshot the
+    last statuses saved in the servers table are returned instead.
+    '''
+    conn = db.connect(db_url)
     cursor = conn.cursor()
     
     try:
-        # Get all active servers
         cursor.execute("""
-            SELECT id, name, ip_address, port, game_type, map, max_players
-            FROM t_p15345778_news_shop_project.servers
-            WHERE is_active = true
-            ORDER BY order_position, id
+            SELECT payload,
+                   to_char(refreshed_at, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as refreshed_at,
+                   EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - refreshed_at)) as age
+            FROM t_p15345778_news_shop_project.server_status_snapshot
+            WHERE id = 1 AND refreshed_at IS NOT NULL
         """)
         
-        servers = cursor.fetchall()
-        results = []
+        snapshot = cursor.fetchone()
         
-        for server in servers:
-            server_id, name, ip_address, port, game_type, map_name, max_players = server
+        if snapshot:
+            results, refreshed_at, age = snapshot[0], snapshot[1], float(snapshot[2])
+        else:
+            cursor.execute("""
+                SELECT id, name, ip_address, port, game_type, status, current_players, max_players, map,
+                       to_char(MAX(updated_at) OVER (), 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"'),
+                       EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - MAX(updated_at) OVER ()))
+                FROM t_p15345778_news_shop_project.servers
+                WHERE is_active = true
+                ORDER BY order_position, id
+            """)
             
-            # Query server status
-            query_result = query_source_server(ip_address, port)
+            servers = cursor.fetchall()
+            results = []
             
-            if query_result and query_result['status'] == 'online':
-                # Update server status in database
-                cursor.execute(f"""
-                    UPDATE t_p15345778_news_shop_project.servers
-                    SET status = 'online',
-                        current_players = {int(query_result['players'])},
-                        max_players = {int(query_result['max_players'])},
-                        map = '{query_result['map'].replace("'", "''")}',
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE id = {int(server_id)}
-                """)
-                
-                results.append({
-                    'id': server_id,
-                    'name': name,
-                    'ipAddress': ip_address,
-                    'port': port,
-                    'gameType': game_type,
-                    'status': 'online',
-                    'currentPlayers': query_result['players'],
-                    'maxPlayers': query_result['max_players'],
-                    'map': query_result['map']
-                })
-            else:
-                # Mark server as offline
-                cursor.execute(f"""
-                    UPDATE t_p15345778_news_shop_project.servers
-                    SET status = 'offline',
-                        current_players = 0,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE id = {int(server_id)}
-                """)
-                
-                results.append({
+            for server_id, name, ip_address, port, game_type, status, current_players, max_players, map_name, _, _ in servers:
+                result = {
                     'id': server_id,
                     'name': name,
                     'ipAddress': ip_address,
                     'port': port,
                     'gameType': game_type,
-                    'status': 'offline',
-                    'currentPlayers': 0,
+                    'status': status,
+                    'currentPlayers': current_players if status == 'online' else 0,
                     'maxPlayers': max_players
-                })
+                }
+                if status == 'online':
+                    result['map'] = map_name
+                results.append(result)
+            
+            refreshed_at = servers[0][9] if servers else None
+            age = float(servers[0][10]) if servers and servers[0][10] is not None else SNAPSHOT_TTL
         
-        conn.commit()
         cursor.close()
         conn.close()
         
@@ -321,7 +518,88 @@ def query_all_servers(db_url: str) -> Dict[str, Any]:
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps({'servers': results}),
+            'body': json.dumps({
+                'servers': results,
+                'refreshedAt': refreshed_at,
+                'age': round(age, 1),
+                'stale': snapshot is None or age >= SNAPSHOT_TTL
+            }),
+            'isBase64Encoded': False
+        }
+        
+    except Exception as e:
+        conn.rollback()
+        cursor.close()
+        conn.close()
+        return {
+            'statusCode': 500,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({'error': f'Query failed: {str(e)}'}),
+            'isBase64Encoded': False
+        }
+
+def get_server_history(server_id: int, hours: int, resolution: Optional[str], db_url: str) -> Dict[str, Any]:
+    '''
+    Return a chart series for the last `hours` hours. The resolution follows
+    the window (raw minutes up to a day, hourly up to two weeks, daily beyond)
+    so a 30-day chart reads at most 30 pre-aggregated rows.
+    '''
+    if resolution not in ('minute', 'hour', 'day'):
+        resolution = 'minute' if hours <= 24 else 'hour' if hours <= 24 * 14 else 'day'
+    
+    if resolution == 'minute' and hours > HISTORY_RAW_DAYS * 24:
+        resolution = 'hour'
+    
+    conn = db.connect(db_url)
+    cursor = conn.cursor()
+    
+    try:
+        if resolution == 'minute':
+            cursor.execute("""
+                SELECT to_char(sampled_at, 'YYYY-MM-DD"T"HH24:MI:SS"+00:00"'),
+                       players::real, players, CASE WHEN is_online THEN 1.0 ELSE 0.0 END
+                FROM t_p15345778_news_shop_project.server_status_history
+                WHERE server_id = %s AND sampled_at >= CURRENT_TIMESTAMP - make_interval(hours => %s)
+                ORDER BY sampled_at
+            """, (server_id, hours))
+        else:
+            cursor.execute("""
+                SELECT to_char(bucket_start, 'YYYY-MM-DD"T"HH24:MI:SS"+00:00"'),
+                       avg_players, max_players, online_samples::real / samples
+                FROM t_p15345778_news_shop_project.server_status_rollups
+                WHERE server_id = %s AND resolution = %s
+                  AND bucket_start >= date_trunc(%s, CURRENT_TIMESTAMP - make_interval(hours => %s))
+                ORDER BY bucket_start
+            """, (server_id, resolution, resolution, hours))
+        
+        points = [
+            {
+                'time': row[0],
+                'avgPlayers': round(float(row[1]), 2),
+                'maxPlayers': row[2],
+                'uptime': round(float(row[3]), 3)
+            }
+            for row in cursor.fetchall()
+        ]
+        
+        cursor.close()
+        conn.close()
+        
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': json.dumps({
+                'serverId': server_id,
+                'resolution': resolution,
+                'hours': hours,
+                'points': points
+            }),
             'isBase64Encoded': False
         }
         
@@ -11,7 +11,7 @@ import re
 from typing import Dict, Any
 from urllib.parse import urlencode
 import urllib.request
-import psycopg2
+import db
 from psycopg2.extras import RealDictCursor
 
 STEAM_OPENID_URL = 'https://steamcommunity.com/openid/login'
@@ -21,7 +21,7 @@ def register_or_update_user(user_data: Dict[str, str]) -> None:
     if not db_url:
         return
     
-    conn = psycopg2.connect(db_url)
+    conn = db.connect(db_url)
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
@@ -0,0 +1,236 @@
+'''
+Business: Турнирная сетка single elimination - посев подтверждённых участников, генерация всех матчей
+          одной вставкой и продвижение победителей
+Args: cursor - RealDictCursor внутри транзакции обработчика tournaments
+Returns: generate_bracket / report_match / fetch_bracket
+'''
+
+import random
+from typing import Dict, Any, List, Optional
+
+SEEDINGS = ('ranking', 'random')
+
+# Подтверждённые участники по очкам рейтинга в игре турнира; без рейтинга - в конце, по времени регистрации
+CONFIRMED_PLAYERS = '''
+    SELECT r.steam_id
+    FROM tournament_registrations r
+    JOIN tournaments t ON t.id = r.tournament_id
+    LEFT JOIN player_rankings pr ON pr.steam_id = r.steam_id AND pr.game = LOWER(t.game)
+    WHERE r.tournament_id = %s AND r.confirmed_at IS NOT NULL
+    ORDER BY pr.points DESC NULLS LAST, r.registered_at, r.id
+'''
+
+# Все матчи сетки одним запросом: колонки приходят массивами и разворачиваются unnest
+INSERT_MATCHES = '''
+    INSERT INTO tournament_brackets
+    (tournament_id, round_number, match_number, player1_steam_id, player2_steam_id, winner_steam_id, status)
+    SELECT %(tournament_id)s, m.*
+    FROM unnest(%(round_number)s::integer[], %(match_number)s::integer[], %(player1)s::varchar[],
+                %(player2)s::varchar[], %(winner)s::varchar[], %(status)s::varchar[]) m
+'''
+
+# Результат матча и выход победителя в следующий раунд одним запросом. Чётный матч отдаёт победителя
+# в player1 следующего, нечётный - в player2; матчи-соседи обновляют разные колонки одной строки,
+# и UPDATE применяет SET к её последней версии, поэтому параллельные результаты не затирают друг друга.
+# Без winner_steam_id победитель определяется по счёту. После финала турнир завершается.
+REPORT_MATCH = '''
+    WITH target AS (
+        SELECT id, tournament_id, round_number, match_number, player1_steam_id, player2_steam_id, status,
+               COALESCE(%(winner)s, CASE
+                   WHEN %(player1_score)s > %(player2_score)s THEN player1_steam_id
+                   WHEN %(player2_score)s > %(player1_score)s THEN player2_steam_id
+               END) as winner
+        FROM tournament_brackets
+        WHERE id = %(match_id)s AND tournament_id = %(tournament_id)s
+    ), played AS (
+        UPDATE tournament_brackets b
+        SET player1_score = %(player1_score)s,
+            player2_score = %(player2_score)s,
+            winner_steam_id = target.winner,
+            status = 'completed',
+            updated_at = CURRENT_TIMESTAMP
+        FROM target
+        WHERE b.id = target.id
+          AND b.status = 'pending'
+          AND b.player1_steam_id IS NOT NULL AND b.player2_steam_id IS NOT NULL
+          AND target.winner IN (b.player1_steam_id, b.player2_steam_id)
+        RETURNING b.tournament_id, b.round_number, b.match_number, b.winner_steam_id
+    ), advanced AS (
+        UPDATE tournament_brackets n
+        SET player1_steam_id = CASE WHEN p.match_number %% 2 = 0 THEN p.winner_steam_id ELSE n.player1_steam_id END,
+            player2_steam_id = CASE WHEN p.match_number %% 2 = 1 THEN p.winner_steam_id ELSE n.player2_steam_id END,
+            updated_at = CURRENT_TIMESTAMP
+        FROM played p
+        WHERE n.tournament_id = p.tournament_id
+          AND n.round_number = p.round_number + 1
+          AND n.match_number = p.match_number / 2
+        RETURNING n.round_number, n.match_number
+    ), finished AS (
+        UPDATE tournaments t
+        SET status = 'completed'
+        FROM played
+        WHERE t.id = played.tournament_id AND NOT EXISTS (SELECT 1 FROM advanced)
+    )
+    SELECT
+        target.status,
+        target.player1_steam_id IS NOT NULL AND target.player2_steam_id IS NOT NULL as has_players,
+        target.winner,
+        played.winner_steam_id,
+        advanced.round_number as next_round,
+        advanced.match_number as next_match
+    FROM (SELECT 1) one
+    LEFT JOIN target ON true
+    LEFT JOIN played ON true
+    LEFT JOIN advanced ON true
+'''
+
+# Вся сетка с именами и аватарами игроков одним запросом
+BRACKET = '''
+    SELECT
+        b.id,
+        b.round_number,
+        b.match_number,
+        b.player1_steam_id,
+        b.player2_steam_id,
+        COALESCE(u1.nickname, r1.persona_name) as player1_name,
+        COALESCE(r1.avatar_url, u1.avatar_url) as player1_avatar,
+        COALESCE(u2.nickname, r2.persona_name) as player2_name,
+        COALESCE(r2.avatar_url, u2.avatar_url) as player2_avatar,
+        b.winner_steam_id,
+        b.player1_score,
+        b.player2_score,
+        b.status
+    FROM tournament_brackets b
+    LEFT JOIN tournament_registrations r1 ON r1.tournament_id = b.tournament_id AND r1.steam_id = b.player1_steam_id
+    LEFT JOIN t_p15345778_news_shop_project.users u1 ON u1.steam_id = b.player1_steam_id
+    LEFT JOIN tournament_registrations r2 ON r2.tournament_id = b.tournament_id AND r2.steam_id = b.player2_steam_id
+    LEFT JOIN t_p15345778_news_shop_project.users u2 ON u2.steam_id = b.player2_steam_id
+    WHERE b.tournament_id = %s
+    ORDER BY b.round_number, b.match_number
+'''
+
+
+def seed_order(size: int) -> List[int]:
+    '''
+    Номера посева по позициям сетки размера size (степень двойки): 1 и 2 встречаются только в финале,
+    1-4 - не раньше полуфинала и т.д. Для 8: [1, 8, 4, 5, 2, 7, 3, 6].
+    '''
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for top in order for seed in (top, total - top)]
+    return order
+
+
+def build_bracket(players: List[str]) -> Dict[str, List[Any]]:
+    '''
+    Матчи всех раундов по списку игроков в порядке посева, колонками для INSERT_MATCHES.
+    Сетка дополняется до степени двойки пустыми местами; они достаются сильнейшим посевам
+    и никогда не встречаются друг с другом, такие матчи первого раунда сразу в статусе bye
+    с победителем, который уже стоит во втором раунде. Раунды с 1, матчи в раунде с 0.
+    '''
+    size = 1 << (len(players) - 1).bit_length()
+    slots = [players[seed - 1] if seed <= len(players) else None for seed in seed_order(size)]
+    columns: Dict[str, List[Any]] = {
+        'round_number': [], 'match_number': [], 'player1': [], 'player2': [], 'winner': [], 'status': []
+    }
+
+    round_number = 1
+    while len(slots) > 1:
+        advancing: List[Optional[str]] = []
+        for match_number in range(len(slots) // 2):
+            player1, player2 = slots[2 * match_number], slots[2 * match_number + 1]
+            is_bye = round_number == 1 and (player1 is None or player2 is None)
+            winner = (player1 or player2) if is_bye else None
+
+            columns['round_number'].append(round_number)
+            columns['match_number'].append(match_number)
+            columns['player1'].append((player1 or player2) if is_bye else player1)
+            columns['player2'].append(None if is_bye else player2)
+            columns['winner'].append(winner)
+            columns['status'].append('bye' if is_bye else 'pending')
+            advancing.append(winner)
+
+        slots = advancing
+        round_number += 1
+
+    return columns
+
+
+def generate_bracket(cursor, tournament_id: int, seeding: str) -> Dict[str, Any]:
+    '''
+    Пересоздать сетку турнира. Строка турнира блокируется, как при регистрации и отмене, поэтому состав
+    не меняется, пока идёт посев. Сетку, в которой уже есть сыгранные матчи, не трогает.
+    Returns: {'status': 'generated' | 'not_found' | 'in_play' | 'not_enough_players', ...}
+    '''
+    cursor.execute('''
+        SELECT t.id, EXISTS (
+            SELECT 1 FROM tournament_brackets b WHERE b.tournament_id = t.id AND b.status = 'completed'
+        ) as in_play
+        FROM tournaments t
+        WHERE t.id = %s
+        FOR UPDATE OF t
+    ''', (tournament_id,))
+    tournament = cursor.fetchone()
+    if not tournament:
+        return {'status': 'not_found'}
+    if tournament['in_play']:
+        return {'status': 'in_play'}
+
+    cursor.execute(CONFIRMED_PLAYERS, (tournament_id,))
+    players = [row['steam_id'] for row in cursor.fetchall()]
+    if len(players) < 2:
+        return {'status': 'not_enough_players', 'players': len(players)}
+    if seeding == 'random':
+        random.shuffle(players)
+
+    columns = build_bracket(players)
+    cursor.execute('DELETE FROM tournament_brackets WHERE tournament_id = %s', (tournament_id,))
+    cursor.execute(INSERT_MATCHES, dict(columns, tournament_id=tournament_id))
+
+    return {
+        'status': 'generated',
+        'players': len(players),
+        'rounds': columns['round_number'][-1],
+        'matches': len(columns['status']),
+        'byes': columns['status'].count('bye')
+    }
+
+
+def report_match(cursor, tournament_id: int, match_id: int, player1_score: int, player2_score: int,
+                 winner_steam_id: Optional[str]) -> Dict[str, Any]:
+    '''
+    Записать результат матча и продвинуть победителя.
+    Returns: {'status': 'completed' | 'not_found' | 'already_played' | 'waiting_for_players' | 'no_winner', ...}
+    '''
+    cursor.execute(REPORT_MATCH, {
+        'tournament_id': tournament_id,
+        'match_id': match_id,
+        'player1_score': player1_score,
+        'player2_score': player2_score,
+        'winner': winner_steam_id
+    })
+    result = cursor.fetchone()
+
+    if result['winner_steam_id'] is not None:
+        return {
+            'status': 'completed',
+            'winner_steam_id': result['winner_steam_id'],
+            'next_match': None if result['next_round'] is None else {
+                'round_number': result['next_round'],
+                'match_number': result['next_match']
+            },
+            'champion': result['winner_steam_id'] if result['next_round'] is None else None
+        }
+    if result['status'] is None:
+        return {'status': 'not_found'}
+    if result['status'] != 'pending':
+        return {'status': 'already_played'}
+    if not result['has_players']:
+        return {'status': 'waiting_for_players'}
+    return {'status': 'no_winner'}
+
+
+def fetch_bracket(cursor, tournament_id: int) -> List[Dict[str, Any]]:
+    cursor.execute(BRACKET, (tournament_id,))
+    return [dict(row) for row in cursor.fetchall()]
@@ -9,7 +9,8 @@ import json
 import os
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel, Field, ValidationError
-import psycopg2
+import db
+import bracket
 from psycopg2.extras import RealDictCursor
 
 
@@ -20,11 +21,82 @@ class TournamentRegistration(BaseModel):
     avatar_url: Optional[str] = None
 
 
+# Отмена регистрации (или выход из листа ожидания) и перевод первых из листа ожидания на свободные места.
+# Строка турнира к этому моменту заблокирована в транзакции, поэтому снимок запроса видит всю очередь
+# и места, освобождённые параллельными отменами. Без steam_id только заполняет места (после увеличения
+# max_participants). Записи очереди, чей игрок уже зарегистрирован, удаляются и места не занимают;
+# из очереди удаляются только те, кого действительно вставил INSERT.
+CANCEL_AND_PROMOTE = '''
+    WITH deleted AS (
+        DELETE FROM tournament_registrations
+        WHERE tournament_id = %(tournament_id)s AND steam_id = %(steam_id)s
+        RETURNING id, confirmed_at
+    ), left_waitlist AS (
+        DELETE FROM tournament_waitlist
+        WHERE tournament_id = %(tournament_id)s AND steam_id = %(steam_id)s
+        RETURNING id
+    ), stale AS (
+        DELETE FROM tournament_waitlist w
+        USING tournament_registrations r
+        WHERE w.tournament_id = %(tournament_id)s
+          AND w.steam_id IS DISTINCT FROM %(steam_id)s
+          AND r.tournament_id = w.tournament_id AND r.steam_id = w.steam_id
+        RETURNING w.id
+    ), free AS (
+        SELECT GREATEST(t.max_participants - t.participants_count + (SELECT COUNT(*) FROM deleted), 0) as seats
+        FROM tournaments t
+        WHERE t.id = %(tournament_id)s
+    ), next AS (
+        SELECT w.id, w.steam_id, w.persona_name, w.avatar_url
+        FROM tournament_waitlist w
+        WHERE w.tournament_id = %(tournament_id)s
+          AND w.steam_id IS DISTINCT FROM %(steam_id)s
+          AND NOT EXISTS (
+              SELECT 1 FROM tournament_registrations r
+              WHERE r.tournament_id = w.tournament_id AND r.steam_id = w.steam_id
+          )
+        ORDER BY w.id
+        LIMIT (SELECT seats FROM free)
+        FOR UPDATE
+    ), registered AS (
+        INSERT INTO tournament_registrations (tournament_id, steam_id, persona_name, avatar_url)
+        SELECT %(tournament_id)s, steam_id, persona_name, avatar_url
+        FROM next
+        ORDER BY id
+        ON CONFLICT (tournament_id, steam_id) DO NOTHING
+        RETURNING steam_id
+    ), promoted AS (
+        DELETE FROM tournament_waitlist w
+        USING registered
+        WHERE w.tournament_id = %(tournament_id)s AND w.steam_id = registered.steam_id
+        RETURNING w.id
+    ), counted AS (
+        UPDATE tournaments t
+        SET participants_count = t.participants_count - (SELECT COUNT(*) FROM deleted) + (SELECT COUNT(*) FROM registered),
+            confirmed_count = t.confirmed_count - (SELECT COUNT(*) FROM deleted WHERE confirmed_at IS NOT NULL),
+            waitlist_count = t.waitlist_count - (SELECT COUNT(*) FROM left_waitlist) - (SELECT COUNT(*) FROM promoted)
+                - (SELECT COUNT(*) FROM stale)
+        WHERE t.id = %(tournament_id)s
+          AND (EXISTS (SELECT 1 FROM deleted) OR EXISTS (SELECT 1 FROM left_waitlist) OR EXISTS (SELECT 1 FROM promoted)
+               OR EXISTS (SELECT 1 FROM stale))
+    )
+    SELECT 
+        (SELECT COUNT(*) FROM deleted) as cancelled,
+        (SELECT COUNT(*) FROM left_waitlist) as left_waitlist,
+        ARRAY(SELECT steam_id FROM registered) as promoted
+'''
+
+
+def cancel_and_promote(cursor, tournament_id: int, steam_id: Optional[str]) -> Dict[str, Any]:
+    cursor.execute(CANCEL_AND_PROMOTE, {'tournament_id': tournament_id, 'steam_id': steam_id})
+    return cursor.fetchone()
+
+
 def get_db_connection():
     database_url = os.environ.get('DATABASE_URL')
     if not database_url:
         raise ValueError('DATABASE_URL not configured')
-    return psycopg2.connect(database_url)
+    return db.connect(database_url)
 
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -55,6 +127,20 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             steam_id = params.get('steam_id')
             tournament_id = params.get('tournament_id')
             
+            # Вся турнирная сетка одним запросом
+            if tournament_id and params.get('bracket') == 'true':
+                matches = bracket.fetch_bracket(cursor, int(tournament_id))
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'isBase64Encoded': False,
+                    'body': json.dumps({'tournament_id': int(tournament_id), 'bracket': matches})
+                }
+            
             # Получить детали турнира с участниками
             if tournament_id:
                 cursor.execute('''
@@ -68,11 +154,11 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         t.tournament_type,
                         t.game,
                         to_char(t.start_date, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as start_date,
-                        COUNT(tr.id) as participants_count
+                        t.participants_count,
+                        t.confirmed_count,
+                        t.waitlist_count
                     FROM tournaments t
-                    LEFT JOIN tournament_registrations tr ON t.id = tr.tournament_id
                     WHERE t.id = %s
-                    GROUP BY t.id
                 ''', (tournament_id,))
                 
                 tournament = cursor.fetchone()
@@ -105,8 +191,24 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 
                 participants = cursor.fetchall()
                 
+                # Лист ожидания в порядке очереди
+                cursor.execute('''
+                    SELECT 
+                        w.steam_id,
+                        COALESCE(u.nickname, w.persona_name) as persona_name,
+                        w.avatar_url,
+                        to_char(w.joined_at, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as joined_at
+                    FROM tournament_waitlist w
+                    LEFT JOIN t_p15345778_news_shop_project.users u ON w.steam_id = u.steam_id
+                    WHERE w.tournament_id = %s
+                    ORDER BY w.id
+                ''', (tournament_id,))
+                
+                waitlist = cursor.fetchall()
+                
                 result = dict(tournament)
                 result['participants'] = [dict(p) for p in participants]
+                result['waitlist'] = [dict(w) for w in waitlist]
                 
                 return {
                     'statusCode': 200,
@@ -118,9 +220,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps(result)
                 }
             
-            # Получить список турниров
+            # Получить список турниров. Счётчики участников хранятся в tournaments
+            # и обновляются при регистрации, отмене и подтверждении
             if steam_id:
-                # Получить турниры с информацией о регистрации пользователя
+                # Регистрация пользователя - одна строка на турнир по уникальному (tournament_id, steam_id)
                 cursor.execute('''
                     SELECT 
                         t.id,
@@ -132,19 +235,15 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         t.tournament_type,
                         t.game,
                         to_char(t.start_date, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as start_date,
-                        COUNT(tr.id) as participants_count,
-                        EXISTS(
-                            SELECT 1 FROM tournament_registrations 
-                            WHERE tournament_id = t.id AND steam_id = %s
-                        ) as is_registered,
-                        (
-                            SELECT to_char(confirmed_at, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"')
-                            FROM tournament_registrations 
-                            WHERE tournament_id = t.id AND steam_id = %s
-                        ) as confirmed_at
+                        t.participants_count,
+                        t.confirmed_count,
+                        t.waitlist_count,
+                        tr.id IS NOT NULL as is_registered,
+                        to_char(tr.confirmed_at, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as confirmed_at,
+                        w.id IS NOT NULL as is_waitlisted
                     FROM tournaments t
-                    LEFT JOIN tournament_registrations tr ON t.id = tr.tournament_id
-                    GROUP BY t.id
+                    LEFT JOIN tournament_registrations tr ON tr.tournament_id = t.id AND tr.steam_id = %s
+                    LEFT JOIN tournament_waitlist w ON w.tournament_id = t.id AND w.steam_id = %s
                     ORDER BY t.start_date
                 ''', (steam_id, steam_id))
             else:
@@ -160,10 +259,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         t.tournament_type,
                         t.game,
                         to_char(t.start_date, 'YYYY-MM-DD"T"HH24:MI:SS.MS"+00:00"') as start_date,
-                        COUNT(tr.id) as participants_count
+                        t.participants_count,
+                        t.confirmed_count,
+                        t.waitlist_count
                     FROM tournaments t
-                    LEFT JOIN tournament_registrations tr ON t.id = tr.tournament_id
-                    GROUP BY t.id
                     ORDER BY t.start_date
                 ''')
             
@@ -186,6 +285,121 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             admin_steam_id = event.get('headers', {}).get('X-Admin-Steam-Id')
             print(f"Admin Steam ID: {admin_steam_id}")
             
+            # Админ генерирует сетку или вносит результат матча
+            if body_data.get('action') in ('generate_bracket', 'report_match'):
+                cursor.execute('SELECT is_admin FROM users WHERE steam_id = %s', (admin_steam_id or '',))
+                result = cursor.fetchone()
+                
+                if not result or not result['is_admin']:
+                    return {
+                        'statusCode': 403,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'isBase64Encoded': False,
+                        'body': json.dumps({'error': 'Admin rights required'})
+                    }
+                
+                if body_data['action'] == 'generate_bracket':
+                    seeding = body_data.get('seeding', 'ranking')
+                    try:
+                        tournament_id = int(body_data['tournament_id'])
+                    except (KeyError, TypeError, ValueError):
+                        tournament_id = None
+                    if not tournament_id or seeding not in bracket.SEEDINGS:
+                        return {
+                            'statusCode': 400,
+                            'headers': {
+                                'Content-Type': 'application/json',
+                                'Access-Control-Allow-Origin': '*'
+                            },
+                            'isBase64Encoded': False,
+                            'body': json.dumps({'error': 'tournament_id is required, seeding must be ranking or random'})
+                        }
+                    
+                    generated = bracket.generate_bracket(cursor, tournament_id, seeding)
+                    
+                    if generated['status'] != 'generated':
+                        conn.rollback()
+                        status_code, error = {
+                            'not_found': (404, 'Турнир не найден'),
+                            'in_play': (409, 'В сетке уже есть сыгранные матчи'),
+                            'not_enough_players': (400, 'Для сетки нужно минимум 2 подтверждённых участника')
+                        }[generated['status']]
+                        
+                        return {
+                            'statusCode': status_code,
+                            'headers': {
+                                'Content-Type': 'application/json',
+                                'Access-Control-Allow-Origin': '*'
+                            },
+                            'isBase64Encoded': False,
+                            'body': json.dumps({'error': error, 'status': generated['status']})
+                        }
+                    
+                    conn.commit()
+                    
+                    return {
+                        'statusCode': 201,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'isBase64Encoded': False,
+                        'body': json.dumps(generated)
+                    }
+                
+                try:
+                    match_id = int(body_data['match_id'])
+                    tournament_id = int(body_data['tournament_id'])
+                    player1_score = int(body_data.get('player1_score', 0))
+                    player2_score = int(body_data.get('player2_score', 0))
+                except (KeyError, TypeError, ValueError):
+                    return {
+                        'statusCode': 400,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'isBase64Encoded': False,
+                        'body': json.dumps({'error': 'tournament_id, match_id and integer scores are required'})
+                    }
+                
+                reported = bracket.report_match(cursor, tournament_id, match_id, player1_score, player2_score,
+                                                body_data.get('winner_steam_id'))
+                
+                if reported['status'] != 'completed':
+                    conn.rollback()
+                    status_code, error = {
+                        'not_found': (404, 'Матч не найден'),
+                        'already_played': (409, 'Результат матча уже внесён'),
+                        'waiting_for_players': (409, 'Соперники в матче ещё не определены'),
+                        'no_winner': (400, 'Победитель должен быть игроком матча, а при ничьей - указан явно')
+                    }[reported['status']]
+                    
+                    return {
+                        'statusCode': status_code,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'isBase64Encoded': False,
+                        'body': json.dumps({'error': error, 'status': reported['status']})
+                    }
+                
+                conn.commit()
+                
+                return {
+                    'statusCode': 200,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'isBase64Encoded': False,
+                    'body': json.dumps(reported)
+                }
+            
             # Админ создает турнир
             if admin_steam_id and 'name' in body_data:
                 escaped_steam_id = admin_steam_id.replace("'", "''")
@@ -251,37 +465,91 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             # Пользователь регистрируется на турнир
             registration = TournamentRegistration(**body_data)
             
-            # Проверить, не зарегистрирован ли уже пользователь
+            # Регистрация одним запросом. Строка турнира блокируется (FOR UPDATE), поэтому регистрации и отмены
+            # на один турнир проходят по очереди, а has_seat после ожидания считается по актуальному
+            # participants_count. Есть место - регистрация, нет - конец листа ожидания.
+            # Повтор отсекает уникальный (tournament_id, steam_id) через ON CONFLICT DO NOTHING.
             cursor.execute('''
-                SELECT id FROM tournament_registrations 
-                WHERE tournament_id = %s AND steam_id = %s
-            ''', (registration.tournament_id, registration.steam_id))
+                WITH info AS (
+                    SELECT id,
+                           COALESCE(start_date - INTERVAL '1 hour' <= (NOW() AT TIME ZONE 'UTC'), false) as is_closed,
+                           EXISTS (
+                               SELECT 1 FROM tournament_registrations
+                               WHERE tournament_id = tournaments.id AND steam_id = %(steam_id)s
+                           ) as is_registered,
+                           EXISTS (
+                               SELECT 1 FROM tournament_waitlist
+                               WHERE tournament_id = tournaments.id AND steam_id = %(steam_id)s
+                           ) as is_waitlisted
+                    FROM tournaments
+                    WHERE id = %(tournament_id)s
+                ), slot AS (
+                    SELECT t.id, t.participants_count < t.max_participants as has_seat, t.waitlist_count
+                    FROM tournaments t, info
+                    WHERE t.id = info.id
+                      AND NOT info.is_closed AND NOT info.is_registered AND NOT info.is_waitlisted
+                    FOR UPDATE OF t
+                ), inserted AS (
+                    INSERT INTO tournament_registrations 
+                    (tournament_id, steam_id, persona_name, avatar_url)
+                    SELECT id, %(steam_id)s, %(persona_name)s, %(avatar_url)s
+                    FROM slot
+                    WHERE has_seat
+                    ON CONFLICT (tournament_id, steam_id) DO NOTHING
+                    RETURNING id, registered_at
+                ), queued AS (
+                    INSERT INTO tournament_waitlist
+                    (tournament_id, steam_id, persona_name, avatar_url)
+                    SELECT id, %(steam_id)s, %(persona_name)s, %(avatar_url)s
+                    FROM slot
+                    WHERE NOT has_seat
+                    ON CONFLICT (tournament_id, steam_id) DO NOTHING
+                    RETURNING id, joined_at
+                ), counted AS (
+                    UPDATE tournaments t
+                    SET participants_count = t.participants_count + (SELECT COUNT(*) FROM inserted),
+                        waitlist_count = t.waitlist_count + (SELECT COUNT(*) FROM queued)
+                    FROM slot
+                    WHERE t.id = slot.id AND (EXISTS (SELECT 1 FROM inserted) OR EXISTS (SELECT 1 FROM queued))
+                )
+                SELECT 
+                    info.id as tournament_id,
+                    info.is_closed,
+                    info.is_registered,
+                    info.is_waitlisted,
+                    inserted.id,
+                    inserted.registered_at,
+                    queued.id as waitlist_id,
+                    queued.joined_at,
+                    slot.waitlist_count + 1 as position
+                FROM (SELECT 1) one
+                LEFT JOIN info ON true
+                LEFT JOIN slot ON true
+                LEFT JOIN inserted ON true
+                LEFT JOIN queued ON true
+            ''', {
+                'tournament_id': registration.tournament_id,
+                'steam_id': registration.steam_id,
+                'persona_name': registration.persona_name,
+                'avatar_url': registration.avatar_url
+            })
             
-            if cursor.fetchone():
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'error': 'Вы уже зарегистрированы на этот турнир'})
-                }
+            result = cursor.fetchone()
             
-            # Проверить, есть ли свободные места и время до начала
-            cursor.execute('''
-                SELECT 
-                    t.max_participants,
-                    t.start_date,
-                    COUNT(tr.id) as participants_count
-                FROM tournaments t
-                LEFT JOIN tournament_registrations tr ON t.id = tr.tournament_id
-                WHERE t.id = %s
-                GROUP BY t.id, t.max_participants, t.start_date
-            ''', (registration.tournament_id,))
-            
-            tournament_info = cursor.fetchone()
-            if not tournament_info:
+            if result['waitlist_id'] is not None:
+                # Снимок запроса сделан до блокировки: параллельный запрос того же игрока мог за это время
+                # занять место (или его перевели из листа ожидания). Новый снимок это видит - тогда откат.
+                cursor.execute('''
+                    SELECT 1 FROM tournament_registrations WHERE tournament_id = %s AND steam_id = %s
+                ''', (registration.tournament_id, registration.steam_id))
+                if cursor.fetchone():
+                    conn.rollback()
+                    result['waitlist_id'] = None
+                    result['is_registered'] = True
+            
+            conn.commit()
+            
+            if result['tournament_id'] is None:
                 return {
                     'statusCode': 404,
                     'headers': {
@@ -289,58 +557,46 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'Access-Control-Allow-Origin': '*'
                     },
                     'isBase64Encoded': False,
-                    'body': json.dumps({'error': 'Турнир не найден'})
+                    'body': json.dumps({'error': 'Турнир не найден', 'status': 'not_found'})
                 }
             
-            # Проверить, не осталось ли меньше часа до начала турнира
-            from datetime import datetime, timezone, timedelta
-            start_date = tournament_info['start_date']
-            
-            # Убедимся, что start_date имеет timezone
-            if start_date.tzinfo is None:
-                start_date = start_date.replace(tzinfo=timezone.utc)
-            
-            now = datetime.now(timezone.utc)
-            one_hour_before = start_date - timedelta(hours=1)
-            
-            if now >= one_hour_before:
+            if result['waitlist_id'] is not None:
                 return {
-                    'statusCode': 400,
+                    'statusCode': 202,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': '*'
                     },
                     'isBase64Encoded': False,
-                    'body': json.dumps({'error': 'Регистрация закрыта. До начала турнира осталось менее часа.'})
+                    'body': json.dumps({
+                        'id': result['waitlist_id'],
+                        'joined_at': str(result['joined_at']),
+                        'status': 'waitlisted',
+                        'position': result['position'],
+                        'message': 'Мест нет - вы в листе ожидания'
+                    })
                 }
             
-            if tournament_info['participants_count'] >= tournament_info['max_participants']:
+            if result['id'] is None:
+                # Без вставки и без закрытия - повтор: виден в снимке или отсечён ON CONFLICT,
+                # если был закоммичен, пока запрос ждал блокировку
+                if result['is_waitlisted']:
+                    outcome, error = 'duplicate', 'Вы уже в листе ожидания этого турнира'
+                elif result['is_closed'] and not result['is_registered']:
+                    outcome, error = 'closed', 'Регистрация закрыта. До начала турнира осталось менее часа.'
+                else:
+                    outcome, error = 'duplicate', 'Вы уже зарегистрированы на этот турнир'
+                
                 return {
-                    'statusCode': 400,
+                    'statusCode': 409,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': '*'
                     },
                     'isBase64Encoded': False,
-                    'body': json.dumps({'error': 'Нет свободных мест на турнир'})
+                    'body': json.dumps({'error': error, 'status': outcome})
                 }
             
-            # Зарегистрировать пользователя
-            cursor.execute('''
-                INSERT INTO tournament_registrations 
-                (tournament_id, steam_id, persona_name, avatar_url)
-                VALUES (%s, %s, %s, %s)
-                RETURNING id, registered_at
-            ''', (
-                registration.tournament_id,
-                registration.steam_id,
-                registration.persona_name,
-                registration.avatar_url
-            ))
-            
-            result = cursor.fetchone()
-            conn.commit()
-            
             return {
                 'statusCode': 201,
                 'headers': {
@@ -351,6 +607,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'body': json.dumps({
                     'id': result['id'],
                     'registered_at': str(result['registered_at']),
+                    'status': 'registered',
                     'message': 'Регистрация успешна'
                 })
             }
@@ -464,6 +721,10 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'Tournament not found'})
                 }
             
+            # UPDATE уже заблокировал строку турнира; добавленные места занимает лист ожидания
+            if 'max_participants' in body_data:
+                cancel_and_promote(cursor, int(tournament_id), None)
+            
             conn.commit()
             
             return {
@@ -484,15 +745,13 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             
             # Отмена регистрации пользователя
             if tournament_id and steam_id:
-                escaped_steam_id = steam_id.replace("'", "''")
-                
-                cursor.execute(
-                    f"DELETE FROM tournament_registrations WHERE tournament_id = {int(tournament_id)} AND steam_id = '{escaped_steam_id}' RETURNING id"
-                )
-                
-                deleted = cursor.fetchone()
+                # Сначала блокируется строка турнира: отмены и регистрации на один турнир идут по очереди,
+                # и следующий запрос уже видит лист ожидания целиком. Освободившееся место занимает
+                # первый из листа ожидания в той же транзакции.
+                cursor.execute('SELECT id FROM tournaments WHERE id = %s FOR UPDATE', (int(tournament_id),))
+                cancelled = cancel_and_promote(cursor, int(tournament_id), steam_id) if cursor.fetchone() else None
                 
-                if not deleted:
+                if not cancelled or not (cancelled['cancelled'] or cancelled['left_waitlist']):
                     return {
                         'statusCode': 404,
                         'headers': {
@@ -505,6 +764,17 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 
                 conn.commit()
                 
+                if not cancelled['cancelled']:
+                    return {
+                        'statusCode': 200,
+                        'headers': {
+                            'Content-Type': 'application/json',
+                            'Access-Control-Allow-Origin': '*'
+                        },
+                        'isBase64Encoded': False,
+                        'body': json.dumps({'message': 'Вы покинули лист ожидания', 'status': 'left_waitlist'})
+                    }
+                
                 return {
                     'statusCode': 200,
                     'headers': {
@@ -512,7 +782,11 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         'Access-Control-Allow-Origin': '*'
                     },
                     'isBase64Encoded': False,
-                    'body': json.dumps({'message': 'Регистрация отменена'})
+                    'body': json.dumps({
+                        'message': 'Регистрация отменена',
+                        'status': 'cancelled',
+                        'promoted': cancelled['promoted']
+                    })
                 }
             
             # Удаление турнира (только админ)
@@ -557,6 +831,8 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 }
             
             cursor.execute(f"DELETE FROM tournament_registrations WHERE tournament_id = {int(tournament_id)}")
+            cursor.execute(f"DELETE FROM tournament_waitlist WHERE tournament_id = {int(tournament_id)}")
+            cursor.execute(f"DELETE FROM tournament_brackets WHERE tournament_id = {int(tournament_id)}")
             cursor.execute(f"DELETE FROM tournaments WHERE id = {int(tournament_id)}")
             conn.commit()
             
@@ -587,15 +863,34 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'tournament_id and steam_id required'})
                 }
             
-            escaped_steam_id = steam_id.replace("'", "''")
+            # Сначала строка турнира, как при отмене и регистрации. Иначе подтверждение (регистрация, затем турнир)
+            # и отмена (турнир, затем регистрация) взаимно блокируются.
+            cursor.execute('SELECT id FROM tournaments WHERE id = %s FOR UPDATE', (int(tournament_id),))
             
-            # Проверяем, что регистрация существует
-            cursor.execute(
-                f"SELECT * FROM tournament_registrations WHERE tournament_id = {int(tournament_id)} AND steam_id = '{escaped_steam_id}'"
-            )
+            # Обновляем время подтверждения; confirmed_count растёт только при первом подтверждении.
+            # FOR UPDATE: повторное подтверждение, ждущее на блокировке, увидит уже заполненный confirmed_at
+            cursor.execute('''
+                WITH registration AS (
+                    SELECT id, confirmed_at FROM tournament_registrations
+                    WHERE tournament_id = %s AND steam_id = %s
+                    FOR UPDATE
+                ), confirmed AS (
+                    UPDATE tournament_registrations tr
+                    SET confirmed_at = NOW()
+                    FROM registration
+                    WHERE tr.id = registration.id
+                    RETURNING tr.tournament_id, registration.confirmed_at IS NULL as first_time
+                ), counted AS (
+                    UPDATE tournaments t
+                    SET confirmed_count = t.confirmed_count + 1
+                    FROM confirmed
+                    WHERE t.id = confirmed.tournament_id AND confirmed.first_time
+                )
+                SELECT COUNT(*) as confirmed FROM confirmed
+            ''', (int(tournament_id), steam_id))
             registration = cursor.fetchone()
             
-            if not registration:
+            if not registration['confirmed']:
                 return {
                     'statusCode': 404,
                     'headers': {
@@ -606,10 +901,6 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'Регистрация не найдена'})
                 }
             
-            # Обновляем время подтверждения
-            cursor.execute(
-                f"UPDATE tournament_registrations SET confirmed_at = NOW() WHERE tournament_id = {int(tournament_id)} AND steam_id = '{escaped_steam_id}'"
-            )
             conn.commit()
             
             return {
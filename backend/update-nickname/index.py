@@ -8,7 +8,7 @@ Returns: HTTP response with success status
 import json
 import os
 from typing import Dict, Any
-import psycopg2
+import db
 from psycopg2.extras import RealDictCursor
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -66,7 +66,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'isBase64Encoded': False
             }
         
-        conn = psycopg2.connect(db_url)
+        conn = db.connect(db_url)
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
         try:
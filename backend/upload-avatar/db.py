@@ -0,0 +1,85 @@
+'''
+Business: PostgreSQL connection pool kept alive across warm invocations of the function
+Args: dsn - connection string (DATABASE_URL); DB_POOL_MAX_SIZE - idle connections kept
+Returns: psycopg2 connections whose close() hands them back to the pool
+'''
+
+import os
+import threading
+import time
+from typing import Dict, List, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+# Connections idle longer than this are pinged before they are reused
+HEALTH_CHECK_AFTER = float(os.environ.get('DB_POOL_HEALTH_CHECK_AFTER', '30'))
+
+_idle: Dict[str, List[Tuple['PooledConnection', float]]] = {}
+_lock = threading.Lock()
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    '''Connection that returns to the pool on close() instead of disconnecting.'''
+
+    pool_key = ''
+
+    def close(self) -> None:
+        release(self)
+
+    def discard(self) -> None:
+        if not self.closed:
+            super().close()
+
+
+def is_alive(conn: PooledConnection) -> bool:
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def connect(dsn: str) -> PooledConnection:
+    while True:
+        with _lock:
+            idle = _idle.get(dsn)
+            if not idle:
+                break
+            conn, released_at = idle.pop()
+
+        if conn.closed:
+            continue
+        if time.monotonic() - released_at < HEALTH_CHECK_AFTER or is_alive(conn):
+            return conn
+        conn.discard()
+
+    conn = psycopg2.connect(dsn, connection_factory=PooledConnection)
+    conn.pool_key = dsn
+    return conn
+
+
+def release(conn: PooledConnection) -> None:
+    if conn.closed:
+        return
+
+    # Leave no transaction or session change behind for the next borrower
+    try:
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        if conn.autocommit:
+            conn.autocommit = False
+    except psycopg2.Error:
+        conn.discard()
+        return
+
+    with _lock:
+        idle = _idle.setdefault(conn.pool_key, [])
+        if len(idle) < POOL_MAX_SIZE:
+            idle.append((conn, time.monotonic()))
+            return
+
+    conn.discard()
@@ -1,7 +1,7 @@
 import json
 import base64
 import os
-import psycopg2
+import db
 from typing import Dict, Any
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -67,7 +67,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         avatar_url = f"data:image/png;base64,{image_data}"
         
         dsn = os.environ.get('DATABASE_URL')
-        conn = psycopg2.connect(dsn)
+        conn = db.connect(dsn)
         cur = conn.cursor()
         
         cur.execute(
@@ -8,7 +8,7 @@ Returns: HTTP response with users data or operation confirmation
 import json
 import os
 from typing import Dict, Any
-import psycopg2
+import db
 from psycopg2.extras import RealDictCursor
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -39,7 +39,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'isBase64Encoded': False
         }
     
-    conn = psycopg2.connect(db_url)
+    conn = db.connect(db_url)
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
@@ -0,0 +1,6 @@
+-- Snapshot of the last server status poll, served by GET server-status
+CREATE TABLE IF NOT EXISTS t_p15345778_news_shop_project.server_status_snapshot (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    payload JSONB NOT NULL DEFAULT '[]',
+    refreshed_at TIMESTAMP
+);
@@ -0,0 +1,27 @@
+-- Per-minute status samples written by the server-status poller
+CREATE TABLE IF NOT EXISTS t_p15345778_news_shop_project.server_status_history (
+    server_id INTEGER NOT NULL,
+    sampled_at TIMESTAMP NOT NULL,
+    players SMALLINT NOT NULL DEFAULT 0,
+    is_online BOOLEAN NOT NULL,
+    PRIMARY KEY (server_id, sampled_at)
+);
+
+-- Samples are append-only in time order, so a BRIN index keeps retention pruning cheap
+CREATE INDEX IF NOT EXISTS idx_server_status_history_sampled_at
+    ON t_p15345778_news_shop_project.server_status_history USING BRIN (sampled_at);
+
+-- Hourly and daily aggregates used for long chart windows
+CREATE TABLE IF NOT EXISTS t_p15345778_news_shop_project.server_status_rollups (
+    server_id INTEGER NOT NULL,
+    resolution VARCHAR(10) NOT NULL CHECK (resolution IN ('hour', 'day')),
+    bucket_start TIMESTAMP NOT NULL,
+    samples INTEGER NOT NULL,
+    online_samples INTEGER NOT NULL,
+    avg_players REAL NOT NULL,
+    max_players SMALLINT NOT NULL,
+    PRIMARY KEY (server_id, resolution, bucket_start)
+);
+
+CREATE INDEX IF NOT EXISTS idx_server_status_rollups_bucket
+    ON t_p15345778_news_shop_project.server_status_rollups (resolution, bucket_start);
@@ -0,0 +1,9 @@
+-- Per-server polling health used by the server-status scheduler
+CREATE TABLE IF NOT EXISTS t_p15345778_news_shop_project.server_poll_health (
+    server_id INTEGER PRIMARY KEY,
+    consecutive_failures INTEGER NOT NULL DEFAULT 0,
+    last_rtt_ms REAL,
+    rtt_samples REAL[] NOT NULL DEFAULT '{}',
+    last_polled_at TIMESTAMP,
+    next_poll_at TIMESTAMP
+);
@@ -0,0 +1,11 @@
+-- Denormalized like counter kept in step by the comments like toggle
+ALTER TABLE t_p15345778_news_shop_project.comments ADD COLUMN IF NOT EXISTS likes_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE t_p15345778_news_shop_project.comments c
+SET likes_count = l.likes_count
+FROM (
+    SELECT comment_id, COUNT(*) AS likes_count
+    FROM t_p15345778_news_shop_project.comment_likes
+    GROUP BY comment_id
+) l
+WHERE l.comment_id = c.id;
@@ -0,0 +1,3 @@
+-- Keyset pagination of top-level comments and reply threads per news item
+CREATE INDEX IF NOT EXISTS idx_comments_news_parent_created
+    ON t_p15345778_news_shop_project.comments (news_id, parent_comment_id, created_at, id);
@@ -0,0 +1,13 @@
+-- Per-news comment and like totals, maintained by the comments function
+CREATE TABLE IF NOT EXISTS t_p15345778_news_shop_project.news_comment_stats (
+    news_id INTEGER PRIMARY KEY,
+    comments_count INTEGER NOT NULL DEFAULT 0,
+    likes_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO t_p15345778_news_shop_project.news_comment_stats (news_id, comments_count, likes_count)
+SELECT news_id, COUNT(*), COALESCE(SUM(likes_count), 0)
+FROM t_p15345778_news_shop_project.comments
+GROUP BY news_id
+ON CONFLICT (news_id) DO NOTHING;
@@ -0,0 +1,8 @@
+-- Incremental chat polling: new messages by id range, hides by a moderation sequence
+ALTER TABLE t_p15345778_news_shop_project.chat_settings ADD COLUMN IF NOT EXISTS hidden_seq BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE t_p15345778_news_shop_project.chat_messages ADD COLUMN IF NOT EXISTS hidden_seq BIGINT;
+
+CREATE INDEX IF NOT EXISTS idx_chat_messages_hidden_id
+    ON t_p15345778_news_shop_project.chat_messages (is_hidden, id);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_hidden_seq
+    ON t_p15345778_news_shop_project.chat_messages (hidden_seq) WHERE hidden_seq IS NOT NULL;
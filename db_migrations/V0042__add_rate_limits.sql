@@ -0,0 +1,9 @@
+-- Token buckets shared by all function instances, one row per limited key (e.g. chat:<steam_id>)
+CREATE TABLE IF NOT EXISTS t_p15345778_news_shop_project.rate_limits (
+    bucket_key TEXT PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Rows of keys idle long enough to be full again can be deleted at any time
+CREATE INDEX IF NOT EXISTS idx_rate_limits_updated_at ON t_p15345778_news_shop_project.rate_limits (updated_at);
@@ -0,0 +1,24 @@
+-- Chat history archive: hidden and old messages are moved here in batches (backend/chat/archive.py),
+-- so chat_messages only holds the live window however long the history gets
+CREATE TABLE IF NOT EXISTS t_p15345778_news_shop_project.chat_messages_archive (
+    id INTEGER PRIMARY KEY,
+    steam_id VARCHAR(255) NOT NULL,
+    persona_name VARCHAR(255) NOT NULL,
+    avatar_url TEXT,
+    message TEXT NOT NULL,
+    created_at TIMESTAMP,
+    is_hidden BOOLEAN DEFAULT FALSE,
+    reply_to_message_id INTEGER NULL,
+    hidden_seq BIGINT,
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Moderator history reads page by id, optionally for one author
+CREATE INDEX IF NOT EXISTS idx_chat_messages_archive_steam_id
+    ON t_p15345778_news_shop_project.chat_messages_archive (steam_id, id);
+-- Rows arrive in time order, so a BRIN index covers date ranges at a fraction of a btree's size
+CREATE INDEX IF NOT EXISTS idx_chat_messages_archive_created_at
+    ON t_p15345778_news_shop_project.chat_messages_archive USING BRIN (created_at);
+-- Delta polls still report hides of messages that were archived since the client's cursor
+CREATE INDEX IF NOT EXISTS idx_chat_messages_archive_hidden_seq
+    ON t_p15345778_news_shop_project.chat_messages_archive (hidden_seq) WHERE hidden_seq IS NOT NULL;
@@ -0,0 +1,16 @@
+-- Denormalized participant counters kept in step by the tournaments function on register, cancel and confirm
+ALTER TABLE t_p15345778_news_shop_project.tournaments ADD COLUMN IF NOT EXISTS participants_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE t_p15345778_news_shop_project.tournaments ADD COLUMN IF NOT EXISTS confirmed_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE t_p15345778_news_shop_project.tournaments t
+SET participants_count = r.participants_count,
+    confirmed_count = r.confirmed_count
+FROM (
+    SELECT tournament_id, COUNT(*) AS participants_count, COUNT(confirmed_at) AS confirmed_count
+    FROM t_p15345778_news_shop_project.tournament_registrations
+    GROUP BY tournament_id
+) r
+WHERE r.tournament_id = t.id;
+
+-- The list is ordered by start date
+CREATE INDEX IF NOT EXISTS idx_tournaments_start_date ON t_p15345778_news_shop_project.tournaments (start_date);
@@ -0,0 +1,16 @@
+-- Лист ожидания: регистрации сверх max_participants встают в очередь (порядок по id)
+-- и переходят в участники при отмене регистрации в той же транзакции
+CREATE TABLE IF NOT EXISTS t_p15345778_news_shop_project.tournament_waitlist (
+    id SERIAL PRIMARY KEY,
+    tournament_id INTEGER NOT NULL REFERENCES t_p15345778_news_shop_project.tournaments(id),
+    steam_id VARCHAR(255) NOT NULL,
+    persona_name VARCHAR(255) NOT NULL,
+    avatar_url TEXT,
+    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(tournament_id, steam_id)
+);
+
+-- Голова очереди турнира
+CREATE INDEX IF NOT EXISTS idx_tournament_waitlist_queue ON t_p15345778_news_shop_project.tournament_waitlist (tournament_id, id);
+
+ALTER TABLE t_p15345778_news_shop_project.tournaments ADD COLUMN IF NOT EXISTS waitlist_count INTEGER NOT NULL DEFAULT 0;
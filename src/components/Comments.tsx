@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useMemo } from 'react';
 import { Card } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { Textarea } from '@/components/ui/textarea';
@@ -30,8 +30,12 @@ interface Comment {
   is_liked: boolean;
   is_admin?: boolean;
   is_moderator?: boolean;
+  replies?: Comment[];
+  replies_cursor?: string | null;
 }
 
+const PAGE_SIZE = 20;
+
 interface SteamUser {
   steamId: string;
   personaName: string;
@@ -46,6 +50,9 @@ interface CommentsProps {
 
 export default function Comments({ newsId }: CommentsProps) {
   const [comments, setComments] = useState<Comment[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [replyCursors, setReplyCursors] = useState<Record<number, string | null>>({});
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [newComment, setNewComment] = useState({ text: '' });
   const [isFormVisible, setIsFormVisible] = useState(false);
   const [isLoading, setIsLoading] = useState(true);
@@ -80,13 +87,27 @@ export default function Comments({ newsId }: CommentsProps) {
     loadComments();
   }, [newsId]);
 
+  const fetchPage = async (params: string) => {
+    const steamId = user?.steamId || '';
+    const response = await fetch(`${func2url.comments}?news_id=${newsId}&steam_id=${steamId}&limit=${PAGE_SIZE}${params}`);
+    const data = await response.json();
+    const page: Comment[] = data.comments || [];
+    const cursors: Record<number, string | null> = {};
+    const flat: Comment[] = [];
+    page.forEach(({ replies, replies_cursor, ...comment }) => {
+      flat.push(comment, ...(replies || []));
+      cursors[comment.id] = replies_cursor ?? null;
+    });
+    return { flat, cursors, next: (data.next_cursor as string | null) ?? null };
+  };
+
   const loadComments = async () => {
     setIsLoading(true);
     try {
-      const steamId = user?.steamId || '';
-      const response = await fetch(`${func2url.comments}?news_id=${newsId}&steam_id=${steamId}`);
-      const data = await response.json();
-      setComments(data.comments || []);
+      const { flat, cursors, next } = await fetchPage('');
+      setComments(flat);
+      setReplyCursors(cursors);
+      setNextCursor(next);
     } catch (error) {
       console.error('Failed to load comments:', error);
     } finally {
@@ -94,6 +115,33 @@ export default function Comments({ newsId }: CommentsProps) {
     }
   };
 
+  const loadMoreComments = async () => {
+    if (!nextCursor) return;
+    setIsLoadingMore(true);
+    try {
+      const { flat, cursors, next } = await fetchPage(`&cursor=${encodeURIComponent(nextCursor)}`);
+      setComments(prev => [...prev, ...flat]);
+      setReplyCursors(prev => ({ ...prev, ...cursors }));
+      setNextCursor(next);
+    } catch (error) {
+      console.error('Failed to load comments:', error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
+  const loadMoreReplies = async (parentId: number) => {
+    const cursor = replyCursors[parentId];
+    if (!cursor) return;
+    try {
+      const { flat, next } = await fetchPage(`&parent_id=${parentId}&cursor=${encodeURIComponent(cursor)}`);
+      setComments(prev => [...prev, ...flat.filter(c => c.parent_comment_id === parentId)]);
+      setReplyCursors(prev => ({ ...prev, [parentId]: next }));
+    } catch (error) {
+      console.error('Failed to load replies:', error);
+    }
+  };
+
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     if (!newComment.text.trim()) return;
@@ -163,7 +211,7 @@ export default function Comments({ newsId }: CommentsProps) {
 
       const data = await response.json();
       if (data.comment) {
-        setComments([data.comment, ...comments]);
+        setComments([...comments, data.comment]);
         setReplyText('');
         setReplyingTo(null);
       }
@@ -265,7 +313,20 @@ export default function Comments({ newsId }: CommentsProps) {
   };
 
   const topLevelComments = comments.filter(c => !c.parent_comment_id);
-  const getReplies = (parentId: number) => comments.filter(c => c.parent_comment_id === parentId);
+  const repliesByParent = useMemo(() => {
+    const map = new Map<number, Comment[]>();
+    comments.forEach(c => {
+      if (!c.parent_comment_id) return;
+      const replies = map.get(c.parent_comment_id);
+      if (replies) {
+        replies.push(c);
+      } else {
+        map.set(c.parent_comment_id, [c]);
+      }
+    });
+    return map;
+  }, [comments]);
+  const getReplies = (parentId: number) => repliesByParent.get(parentId) || [];
 
   const renderComment = (comment: Comment, isReply = false) => (
     <div key={comment.id}>
@@ -385,6 +446,16 @@ export default function Comments({ newsId }: CommentsProps) {
       )}
       
       {getReplies(comment.id).map(reply => renderComment(reply, true))}
+      
+      {!isReply && replyCursors[comment.id] && (
+        <button
+          onClick={() => loadMoreReplies(comment.id)}
+          className="ml-16 mt-3 text-sm text-muted-foreground hover:text-primary transition-colors flex items-center gap-1"
+        >
+          <Icon name="ChevronDown" size={16} />
+          Показать ещё ответы
+        </button>
+      )}
     </div>
   );
 
@@ -461,6 +532,14 @@ export default function Comments({ newsId }: CommentsProps) {
         ) : (
           topLevelComments.map((comment) => renderComment(comment))
         )}
+        {!isLoading && nextCursor && (
+          <div className="text-center">
+            <Button variant="outline" onClick={loadMoreComments} disabled={isLoadingMore} className="gap-2">
+              {isLoadingMore ? <Icon name="Loader2" size={18} className="animate-spin" /> : <Icon name="ChevronDown" size={18} />}
+              Показать ещё комментарии
+            </Button>
+          </div>
+        )}
       </div>
 
       <AlertDialog open={deleteDialogOpen} onOpenChange={setDeleteDialogOpen}>
@@ -24,6 +24,20 @@ interface ChatMessage {
   isModerator?: boolean;
 }
 
+interface ChatDelta {
+  messages?: ChatMessage[];
+  hiddenIds?: number[];
+  isFrozen?: boolean;
+  lastId?: number;
+  hiddenSeq?: number;
+  hasMore?: boolean;
+}
+
+const POLL_INTERVAL = 3000;
+const MAX_MESSAGES = 200;
+// Server-Sent Events feed of the same deltas (tools/gateway.py serves it at /chat/stream); polling is the fallback
+const CHAT_STREAM_URL = import.meta.env.VITE_CHAT_STREAM_URL as string | undefined;
+
 interface SteamUser {
   steamId: string;
   personaName: string;
@@ -47,9 +61,27 @@ export default function GlobalChat({ user, onLoginClick }: GlobalChatProps) {
   const [replyingTo, setReplyingTo] = useState<ChatMessage | null>(null);
   const [userNickname, setUserNickname] = useState<string | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  const cursorRef = useRef<{ lastId: number; hiddenSeq: number } | null>(null);
+  const pollingRef = useRef(false);
+  const streamRef = useRef<EventSource | null>(null);
 
   useEffect(() => {
-    loadMessages();
+    let cancelled = false;
+    loadMessages().then(() => {
+      if (!cancelled && CHAT_STREAM_URL && typeof EventSource !== 'undefined') {
+        openStream();
+      }
+    });
+    const timer = setInterval(() => {
+      if (!document.hidden && streamRef.current?.readyState !== EventSource.OPEN) {
+        pollMessages();
+      }
+    }, POLL_INTERVAL);
+    return () => {
+      cancelled = true;
+      clearInterval(timer);
+      streamRef.current?.close();
+    };
   }, []);
 
   useEffect(() => {
@@ -69,6 +101,7 @@ export default function GlobalChat({ user, onLoginClick }: GlobalChatProps) {
       const data = await response.json();
       setMessages(data.messages || []);
       setIsFrozen(data.isFrozen || false);
+      cursorRef.current = { lastId: data.lastId || 0, hiddenSeq: data.hiddenSeq || 0 };
     } catch (error) {
       console.error('Failed to load messages:', error);
     } finally {
@@ -76,6 +109,50 @@ export default function GlobalChat({ user, onLoginClick }: GlobalChatProps) {
     }
   };
 
+  const applyDelta = (data: ChatDelta) => {
+    const added = data.messages || [];
+    const hidden = new Set(data.hiddenIds || []);
+    if (added.length || hidden.size) {
+      setMessages(prev => {
+        const known = new Set(prev.map(m => m.id));
+        return [...prev.filter(m => !hidden.has(m.id)), ...added.filter(m => !known.has(m.id))].slice(-MAX_MESSAGES);
+      });
+    }
+    setIsFrozen(data.isFrozen || false);
+    const cursor = cursorRef.current || { lastId: 0, hiddenSeq: 0 };
+    cursorRef.current = {
+      lastId: Math.max(cursor.lastId, data.lastId ?? 0),
+      hiddenSeq: Math.max(cursor.hiddenSeq, data.hiddenSeq ?? 0)
+    };
+  };
+
+  const openStream = () => {
+    const { lastId, hiddenSeq } = cursorRef.current || { lastId: 0, hiddenSeq: 0 };
+    // EventSource reconnects by itself and resumes from the last event id
+    const stream = new EventSource(`${CHAT_STREAM_URL}?since_id=${lastId}&hidden_since=${hiddenSeq}`);
+    stream.addEventListener('delta', event => applyDelta(JSON.parse((event as MessageEvent).data)));
+    streamRef.current = stream;
+  };
+
+  const pollMessages = async () => {
+    const cursor = cursorRef.current;
+    if (!cursor || pollingRef.current) return;
+    pollingRef.current = true;
+    try {
+      let data: ChatDelta;
+      do {
+        const { lastId, hiddenSeq } = cursorRef.current || cursor;
+        const response = await fetch(`${func2url.chat}?since_id=${lastId}&hidden_since=${hiddenSeq}`);
+        data = await response.json();
+        applyDelta(data);
+      } while (data.hasMore);
+    } catch (error) {
+      console.error('Failed to poll messages:', error);
+    } finally {
+      pollingRef.current = false;
+    }
+  };
+
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   };
@@ -125,7 +202,7 @@ export default function GlobalChat({ user, onLoginClick }: GlobalChatProps) {
       if (response.ok) {
         setNewMessage('');
         setReplyingTo(null);
-        await loadMessages();
+        await pollMessages();
       }
     } catch (error) {
       console.error('Failed to send message:', error);
@@ -157,7 +234,7 @@ export default function GlobalChat({ user, onLoginClick }: GlobalChatProps) {
       });
 
       if (response.ok) {
-        await loadMessages();
+        await pollMessages();
       }
     } catch (error) {
       console.error('Failed to delete message:', error);
@@ -37,9 +37,7 @@ const ServersTab = () => {
 
   const updateServersStatus = async () => {
     try {
-      const response = await fetch(func2url['server-status'], {
-        method: 'POST'
-      });
+      const response = await fetch(func2url['server-status']);
       const data = await response.json();
       if (data.servers) {
         setServers(prevServers => {
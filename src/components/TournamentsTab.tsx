@@ -16,6 +16,7 @@ interface Tournament {
   start_date: string;
   participants_count: number;
   is_registered?: boolean;
+  is_waitlisted?: boolean;
   confirmed_at?: string | null;
 }
 
@@ -314,6 +315,26 @@ const TournamentsTab = ({ tournaments, user, isRegistering, onRegister, onUnregi
                         </Button>
                       )}
                     </>
+                  ) : tournament.is_waitlisted ? (
+                    <>
+                      <Button disabled className="gap-2 text-xs h-9 bg-blue-500/20 text-blue-500 border-blue-500/30 flex-1" variant="secondary">
+                        <Icon name="ListOrdered" size={16} />
+                        В листе ожидания
+                      </Button>
+                      {onUnregister && (
+                        <Button 
+                          onClick={(e) => {
+                            e.stopPropagation();
+                            onUnregister(tournament.id);
+                          }}
+                          variant="outline"
+                          className="gap-2 text-xs h-9"
+                        >
+                          <Icon name="X" size={16} />
+                          Покинуть
+                        </Button>
+                      )}
+                    </>
                   ) : (
                     <Button 
                       onClick={(e) => {
@@ -323,8 +344,8 @@ const TournamentsTab = ({ tournaments, user, isRegistering, onRegister, onUnregi
                       disabled={isRegistering === tournament.id || tournament.status !== 'upcoming' || isRegistrationClosed(tournament.start_date)}
                       className="gap-2 text-xs h-9"
                     >
-                      <Icon name="UserPlus" size={16} />
-                      {isRegistering === tournament.id ? 'Регистрация...' : isRegistrationClosed(tournament.start_date) ? 'Регистрация закрыта' : 'Зарегистрироваться'}
+                      <Icon name={tournament.participants_count >= tournament.max_participants ? 'ListPlus' : 'UserPlus'} size={16} />
+                      {isRegistering === tournament.id ? 'Регистрация...' : isRegistrationClosed(tournament.start_date) ? 'Регистрация закрыта' : tournament.participants_count >= tournament.max_participants ? 'В лист ожидания' : 'Зарегистрироваться'}
                     </Button>
                   )}
                   <Button 
@@ -164,6 +164,34 @@ export default function TournamentsManagement({ tournaments, user, onReload }: T
     }
   };
 
+  const handleGenerateBracket = async (id: number) => {
+    if (!confirm('Сгенерировать сетку из подтверждённых участников по рейтингу? Текущая сетка будет заменена.')) {
+      return;
+    }
+
+    try {
+      const response = await fetch(func2url.tournaments, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-Admin-Steam-Id': user.steamId
+        },
+        body: JSON.stringify({ action: 'generate_bracket', tournament_id: id, seeding: 'ranking' })
+      });
+
+      const data = await response.json();
+
+      if (response.ok) {
+        alert(`Сетка создана: ${data.players} игроков, ${data.rounds} раундов, автопроходов: ${data.byes}`);
+      } else {
+        alert(`Ошибка: ${data.error || 'Не удалось создать сетку'}`);
+      }
+    } catch (error) {
+      console.error('Failed to generate bracket:', error);
+      alert('Ошибка при создании сетки');
+    }
+  };
+
   const startEdit = (tournament: Tournament) => {
     setEditingId(tournament.id);
     setFormData({
@@ -231,6 +259,7 @@ export default function TournamentsManagement({ tournaments, user, onReload }: T
                 tournament={tournament}
                 onEdit={() => startEdit(tournament)}
                 onDelete={() => handleDelete(tournament.id)}
+                onGenerateBracket={() => handleGenerateBracket(tournament.id)}
               />
             )}
           </div>
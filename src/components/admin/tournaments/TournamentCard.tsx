@@ -20,9 +20,10 @@ interface TournamentCardProps {
   tournament: Tournament;
   onEdit: () => void;
   onDelete: () => void;
+  onGenerateBracket: () => void;
 }
 
-export default function TournamentCard({ tournament, onEdit, onDelete }: TournamentCardProps) {
+export default function TournamentCard({ tournament, onEdit, onDelete, onGenerateBracket }: TournamentCardProps) {
   return (
     <Card className="p-6 bg-card/50 backdrop-blur border-border hover:border-primary/30 transition-colors">
       <div className="flex items-start justify-between gap-6">
@@ -76,6 +77,15 @@ export default function TournamentCard({ tournament, onEdit, onDelete }: Tournam
         </div>
 
         <div className="flex gap-2 flex-shrink-0">
+          <Button
+            onClick={onGenerateBracket}
+            variant="outline"
+            size="sm"
+            className="gap-2"
+          >
+            <Icon name="GitFork" size={16} />
+            Сетка
+          </Button>
           <Button
             onClick={onEdit}
             variant="outline"
@@ -1,13 +1,14 @@
 import { Card } from '@/components/ui/card';
 import Icon from '@/components/ui/icon';
 import { formatShortDateTime } from '@/utils/dateFormat';
-import { Participant } from './types';
+import { Participant, WaitlistEntry } from './types';
 
 interface ParticipantsListProps {
   participants: Participant[];
+  waitlist?: WaitlistEntry[];
 }
 
-const ParticipantsList = ({ participants }: ParticipantsListProps) => {
+const ParticipantsList = ({ participants, waitlist = [] }: ParticipantsListProps) => {
   return (
     <div className="space-y-6">
       <div className="flex items-center justify-between">
@@ -77,6 +78,40 @@ const ParticipantsList = ({ participants }: ParticipantsListProps) => {
           ))}
         </div>
       )}
+
+      {waitlist.length > 0 && (
+        <div className="space-y-3">
+          <div className="flex items-center justify-between">
+            <div>
+              <h3 className="text-xl font-bold">Лист ожидания</h3>
+              <p className="text-sm text-muted-foreground mt-1">Займут освободившиеся места в порядке очереди</p>
+            </div>
+            <div className="text-xl font-bold text-muted-foreground">{waitlist.length}</div>
+          </div>
+          <div className="grid gap-2">
+            {waitlist.map((entry, index) => (
+              <Card key={entry.steam_id} className="p-3">
+                <div className="flex items-center gap-3">
+                  <div className="w-7 h-7 rounded-full bg-muted flex items-center justify-center text-sm font-bold text-muted-foreground">
+                    {index + 1}
+                  </div>
+                  <img 
+                    src={entry.avatar_url} 
+                    alt={entry.persona_name}
+                    className="w-9 h-9 rounded-full"
+                  />
+                  <div className="flex-1">
+                    <p className="font-medium">{entry.persona_name}</p>
+                    <p className="text-xs text-muted-foreground">
+                      В очереди с {formatShortDateTime(entry.joined_at)}
+                    </p>
+                  </div>
+                </div>
+              </Card>
+            ))}
+          </div>
+        </div>
+      )}
     </div>
   );
 };
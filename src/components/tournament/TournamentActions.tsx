@@ -8,6 +8,7 @@ interface TournamentActionsProps {
   tournament: TournamentDetail;
   user: SteamUser | null;
   isRegistered: boolean;
+  waitlistPosition: number | null;
   isFull: boolean;
   isRegistering: boolean;
   isUnregistering: boolean;
@@ -21,6 +22,7 @@ const TournamentActions = ({
   tournament,
   user,
   isRegistered,
+  waitlistPosition,
   isFull,
   isRegistering,
   isUnregistering,
@@ -36,28 +38,28 @@ const TournamentActions = ({
       <div className="space-y-4">
         <h3 className="text-xl font-bold">Регистрация</h3>
 
-        {!isRegistered && (
+        {!isRegistered && waitlistPosition === null && (
           <Button 
             size="lg" 
             className="w-full py-6 text-lg font-bold"
             onClick={onRegister}
-            disabled={isRegistering || isFull || isRegistrationClosed(tournament.start_date)}
+            disabled={isRegistering || isRegistrationClosed(tournament.start_date)}
           >
             {isRegistering ? (
               <>
                 <Icon name="Loader2" size={20} className="mr-2 animate-spin" />
                 Регистрация...
               </>
-            ) : isFull ? (
-              <>
-                <Icon name="Users" size={20} className="mr-2" />
-                Турнир заполнен
-              </>
             ) : isRegistrationClosed(tournament.start_date) ? (
               <>
                 <Icon name="Lock" size={20} className="mr-2" />
                 Регистрация закрыта
               </>
+            ) : isFull ? (
+              <>
+                <Icon name="ListPlus" size={20} className="mr-2" />
+                Турнир заполнен - встать в лист ожидания
+              </>
             ) : (
               <>
                 <Icon name="UserPlus" size={20} className="mr-2" />
@@ -67,6 +69,34 @@ const TournamentActions = ({
           </Button>
         )}
 
+        {!isRegistered && waitlistPosition !== null && (
+          <div className="space-y-3">
+            <div className="p-4 rounded-xl border border-blue-500/30 bg-blue-500/10">
+              <div className="flex items-center justify-between">
+                <div className="flex items-center gap-2">
+                  <Icon name="ListOrdered" size={20} className="text-blue-500" />
+                  <span className="font-semibold text-blue-500">Вы в листе ожидания</span>
+                </div>
+                <div className="text-blue-500 font-mono font-bold">#{waitlistPosition}</div>
+              </div>
+              <p className="text-sm text-muted-foreground mt-2">
+                Когда кто-то отменит регистрацию, первый в очереди займёт его место автоматически
+              </p>
+            </div>
+
+            <Button 
+              size="lg" 
+              variant="outline"
+              className="w-full py-6 text-lg font-bold"
+              onClick={onUnregister}
+              disabled={isUnregistering}
+            >
+              <Icon name="X" size={20} className="mr-2" />
+              {isUnregistering ? 'Отмена...' : 'Покинуть лист ожидания'}
+            </Button>
+          </div>
+        )}
+
         {isRegistered && (
           <div className="space-y-3">
             {isConfirmationActive(tournament.start_date) && !userParticipant?.confirmed_at && (
@@ -1,7 +1,7 @@
 import { Card } from '@/components/ui/card';
 import Icon from '@/components/ui/icon';
 
-interface BracketMatch {
+export interface BracketMatch {
   id: number;
   round_number: number;
   match_number: number;
@@ -26,7 +26,7 @@ const TournamentBracket = ({ bracket }: TournamentBracketProps) => {
     return null;
   }
 
-  const rounds = Array.from(new Set(bracket.map(m => m.round_number))).sort();
+  const rounds = Array.from(new Set(bracket.map(m => m.round_number))).sort((a, b) => a - b);
   
   const getRoundName = (roundNum: number, totalRounds: number) => {
     const roundsLeft = totalRounds - roundNum + 1;
@@ -69,6 +69,12 @@ const TournamentBracket = ({ bracket }: TournamentBracketProps) => {
                               Завершён
                             </span>
                           )}
+                          {match.status === 'bye' && (
+                            <span className="flex items-center gap-1">
+                              <Icon name="SkipForward" size={12} />
+                              Автопроход
+                            </span>
+                          )}
                           {match.status === 'pending' && (
                             <span className="flex items-center gap-1">
                               <Icon name="Clock" size={12} />
@@ -81,7 +87,7 @@ const TournamentBracket = ({ bracket }: TournamentBracketProps) => {
                           {/* Player 1 */}
                           <div 
                             className={`flex items-center gap-3 p-2 rounded ${
-                              match.winner_steam_id === match.player1_steam_id 
+                              match.winner_steam_id && match.winner_steam_id === match.player1_steam_id 
                                 ? 'bg-green-500/10 border border-green-500/30' 
                                 : 'bg-secondary/50'
                             }`}
@@ -108,7 +114,7 @@ const TournamentBracket = ({ bracket }: TournamentBracketProps) => {
                           {/* Player 2 */}
                           <div 
                             className={`flex items-center gap-3 p-2 rounded ${
-                              match.winner_steam_id === match.player2_steam_id 
+                              match.winner_steam_id && match.winner_steam_id === match.player2_steam_id 
                                 ? 'bg-green-500/10 border border-green-500/30' 
                                 : 'bg-secondary/50'
                             }`}
@@ -125,7 +131,7 @@ const TournamentBracket = ({ bracket }: TournamentBracketProps) => {
                               </div>
                             )}
                             <span className="flex-1 font-medium text-sm">
-                              {match.player2_name || 'TBD'}
+                              {match.status === 'bye' ? '—' : match.player2_name || 'TBD'}
                             </span>
                             <span className="text-lg font-bold">
                               {match.player2_score}
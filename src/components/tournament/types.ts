@@ -8,6 +8,13 @@ export interface Participant {
   is_moderator?: boolean;
 }
 
+export interface WaitlistEntry {
+  steam_id: string;
+  persona_name: string;
+  avatar_url: string;
+  joined_at: string;
+}
+
 export interface TournamentDetail {
   id: number;
   name: string;
@@ -20,6 +27,8 @@ export interface TournamentDetail {
   start_date: string;
   participants_count: number;
   participants: Participant[];
+  waitlist_count?: number;
+  waitlist?: WaitlistEntry[];
   confirmed_at?: string | null;
 }
 
@@ -244,7 +244,7 @@ export default function Admin() {
 
   const updateServersStatus = async () => {
     try {
-      const response = await fetch(func2url['server-status'], {
+      const response = await fetch(`${func2url['server-status']}?force=true`, {
         method: 'POST'
       });
       const data = await response.json();
@@ -41,6 +41,7 @@ interface Tournament {
   start_date: string;
   participants_count: number;
   is_registered?: boolean;
+  is_waitlisted?: boolean;
 }
 
 const Index = () => {
@@ -183,7 +184,9 @@ const Index = () => {
       if (response.ok) {
         toast({
           title: "Успешно!",
-          description: "Регистрация успешна! Увидимся на турнире!"
+          description: data.status === 'waitlisted'
+            ? `Мест нет - вы в листе ожидания под номером ${data.position}. Место освободится - зарегистрируем автоматически`
+            : "Регистрация успешна! Увидимся на турнире!"
         });
         await loadTournaments();
       } else {
@@ -227,7 +230,7 @@ const Index = () => {
       if (response.ok) {
         toast({
           title: "Успешно",
-          description: "Регистрация отменена"
+          description: data.status === 'left_waitlist' ? "Вы покинули лист ожидания" : "Регистрация отменена"
         });
         await loadTournaments();
       } else {
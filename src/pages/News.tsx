@@ -9,6 +9,8 @@ interface NewsItem {
   title: string;
   description: string;
   date: string;
+  commentsCount?: number;
+  likesCount?: number;
 }
 
 interface SteamUser {
@@ -68,7 +70,9 @@ const News = () => {
         id: item.id,
         title: item.title,
         description: item.content.substring(0, 150) + '...',
-        date: formatShortDate(item.date)
+        date: formatShortDate(item.date),
+        commentsCount: item.comments_count ?? 0,
+        likesCount: item.likes_count ?? 0
       }));
       setNewsItems(formattedNews);
       localStorage.setItem('newsItems', JSON.stringify(formattedNews));
@@ -120,6 +124,10 @@ const News = () => {
                       <p className="text-sm text-muted-foreground flex items-center gap-2">
                         <Icon name="Calendar" size={14} />
                         {item.date}
+                        <Icon name="MessageSquare" size={14} className="ml-2" />
+                        {item.commentsCount ?? 0}
+                        <Icon name="ThumbsUp" size={14} className="ml-2" />
+                        {item.likesCount ?? 0}
                       </p>
                     </div>
                     <p className="text-muted-foreground leading-relaxed">{item.description}</p>
@@ -7,6 +7,7 @@ import TournamentInfo from '@/components/tournament/TournamentInfo';
 import CountdownTimer from '@/components/tournament/CountdownTimer';
 import TournamentActions from '@/components/tournament/TournamentActions';
 import ParticipantsList from '@/components/tournament/ParticipantsList';
+import TournamentBracket, { BracketMatch } from '@/components/tournament/TournamentBracket';
 import { TournamentDetail as TournamentDetailType, SteamUser } from '@/components/tournament/types';
 import { getTimeUntilStart } from '@/components/tournament/utils';
 import { toast } from '@/hooks/use-toast';
@@ -25,6 +26,7 @@ const TournamentDetail = () => {
   const { id } = useParams<{ id: string }>();
   const navigate = useNavigate();
   const [tournament, setTournament] = useState<TournamentDetailType | null>(null);
+  const [bracket, setBracket] = useState<BracketMatch[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [user, setUser] = useState<SteamUser | null>(null);
   const [isRegistering, setIsRegistering] = useState(false);
@@ -73,11 +75,16 @@ const TournamentDetail = () => {
 
   const loadTournamentDetails = async () => {
     try {
-      const response = await fetch(
-        `${func2url.tournaments}?tournament_id=${id}`
-      );
+      const [response, bracketResponse] = await Promise.all([
+        fetch(`${func2url.tournaments}?tournament_id=${id}`),
+        fetch(`${func2url.tournaments}?tournament_id=${id}&bracket=true`)
+      ]);
       const data = await response.json();
       setTournament(data);
+      if (bracketResponse.ok) {
+        const bracketData = await bracketResponse.json();
+        setBracket(bracketData.bracket || []);
+      }
     } catch (error) {
       console.error('Failed to load tournament details:', error);
     } finally {
@@ -116,7 +123,9 @@ const TournamentDetail = () => {
       if (response.ok) {
         toast({
           title: "Успешно!",
-          description: "Регистрация успешна! Увидимся на турнире!"
+          description: data.status === 'waitlisted'
+            ? `Мест нет - вы в листе ожидания под номером ${data.position}. Место освободится - зарегистрируем автоматически`
+            : "Регистрация успешна! Увидимся на турнире!"
         });
         await loadTournamentDetails();
       } else {
@@ -159,7 +168,7 @@ const TournamentDetail = () => {
       if (response.ok) {
         toast({
           title: "Успешно",
-          description: "Регистрация отменена"
+          description: data.status === 'left_waitlist' ? "Вы покинули лист ожидания" : "Регистрация отменена"
         });
         await loadTournamentDetails();
       } else {
@@ -258,6 +267,8 @@ const TournamentDetail = () => {
 
   const isRegistered = tournament.participants.some(p => p.steam_id === user?.steamId);
   const isFull = tournament.participants_count >= tournament.max_participants;
+  const waitlistIndex = (tournament.waitlist || []).findIndex(w => w.steam_id === user?.steamId);
+  const waitlistPosition = waitlistIndex === -1 ? null : waitlistIndex + 1;
 
   return (
     <main className="container mx-auto px-6 py-16">
@@ -281,6 +292,7 @@ const TournamentDetail = () => {
           tournament={tournament}
           user={user}
           isRegistered={isRegistered}
+          waitlistPosition={waitlistPosition}
           isFull={isFull}
           isRegistering={isRegistering}
           isUnregistering={isUnregistering}
@@ -290,21 +302,25 @@ const TournamentDetail = () => {
           onConfirm={handleConfirmParticipation}
         />
 
-        <ParticipantsList participants={tournament.participants} />
+        <TournamentBracket bracket={bracket} />
+
+        <ParticipantsList participants={tournament.participants} waitlist={tournament.waitlist || []} />
       </div>
 
       <AlertDialog open={showUnregisterDialog} onOpenChange={setShowUnregisterDialog}>
         <AlertDialogContent>
           <AlertDialogHeader>
-            <AlertDialogTitle>Отменить регистрацию?</AlertDialogTitle>
+            <AlertDialogTitle>{waitlistPosition !== null ? 'Покинуть лист ожидания?' : 'Отменить регистрацию?'}</AlertDialogTitle>
             <AlertDialogDescription>
-              Вы уверены, что хотите отменить регистрацию на турнир? Это действие можно отменить, зарегистрировавшись снова.
+              {waitlistPosition !== null
+                ? 'Ваше место в очереди будет потеряно. Встав в лист ожидания снова, вы окажетесь в его конце.'
+                : 'Вы уверены, что хотите отменить регистрацию на турнир? Освободившееся место займёт первый из листа ожидания.'}
             </AlertDialogDescription>
           </AlertDialogHeader>
           <AlertDialogFooter>
             <AlertDialogCancel>Отмена</AlertDialogCancel>
             <AlertDialogAction onClick={confirmUnregister} className="bg-destructive hover:bg-destructive/90">
-              Отменить регистрацию
+              {waitlistPosition !== null ? 'Покинуть' : 'Отменить регистрацию'}
             </AlertDialogAction>
           </AlertDialogFooter>
         </AlertDialogContent>
@@ -31,6 +31,7 @@ interface Tournament {
   start_date: string;
   participants_count: number;
   is_registered?: boolean;
+  is_waitlisted?: boolean;
   confirmed_at?: string | null;
 }
 
@@ -127,7 +128,9 @@ const Tournaments = () => {
       if (response.ok) {
         toast({
           title: "Успешно!",
-          description: "Регистрация успешна! Увидимся на турнире!"
+          description: data.status === 'waitlisted'
+            ? `Мест нет - вы в листе ожидания под номером ${data.position}. Место освободится - зарегистрируем автоматически`
+            : "Регистрация успешна! Увидимся на турнире!"
         });
         await loadTournaments();
       } else {
@@ -172,7 +175,7 @@ const Tournaments = () => {
       if (response.ok) {
         toast({
           title: "Успешно",
-          description: "Регистрация отменена"
+          description: data.status === 'left_waitlist' ? "Вы покинули лист ожидания" : "Регистрация отменена"
         });
         await loadTournaments();
       } else {
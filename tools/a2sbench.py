@@ -0,0 +1,90 @@
+'''
+Business: Benchmark of the server-status A2S poller against a fake fleet - one concurrent poll of every server
+          versus querying the servers one at a time, as server-status did before
+Args: --servers, --dead, --rtt, --timeout, --runs, --no-serial
+Returns: wall time and online/offline counts per fleet size for both strategies; exit code 1 if the concurrent
+         poll missed a live server or took longer than its deadline plus a margin
+
+Usage:
+  python tools/a2sbench.py                         # 1, 20 and 200 servers, 10% of them dead
+  python tools/a2sbench.py --servers 500 --dead 0.3 --timeout 0.5 --no-serial
+'''
+
+import argparse
+import os
+import sys
+import time
+from typing import Dict, Any, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'server-status'))
+
+import a2s
+from a2sfleet import Fleet, mixed_fleet
+from loadtest import percentile
+
+# Scheduling slack allowed on top of the deadline before a concurrent poll counts as too slow
+DEADLINE_MARGIN = 0.25
+
+
+def concurrent_poll(targets: List[Tuple[str, int]], timeout: float) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    return a2s.query_info(targets, timeout=timeout)
+
+
+def serial_poll(targets: List[Tuple[str, int]], timeout: float) -> Dict[Tuple[str, int], Dict[str, Any]]:
+    results = {}
+    for target in targets:
+        results.update(a2s.query_info([target], timeout=timeout))
+    return results
+
+
+def measure(poll, fleet: Fleet, timeout: float, runs: int) -> Dict[str, Any]:
+    times: List[float] = []
+    online = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        results = poll(fleet.targets, timeout)
+        times.append(time.perf_counter() - started)
+        online = sum(1 for result in results.values() if result['status'] == 'online')
+    times.sort()
+    return {'p50': percentile(times, 0.5), 'max': times[-1], 'online': online}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Poll a fake A2S fleet concurrently and one server at a time')
+    parser.add_argument('--servers', type=int, nargs='+', default=[1, 20, 200], help='fleet sizes to run')
+    parser.add_argument('--dead', type=float, default=0.1, help='share of servers that never answer')
+    parser.add_argument('--rtt', type=float, default=0.05, help='maximum reply delay of live servers, seconds')
+    parser.add_argument('--timeout', type=float, default=1.0, help='poll deadline, seconds')
+    parser.add_argument('--runs', type=int, default=5, help='concurrent polls per fleet size')
+    parser.add_argument('--no-serial', action='store_true', help='skip the one-at-a-time baseline')
+    args = parser.parse_args()
+
+    failures: List[str] = []
+    print(f'{"servers":>8} {"dead":>5}  {"concurrent p50":>15} {"max":>8}  {"serial":>9}  online')
+    for count in args.servers:
+        with Fleet(mixed_fleet(count, args.dead, args.rtt)) as fleet:
+            alive = sum(1 for server in fleet.servers if not server.dead)
+            fast = measure(concurrent_poll, fleet, args.timeout, args.runs)
+            slow = None if args.no_serial else measure(serial_poll, fleet, args.timeout, 1)
+
+        serial = f"{slow['max']:8.2f}s" if slow else f'{"-":>9}'
+        print(f"{count:>8} {count - alive:>5}  {fast['p50']:14.3f}s {fast['max']:7.3f}s  {serial}  "
+              f"{fast['online']}/{alive}")
+
+        if fast['online'] != alive:
+            failures.append(f"{count} servers: {alive - fast['online']} live servers reported offline")
+        if fast['max'] > args.timeout + DEADLINE_MARGIN:
+            failures.append(f"{count} servers: concurrent poll took {fast['max']:.2f} s, deadline {args.timeout} s")
+        if slow and slow['online'] != alive:
+            failures.append(f"{count} servers: serial poll missed {alive - slow['online']} live servers")
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if not failures:
+        print('OK: every live server answered and each concurrent poll finished within its deadline')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
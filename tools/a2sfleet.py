@@ -0,0 +1,218 @@
+'''
+Business: Fake fleet of A2S game servers on 127.0.0.1 for server-status benchmarks and protocol checks
+Args: a list of FakeServer specs - reply delay, dead (never answers), packet loss, challenge handshake, split and
+      bz2-compressed player/rules replies, and malformed replies (see MALFORMED)
+Returns: Fleet context manager with the (ip, port) target of every server; it runs in the background
+         until stopped, one UDP socket per server driven by a single selector thread
+
+Usage:
+  with Fleet([FakeServer(delay=0.02), FakeServer(dead=True)]) as fleet:
+      a2s.query_info(fleet.targets, timeout=1)
+
+  python tools/a2sfleet.py --servers 20 --dead 0.1    # serve a fleet and print its targets
+'''
+
+import argparse
+import bz2
+import heapq
+import random
+import selectors
+import socket
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+A2S_PLAYER = 0x55
+A2S_RULES = 0x56
+S2C_CHALLENGE = 0x41
+S2A_INFO = 0x49
+S2A_PLAYER = 0x44
+S2A_RULES = 0x45
+INFO_REQUEST = b'\xFF\xFF\xFF\xFFTSource Engine Query\x00'
+
+# Broken replies to player and rules requests, as seen from misbehaving servers:
+#   fragment_range - two fragments numbered 0 and 5 of a 2-fragment reply
+#   zero_total     - a single fragment of a 0-fragment reply
+#   short          - a complete split reply that joins to 2 bytes
+#   garbage        - a simple reply of the right type without a body
+#   bad_crc        - a bz2-compressed split reply with a wrong CRC32
+MALFORMED = ('fragment_range', 'zero_total', 'short', 'garbage', 'bad_crc')
+
+
+@dataclass
+class FakeServer:
+    delay: float = 0.0
+    dead: bool = False
+    loss: float = 0.0
+    challenge: bool = True
+    name: str = 'Fake server'
+    map: str = 'de_dust2'
+    players: int = 7
+    max_players: int = 20
+    player_list: List[Tuple[str, int, float]] = field(default_factory=list)
+    rules: Dict[str, str] = field(default_factory=dict)
+    split: int = 0
+    compress: bool = False
+    reverse: bool = False
+    malformed: str = ''
+
+
+def info_reply(server: FakeServer, port: int) -> bytes:
+    return (b'\xFF\xFF\xFF\xFF' + bytes([S2A_INFO, 17])
+            + server.name.encode() + b'\x00' + server.map.encode() + b'\x00'
+            + b'csgo\x00Counter-Strike: Global Offensive\x00'
+            + struct.pack('<hBBBccBB', 730, server.players, server.max_players, 0, b'd', b'l', 0, 1)
+            + b'1.38.0.0\x00' + struct.pack('<BH', 0x80, port))
+
+
+def players_reply(server: FakeServer) -> bytes:
+    return (b'\xFF\xFF\xFF\xFF' + bytes([S2A_PLAYER, len(server.player_list) & 0xFF])
+            + b''.join(bytes([i & 0xFF]) + name.encode() + b'\x00' + struct.pack('<if', score, duration)
+                       for i, (name, score, duration) in enumerate(server.player_list)))
+
+
+def rules_reply(server: FakeServer) -> bytes:
+    return (b'\xFF\xFF\xFF\xFF' + bytes([S2A_RULES]) + struct.pack('<h', len(server.rules))
+            + b''.join(name.encode() + b'\x00' + value.encode() + b'\x00' for name, value in server.rules.items()))
+
+
+def split_packet(packet: bytes, size: int, packet_id: int, compress: bool = False) -> List[bytes]:
+    '''Cut a reply into split fragments of `size` bytes, bz2-compressing it first when asked.'''
+    crc = zlib.crc32(packet)
+    length = len(packet)
+    if compress:
+        packet_id |= 0x80000000
+        packet = bz2.compress(packet)
+    chunks = [packet[i:i + size] for i in range(0, len(packet), size)] or [b'']
+    fragments = []
+    for number, chunk in enumerate(chunks):
+        header = struct.pack('<iIBBh', -2, packet_id, len(chunks), number, size)
+        if compress and number == 0:
+            header += struct.pack('<iI', length, crc)
+        fragments.append(header + chunk)
+    return fragments
+
+
+def malformed_reply(mode: str, packet: bytes, packet_id: int) -> List[bytes]:
+    if mode == 'fragment_range':
+        return [struct.pack('<iIBBh', -2, packet_id, 2, number, 1248) + packet[:8] for number in (0, 5)]
+    if mode == 'zero_total':
+        return [struct.pack('<iIBBh', -2, packet_id, 0, 0, 1248) + packet]
+    if mode == 'short':
+        return [struct.pack('<iIBBh', -2, packet_id, 1, 0, 1248) + b'\xFF\xFF']
+    if mode == 'garbage':
+        return [packet[:5]]
+    if mode == 'bad_crc':
+        fragments = split_packet(packet, 64, packet_id, compress=True)
+        first = bytearray(fragments[0])
+        first[16:20] = struct.pack('<I', zlib.crc32(packet) ^ 1)
+        return [bytes(first)] + fragments[1:]
+    raise ValueError(f'Unknown malformed mode: {mode}')
+
+
+class Fleet:
+    def __init__(self, servers: List[FakeServer]):
+        self.servers = servers
+        self.sockets: List[socket.socket] = []
+        self.targets: List[Tuple[str, int]] = []
+        self.selector = selectors.DefaultSelector()
+        self.outbox: List[Tuple[float, int, socket.socket, bytes, Tuple[str, int]]] = []
+        self.sent = 0
+        self.random = random.Random(0)
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+
+    def __enter__(self) -> 'Fleet':
+        for index, server in enumerate(self.servers):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind(('127.0.0.1', 0))
+            sock.setblocking(False)
+            self.sockets.append(sock)
+            self.targets.append(sock.getsockname())
+            self.selector.register(sock, selectors.EVENT_READ, index)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stopping.set()
+        self.thread.join()
+        self.selector.close()
+        for sock in self.sockets:
+            sock.close()
+
+    def reply(self, sock: socket.socket, server: FakeServer, data: bytes) -> List[bytes]:
+        '''Replies to one request; a challenge is a fixed 4 bytes echoed by the client.'''
+        port = sock.getsockname()[1]
+        challenge = struct.pack('<i', port)
+        if data.startswith(INFO_REQUEST):
+            if server.challenge and data[len(INFO_REQUEST):] != challenge:
+                return [b'\xFF\xFF\xFF\xFF' + bytes([S2C_CHALLENGE]) + challenge]
+            return [info_reply(server, port)]
+
+        if len(data) != 9 or data[4] not in (A2S_PLAYER, A2S_RULES):
+            return []
+        # Player and rules requests always go through the challenge
+        if data[5:9] != challenge:
+            return [b'\xFF\xFF\xFF\xFF' + bytes([S2C_CHALLENGE]) + challenge]
+
+        packet = players_reply(server) if data[4] == A2S_PLAYER else rules_reply(server)
+        if server.malformed:
+            return malformed_reply(server.malformed, packet, port)
+        if not server.split:
+            return [packet]
+        fragments = split_packet(packet, server.split, port, server.compress)
+        return fragments[::-1] if server.reverse else fragments
+
+    def serve(self) -> None:
+        while not self.stopping.is_set():
+            now = time.monotonic()
+            while self.outbox and self.outbox[0][0] <= now:
+                _, _, sock, data, addr = heapq.heappop(self.outbox)
+                try:
+                    sock.sendto(data, addr)
+                except OSError:
+                    pass
+            wait = min(self.outbox[0][0] - now, 0.05) if self.outbox else 0.05
+            for key, _ in self.selector.select(max(wait, 0)):
+                server = self.servers[key.data]
+                try:
+                    data, addr = key.fileobj.recvfrom(65535)
+                except OSError:
+                    continue
+                # Servers can be killed or revived between polls by changing `dead`
+                if server.dead or self.random.random() < server.loss:
+                    continue
+                for packet in self.reply(key.fileobj, server, data):
+                    self.sent += 1
+                    heapq.heappush(self.outbox, (time.monotonic() + server.delay, self.sent, key.fileobj, packet, addr))
+
+
+def mixed_fleet(count: int, dead: float, rtt: float, seed: int = 0) -> List[FakeServer]:
+    '''`count` servers, a `dead` share of them silent, the rest answering within `rtt` seconds.'''
+    rng = random.Random(seed)
+    dead_ids = set(rng.sample(range(count), int(round(count * dead))))
+    return [FakeServer(delay=rng.uniform(0, rtt), dead=i in dead_ids, name=f'Fake server {i}') for i in range(count)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Serve a fake A2S fleet on 127.0.0.1 until interrupted')
+    parser.add_argument('--servers', type=int, default=20)
+    parser.add_argument('--dead', type=float, default=0.1, help='share of servers that never answer')
+    parser.add_argument('--rtt', type=float, default=0.05, help='maximum reply delay in seconds')
+    args = parser.parse_args()
+
+    with Fleet(mixed_fleet(args.servers, args.dead, args.rtt)) as fleet:
+        for server, (ip, port) in zip(fleet.servers, fleet.targets):
+            print(f"{ip}:{port}  {'dead' if server.dead else f'{server.delay * 1000:.0f} ms'}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
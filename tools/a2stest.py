@@ -0,0 +1,93 @@
+'''
+Business: Protocol check of the server-status A2S client against a fake fleet - split, bz2-compressed and
+          out-of-order player/rules replies next to servers sending malformed ones
+Args: --players, --split, --timeout
+Returns: the outcome per fake server; exit code 1 unless every well-formed reply was reassembled and parsed
+         exactly and every malformed one marked only its own server offline
+
+Usage:
+  python tools/a2stest.py
+  python tools/a2stest.py --players 300 --split 400
+'''
+
+import argparse
+import os
+import sys
+from typing import Dict, Any, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'server-status'))
+
+import a2s
+from a2sfleet import MALFORMED, FakeServer, Fleet
+
+
+def fleet_spec(players: int, split: int) -> Dict[str, FakeServer]:
+    player_list = [(f'Player {i}', i * 3, float(i)) for i in range(players)]
+    rules = {f'sv_rule_{i}': str(i * 7) for i in range(players)}
+
+    def server(**kwargs) -> FakeServer:
+        return FakeServer(player_list=player_list, rules=rules, **kwargs)
+
+    spec = {
+        'simple': server(),
+        'split': server(split=split),
+        'split reversed': server(split=split, reverse=True),
+        'bz2 split': server(split=split, compress=True),
+        'bz2 split reversed': server(split=split, compress=True, reverse=True),
+        'delayed split': server(split=split, delay=0.05),
+    }
+    spec.update({f'malformed {mode}': server(malformed=mode) for mode in MALFORMED})
+    return spec
+
+
+def expected_reply(kind: int, server: FakeServer) -> Any:
+    if kind == a2s.A2S_PLAYER:
+        return [{'name': name, 'score': score, 'duration': round(duration, 1)}
+                for name, score, duration in server.player_list]
+    return server.rules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Check split and malformed A2S replies against a fake fleet')
+    parser.add_argument('--players', type=int, default=200, help='players and rules per reply')
+    parser.add_argument('--split', type=int, default=500, help='fragment payload size, bytes')
+    parser.add_argument('--timeout', type=float, default=1.0)
+    args = parser.parse_args()
+
+    spec = fleet_spec(args.players, args.split)
+    failures: List[str] = []
+
+    with Fleet(list(spec.values())) as fleet:
+        names = dict(zip(fleet.targets, spec))
+        for kind, query in ((a2s.A2S_PLAYER, a2s.query_players), (a2s.A2S_RULES, a2s.query_rules)):
+            label = 'players' if kind == a2s.A2S_PLAYER else 'rules'
+            try:
+                results = query(fleet.targets, timeout=args.timeout)
+            except Exception as e:
+                failures.append(f'{label}: the whole poll failed with {type(e).__name__}: {e}')
+                continue
+
+            for target, name in names.items():
+                result = results.get(target)
+                server = spec[name]
+                if server.malformed:
+                    ok = isinstance(result, dict) and result.get('status') == 'offline' \
+                        and result.get('error', '').startswith('invalid response')
+                    outcome = result.get('error') if isinstance(result, dict) else result
+                else:
+                    ok = result == expected_reply(kind, server)
+                    outcome = f'{len(result)} entries' if isinstance(result, (list, dict)) and ok else result
+                print(f"{label:<8} {name:<26} {'ok  ' if ok else 'FAIL'} {str(outcome)[:70]}")
+                if not ok:
+                    failures.append(f'{label}: {name} returned {str(result)[:120]}')
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if not failures:
+        print('OK: well-formed replies were reassembled exactly and malformed ones only took their own server offline')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+'''
+Business: Build a single elimination bracket for a large tournament through the tournaments function,
+          play every match to the final and check the tree along the way
+Args: --players, --seeding, --url; DATABASE_URL for setup and checks
+Returns: time and queries for generation, the full-bracket read and each result; exit code 1 unless byes went
+         to the top seeds, every winner advanced into the right slot and the final completed the tournament
+
+Usage:
+  DATABASE_URL=postgresql://... python tools/brackettest.py --players 1000
+  DATABASE_URL=postgresql://... python tools/brackettest.py --players 1024 --seeding random
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'tournaments'))
+
+from bracket import build_bracket
+from loadtest import HttpClient, InProcessClient, percentile
+
+SCHEMA = 't_p15345778_news_shop_project'
+
+# Players with a CS2 ranking in V0027: ranking seeding puts them first
+RANKED = [str(76561198000000021 + i) for i in range(8)]
+
+
+def create_tournament(dsn: str, players: int) -> Tuple[int, List[str], str]:
+    '''A started tournament with `players` confirmed registrations; returns its id, the players and an admin.'''
+    steam_ids = RANKED[:players] + [str(76561198700000000 + i) for i in range(players - len(RANKED[:players]))]
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(f"SELECT steam_id FROM {SCHEMA}.users WHERE is_admin = true ORDER BY id LIMIT 1")
+            admin = cur.fetchone()
+            if not admin:
+                sys.exit('an admin user is required (users.is_admin)')
+            cur.execute(f'''
+                INSERT INTO {SCHEMA}.tournaments (name, description, prize_pool, max_participants, tournament_type, start_date, status, game)
+                VALUES ('Bracket test', 'Created by tools/brackettest.py', 0, %s, 'solo', now(), 'active', 'CS2')
+                RETURNING id
+            ''', (players,))
+            tournament_id = cur.fetchone()[0]
+            execute_values(cur, f'''
+                INSERT INTO {SCHEMA}.tournament_registrations (tournament_id, steam_id, persona_name, confirmed_at)
+                VALUES %s
+            ''', [(tournament_id, steam_id, f'Player {i}', 'now()') for i, steam_id in enumerate(steam_ids)],
+                page_size=1000)
+            cur.execute(f'UPDATE {SCHEMA}.tournaments SET participants_count = %s, confirmed_count = %s WHERE id = %s',
+                        (players, players, tournament_id))
+            return tournament_id, steam_ids, admin[0]
+    finally:
+        conn.close()
+
+
+def tournament_status(dsn: str, tournament_id: int) -> str:
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f'SELECT status FROM {SCHEMA}.tournaments WHERE id = %s', (tournament_id,))
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def delete_tournament(dsn: str, tournament_id: int) -> None:
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(f'DELETE FROM {SCHEMA}.tournament_brackets WHERE tournament_id = %s', (tournament_id,))
+            cur.execute(f'DELETE FROM {SCHEMA}.tournament_registrations WHERE tournament_id = %s', (tournament_id,))
+            cur.execute(f'DELETE FROM {SCHEMA}.tournaments WHERE id = %s', (tournament_id,))
+    finally:
+        conn.close()
+
+
+def timed(client, case: Dict[str, Any]) -> Tuple[int, Dict[str, Any], float, Optional[int]]:
+    started = time.perf_counter()
+    status, body, stats = client.call(case, 0)
+    elapsed = (time.perf_counter() - started) * 1000
+    return status, json.loads(body), elapsed, stats['queries'] if stats else None
+
+
+def check(failures: List[str], condition: bool, message: str) -> None:
+    if not condition:
+        failures.append(message)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Generate and play through a tournament bracket')
+    parser.add_argument('--players', type=int, default=1000, help='confirmed participants')
+    parser.add_argument('--seeding', choices=('ranking', 'random'), default='ranking')
+    parser.add_argument('--url', help='base URL of a running tools/gateway.py instead of in-process handlers')
+    parser.add_argument('--keep', action='store_true', help='leave the test tournament in the database')
+    args = parser.parse_args()
+
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        sys.exit('DATABASE_URL is not set')
+
+    players = [str(76561198700000000 + i) for i in range(args.players)]
+    started = time.perf_counter()
+    build_bracket(players)
+    print(f'build        {args.players} players in memory: {(time.perf_counter() - started) * 1000:.2f} ms')
+
+    client = HttpClient(args.url) if args.url else InProcessClient(['tournaments'])
+    tournament_id, steam_ids, admin = create_tournament(dsn, args.players)
+    admin_headers = {'X-Admin-Steam-Id': admin}
+    failures: List[str] = []
+
+    try:
+        status, generated, elapsed, queries = timed(client, {
+            'function': 'tournaments', 'method': 'POST', 'path': '/', 'headers': admin_headers,
+            'body': {'action': 'generate_bracket', 'tournament_id': tournament_id, 'seeding': args.seeding}
+        })
+        print(f'generate     {status} {generated} in {elapsed:.1f} ms, {queries} queries')
+        check(failures, status == 201, 'generate: bracket was not created')
+
+        read = {'function': 'tournaments', 'method': 'GET', 'path': f'/?tournament_id={tournament_id}&bracket=true'}
+        status, data, elapsed, queries = timed(client, read)
+        matches = data['bracket']
+        print(f'read         {len(matches)} matches in {elapsed:.1f} ms, {queries} queries')
+
+        size = 1 << (args.players - 1).bit_length()
+        byes = [m for m in matches if m['status'] == 'bye']
+        check(failures, len(matches) == size - 1, 'generate: wrong number of matches')
+        check(failures, len(byes) == size - args.players, 'generate: wrong number of byes')
+        if args.seeding == 'ranking':
+            # Byes go to the first size - players seeds, ranked players lead the seeding
+            seeded = [s for s in RANKED if s in steam_ids] + [s for s in steam_ids if s not in RANKED]
+            check(failures, {m['player1_steam_id'] for m in byes} == set(seeded[:len(byes)]),
+                  'generate: byes did not go to the top seeds')
+            check(failures, matches[0]['player1_steam_id'] == seeded[0], 'generate: top seed is not in the first slot')
+
+        latencies: List[float] = []
+        report_queries: List[int] = []
+        champion = None
+        rounds = max(m['round_number'] for m in matches)
+
+        for round_number in range(1, rounds + 1):
+            matches = timed(client, read)[1]['bracket']
+            by_slot = {(m['round_number'], m['match_number']): m for m in matches}
+            for match in [m for m in matches if m['round_number'] == round_number and m['status'] == 'pending']:
+                check(failures, match['player1_steam_id'] and match['player2_steam_id'],
+                      f"round {round_number}: match {match['match_number']} is missing a player")
+                score1, score2 = random.sample(range(17), 2)
+                status, result, elapsed, queries = timed(client, {
+                    'function': 'tournaments', 'method': 'POST', 'path': '/', 'headers': admin_headers,
+                    'body': {'action': 'report_match', 'tournament_id': tournament_id, 'match_id': match['id'],
+                             'player1_score': score1, 'player2_score': score2}
+                })
+                latencies.append(elapsed)
+                if queries is not None:
+                    report_queries.append(queries)
+
+                winner = match['player1_steam_id'] if score1 > score2 else match['player2_steam_id']
+                check(failures, status == 200 and result['winner_steam_id'] == winner,
+                      f"round {round_number}: match {match['match_number']} reported the wrong winner")
+                if result.get('champion'):
+                    champion = result['champion']
+                elif status == 200:
+                    check(failures, result['next_match'] == {'round_number': round_number + 1,
+                                                             'match_number': match['match_number'] // 2},
+                          f"round {round_number}: match {match['match_number']} advanced to the wrong match")
+
+            if round_number > 1:
+                for match in [m for m in matches if m['round_number'] == round_number]:
+                    feeders = [by_slot[(round_number - 1, 2 * match['match_number'] + side)] for side in (0, 1)]
+                    check(failures, [match['player1_steam_id'], match['player2_steam_id']]
+                          == [f['winner_steam_id'] for f in feeders],
+                          f"round {round_number}: match {match['match_number']} does not hold its feeders' winners")
+
+        latencies.sort()
+        print(f'report       {len(latencies)} results, p50 {percentile(latencies, 0.5):.1f} ms  '
+              f'p95 {percentile(latencies, 0.95):.1f} ms'
+              + (f', {sum(report_queries) / len(report_queries):.2f} queries each' if report_queries else ''))
+
+        final = timed(client, read)[1]['bracket'][-1]
+        print(f"champion     {champion} (final {final['player1_score']}:{final['player2_score']})")
+        check(failures, champion is not None and champion == final['winner_steam_id'], 'final: no champion')
+        check(failures, tournament_status(dsn, tournament_id) == 'completed', 'final: tournament is not completed')
+
+        status = timed(client, {
+            'function': 'tournaments', 'method': 'POST', 'path': '/', 'headers': admin_headers,
+            'body': {'action': 'generate_bracket', 'tournament_id': tournament_id}
+        })[0]
+        check(failures, status == 409, 'regenerate: a bracket in play was replaced')
+    finally:
+        if not args.keep:
+            delete_tournament(dsn, tournament_id)
+
+    for failure in failures[:20]:
+        print(f'FAIL: {failure}')
+    if not failures:
+        print('OK: byes went to the top seeds, every winner advanced and the final completed the tournament')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
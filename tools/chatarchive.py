@@ -0,0 +1,68 @@
+'''
+Business: Run the chat archive mover from the command line (cron, or a backfill of a long history)
+Args: run [--keep N] [--after-days D] [--batch N] [--budget S] | stats; DATABASE_URL from the environment
+Returns: prints the rows moved per run, or row counts and sizes of the live and archive tables
+
+Usage:
+  DATABASE_URL=postgresql://... python tools/chatarchive.py run --budget 0
+  DATABASE_URL=postgresql://... python tools/chatarchive.py stats
+'''
+
+import argparse
+import os
+import sys
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'chat'))
+
+from archive import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH, ARCHIVE_KEEP, archive_messages
+
+SCHEMA = 't_p15345778_news_shop_project'
+
+
+def print_stats(cur) -> None:
+    for table in ('chat_messages', 'chat_messages_archive'):
+        cur.execute(f'''
+            SELECT COUNT(*), COUNT(*) FILTER (WHERE is_hidden), MIN(created_at), MAX(created_at),
+                   pg_size_pretty(pg_total_relation_size('{SCHEMA}.{table}'))
+            FROM {SCHEMA}.{table}
+        ''')
+        rows, hidden, oldest, newest, size = cur.fetchone()
+        print(f'{table:<22} {rows:>10} rows  {hidden:>8} hidden  {size:>10}  {oldest} .. {newest}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Move hidden and old chat messages to the archive table')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run', help='move batches until caught up or out of time')
+    run.add_argument('--keep', type=int, default=ARCHIVE_KEEP, help='newest messages never moved')
+    run.add_argument('--after-days', type=float, default=ARCHIVE_AFTER_DAYS, help='age at which visible messages move')
+    run.add_argument('--batch', type=int, default=ARCHIVE_BATCH, help='rows moved per statement')
+    run.add_argument('--budget', type=float, default=0, help='seconds to spend (0: until caught up)')
+
+    subparsers.add_parser('stats', help='row counts and sizes of both tables')
+
+    args = parser.parse_args()
+
+    db_url = os.environ.get('DATABASE_URL')
+    if not db_url:
+        sys.exit('DATABASE_URL is not set')
+
+    conn = psycopg2.connect(db_url)
+    try:
+        if args.command == 'run':
+            result = archive_messages(conn, args.keep, args.after_days, args.batch, args.budget)
+            state = 'caught up' if result['done'] else 'stopped at the time budget'
+            print(f"moved {result['moved']} messages ({result['hidden']} hidden) in {result['batches']} batches, "
+                  f"{result['seconds']} s, {state}")
+        else:
+            with conn.cursor() as cur:
+                print_stats(cur)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
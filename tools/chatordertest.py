@@ -0,0 +1,239 @@
+'''
+Business: Ordering test of chat posts - a post whose commit is held back while a later one commits, then many
+          concurrent posters - with since_id pollers and a second instance's message cache following along
+Args: --hold, --posters, --posts, --pollers, --ttl; DATABASE_URL
+Returns: ids posted and seen per poller; exit code 1 if a poller or the cached window of the reading instance
+         missed a committed message, got one twice or out of id order
+
+Two copies of the chat function run side by side like two warm instances: one takes the posts (its commits
+can be held back per thread), the other answers the polls, from its RecentMessages buffer or with fresh=true.
+
+Usage:
+  DATABASE_URL=postgresql://... python tools/chatordertest.py
+  DATABASE_URL=postgresql://... python tools/chatordertest.py --posters 16 --posts 50
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import gateway
+from floodtest import NO_LIMIT
+
+SCHEMA = 't_p15345778_news_shop_project'
+
+STEAM_ID_BASE = 76561197700000000
+
+
+def call(handler, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Tuple[int, Dict[str, Any]]:
+    event = gateway.build_event(method, path, None, json.dumps(body) if body else '')
+    response = gateway.invoke('chat', handler, event)
+    return response.get('statusCode', 200), json.loads(response.get('body') or '{}')
+
+
+def hold_commits(handler) -> threading.local:
+    '''Make every commit of the function's pooled connections first sleep for the calling thread's `hold`.'''
+    local = threading.local()
+    connection_class = handler.__globals__['db'].PooledConnection
+    commit = connection_class.commit
+
+    def held_commit(self) -> None:
+        time.sleep(getattr(local, 'hold', 0))
+        commit(self)
+
+    connection_class.commit = held_commit
+    return local
+
+
+class Poller:
+    '''Follows the chat like a client: one window for the cursor, then since_id deltas until caught up.'''
+
+    def __init__(self, handler, fresh: bool):
+        self.handler = handler
+        self.fresh = '&fresh=true' if fresh else ''
+        self.seen: List[int] = []
+        self.errors = 0
+        status, data = call(handler, 'GET', f'/?limit=1{self.fresh}')
+        self.cursor = (data['lastId'], data['hiddenSeq'])
+
+    def poll(self) -> int:
+        new = 0
+        while True:
+            status, data = call(self.handler, 'GET',
+                                f'/?since_id={self.cursor[0]}&hidden_since={self.cursor[1]}{self.fresh}')
+            if status != 200:
+                self.errors += 1
+                return new
+            self.seen.extend(message['id'] for message in data['messages'])
+            new += len(data['messages'])
+            self.cursor = (data['lastId'], data['hiddenSeq'])
+            if not data['hasMore']:
+                return new
+
+
+def run_phase(reader, args, post: Callable[[], List[int]]) -> Dict[str, Any]:
+    '''Poll the reading instance while post() runs, then until every poller is caught up.'''
+    pollers = {f'{"fresh" if fresh else "cached"} {number + 1}': Poller(reader, fresh)
+               for fresh in (True, False) for number in range(args.pollers)}
+    stop = threading.Event()
+
+    def follow(poller: Poller) -> None:
+        while not stop.is_set():
+            poller.poll()
+            time.sleep(args.poll_interval)
+
+    threads = [threading.Thread(target=follow, args=(poller,)) for poller in pollers.values()]
+    for thread in threads:
+        thread.start()
+    posted = post()
+    # Long enough for every cached snapshot to be revalidated against the database at least once
+    time.sleep(args.ttl * 2 + args.poll_interval)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    for poller in pollers.values():
+        poller.poll()
+
+    time.sleep(args.ttl)
+    status, data = call(reader, 'GET', '/?limit=50')
+    window = [message['id'] for message in data.get('messages', [])] if status == 200 else []
+    return {'posted': sorted(posted), 'pollers': pollers, 'window': window}
+
+
+def report(failures: List[str], phase: str, result: Dict[str, Any]) -> None:
+    posted = result['posted']
+    for name, poller in result['pollers'].items():
+        missing = sorted(set(posted) - set(poller.seen))
+        duplicates = len(poller.seen) - len(set(poller.seen))
+        unordered = sum(1 for before, after in zip(poller.seen, poller.seen[1:]) if after < before)
+        print(f'  poller {name:<9} seen {len(set(poller.seen)):>5}/{len(posted):<5} missing {len(missing):>4}  '
+              f'twice {duplicates:>3}  out of order {unordered:>3}  errors {poller.errors}')
+        if missing:
+            failures.append(f'{phase}: poller {name} never got ids {missing[:5]}')
+        if duplicates or unordered:
+            failures.append(f'{phase}: poller {name} got {duplicates} ids twice and {unordered} out of order')
+        if poller.errors:
+            failures.append(f'{phase}: poller {name} had {poller.errors} failed polls')
+
+    expected = posted[-50:]
+    lost = sorted(set(expected) - set(result['window']))
+    print(f'  cached window of the reading instance: {len(expected) - len(lost)}/{len(expected)} latest posts')
+    if lost or result['window'][-len(expected):] != expected:
+        failures.append(f'{phase}: the cached window of the reading instance lacks ids {lost[:5]}')
+
+
+def delete_posts(dsn: str, steam_ids: List[str]) -> None:
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(f'DELETE FROM {SCHEMA}.chat_messages WHERE steam_id = ANY(%s)', (steam_ids,))
+            cur.execute(f'DELETE FROM {SCHEMA}.rate_limits WHERE bucket_key = ANY(%s)',
+                        ([f'chat:{steam_id}' for steam_id in steam_ids],))
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Check that chat pollers and caches get every post in id order')
+    parser.add_argument('--hold', type=float, default=0.5, help='seconds the first post holds back its commit')
+    parser.add_argument('--posters', type=int, default=8, help='threads posting at once in the rush')
+    parser.add_argument('--posts', type=int, default=25, help='posts per thread in the rush')
+    parser.add_argument('--max-hold', type=float, default=0.02, help='largest random commit delay in the rush')
+    parser.add_argument('--pollers', type=int, default=2, help='fresh=true pollers, and as many cached ones')
+    parser.add_argument('--poll-interval', type=float, default=0.01)
+    parser.add_argument('--ttl', type=float, default=0.1, help='CHAT_CACHE_TTL of the reading instance')
+    parser.add_argument('--keep', action='store_true', help='leave the test messages in the database')
+    args = parser.parse_args()
+
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        sys.exit('DATABASE_URL is not set')
+
+    os.environ.update(NO_LIMIT, CHAT_CACHE_TTL=str(args.ttl))
+    poster = gateway.load_function('chat')
+    reader = gateway.load_function('chat')
+    held = hold_commits(poster)
+    steam_ids = [str(STEAM_ID_BASE + i) for i in range(max(args.posters, 2))]
+    failures: List[str] = []
+    rng = random.Random(0)
+
+    def post(steam_id: str, text: str, hold: float) -> Optional[int]:
+        held.hold = hold
+        try:
+            status, data = call(poster, 'POST', '/', {'steam_id': steam_id, 'persona_name': 'Order test', 'message': text})
+        finally:
+            held.hold = 0
+        if status != 201:
+            failures.append(f'post answered {status}: {data}')
+            return None
+        return data['id']
+
+    try:
+        # The first post takes its id, then holds its commit while the second one goes through
+        order: List[Tuple[str, int]] = []
+
+        def held_post() -> List[int]:
+            results: Dict[str, Optional[int]] = {}
+
+            def send(name: str, hold: float) -> None:
+                results[name] = post(steam_ids[0 if name == 'held' else 1], f'order test {name}', hold)
+                order.append((name, results[name]))
+
+            first = threading.Thread(target=send, args=('held', args.hold))
+            first.start()
+            time.sleep(args.hold / 5)
+            second = threading.Thread(target=send, args=('later', 0))
+            second.start()
+            first.join()
+            second.join()
+            return [post_id for post_id in results.values() if post_id is not None]
+
+        result = run_phase(reader, args, held_post)
+        print(f"held commit  committed in order {', '.join(f'{name} id {post_id}' for name, post_id in order)}")
+        report(failures, 'held commit', result)
+
+        def rush() -> List[int]:
+            posted: List[int] = []
+            lock = threading.Lock()
+
+            def work(steam_id: str) -> None:
+                for number in range(args.posts):
+                    post_id = post(steam_id, f'order test {steam_id} {number}', rng.uniform(0, args.max_hold))
+                    if post_id is not None:
+                        with lock:
+                            posted.append(post_id)
+
+            threads = [threading.Thread(target=work, args=(steam_id,)) for steam_id in steam_ids[:args.posters]]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return posted
+
+        started = time.perf_counter()
+        result = run_phase(reader, args, rush)
+        print(f"rush         {len(result['posted'])} posts from {args.posters} threads in "
+              f'{time.perf_counter() - started:.2f} s')
+        report(failures, 'rush', result)
+    finally:
+        if not args.keep:
+            delete_posts(dsn, steam_ids)
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if not failures:
+        print('OK: every poller and the cached window got every post exactly once and in id order')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+'''
+Business: Server-Sent Events stream of the global chat for the local gateway (GET /chat/stream)
+Args: ChatStreamHub(dsn, fetch) - fetch(params) calls the chat function's GET with query params and returns its JSON
+Returns: one LISTEN connection fans chat_events notifications out to every subscriber; each burst of
+         notifications costs one delta read (GET ?since_id=...) no matter how many clients are connected
+
+Cloud functions cannot hold a response open, so streaming lives in the long-running gateway process.
+Clients resume with Last-Event-ID ("<lastId>.<hiddenSeq>", sent automatically by EventSource) or with
+?since_id=&hidden_since= from their last poll, and get the missed delta before live events.
+'''
+
+import json
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Callable, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+CHANNEL = 'chat_events'
+KEEPALIVE_INTERVAL = 15
+RECONNECT_DELAY = 2
+# A subscriber that falls this far behind is dropped; EventSource reconnects and catches up by Last-Event-ID
+MAX_PENDING = 256 * 1024
+
+Cursor = Tuple[int, int]
+
+
+def parse_cursor(last_event_id: Optional[str], params: Dict[str, str]) -> Optional[Cursor]:
+    '''Resume point from a Last-Event-ID header or since_id/hidden_since query params.'''
+    try:
+        if last_event_id:
+            last_id, _, hidden_seq = last_event_id.partition('.')
+            return int(last_id), int(hidden_seq or 0)
+        if params.get('since_id') is not None:
+            return int(params['since_id']), int(params.get('hidden_since') or 0)
+    except ValueError:
+        pass
+    return None
+
+
+def format_event(delta: Dict[str, Any]) -> bytes:
+    return (
+        f"id: {delta['lastId']}.{delta['hiddenSeq']}\n"
+        f"event: delta\n"
+        f"data: {json.dumps(delta, ensure_ascii=False)}\n\n"
+    ).encode('utf-8')
+
+
+class Subscriber:
+    __slots__ = ('sock', 'pending', 'cursor')
+
+    def __init__(self, sock: socket.socket, cursor: Optional[Cursor]):
+        self.sock = sock
+        self.pending = bytearray()
+        self.cursor = cursor
+
+
+class ChatStreamHub:
+    def __init__(self, dsn: str, fetch: Callable[[Dict[str, str]], Dict[str, Any]]):
+        self.dsn = dsn
+        self.fetch = fetch
+        self.cursor: Optional[Cursor] = None
+        self.is_frozen: Optional[bool] = None
+        self.subscribers: Dict[int, Subscriber] = {}
+        self.incoming: deque = deque()
+        self.selector = selectors.DefaultSelector()
+        self.wakeup_r, self.wakeup_w = socket.socketpair()
+        self.wakeup_r.setblocking(False)
+        self.wakeup_w.setblocking(False)
+        self.listen_conn = None
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        self.stats = {'notifications': 0, 'fetches': 0, 'broadcasts': 0, 'disconnects': 0}
+
+    def start(self) -> None:
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name='chatstream', daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.running = False
+        self.wake()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def subscribe(self, sock: socket.socket, cursor: Optional[Cursor]) -> None:
+        '''Hand over a connection whose SSE response headers are already sent. Safe to call from any thread.'''
+        self.incoming.append(Subscriber(sock, cursor))
+        self.wake()
+
+    def wake(self) -> None:
+        try:
+            self.wakeup_w.send(b'\0')
+        except BlockingIOError:
+            pass
+
+    def listen(self) -> None:
+        conn = psycopg2.connect(self.dsn)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(f'LISTEN {CHANNEL}')
+        self.listen_conn = conn
+        self.selector.register(conn, selectors.EVENT_READ, 'listen')
+
+    def close_listen(self) -> None:
+        if self.listen_conn is None:
+            return
+        try:
+            self.selector.unregister(self.listen_conn)
+        except (KeyError, ValueError):
+            pass
+        try:
+            self.listen_conn.close()
+        except psycopg2.Error:
+            pass
+        self.listen_conn = None
+
+    def run(self) -> None:
+        self.selector.register(self.wakeup_r, selectors.EVENT_READ, 'wakeup')
+        last_keepalive = time.monotonic()
+        reconnect_at = 0.0
+
+        while self.running:
+            if self.listen_conn is None and time.monotonic() >= reconnect_at:
+                try:
+                    self.listen()
+                    # Anything committed while we were not listening is picked up by the catch-up read
+                    self.refresh()
+                except Exception as e:
+                    print(f'chatstream: LISTEN failed: {e}', flush=True)
+                    self.close_listen()
+                    reconnect_at = time.monotonic() + RECONNECT_DELAY
+
+            notified = False
+            for key, events in self.selector.select(timeout=1.0):
+                if key.data == 'wakeup':
+                    try:
+                        while self.wakeup_r.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                elif key.data == 'listen':
+                    try:
+                        self.listen_conn.poll()
+                    except psycopg2.Error as e:
+                        print(f'chatstream: LISTEN connection lost: {e}', flush=True)
+                        self.close_listen()
+                        reconnect_at = time.monotonic() + RECONNECT_DELAY
+                        continue
+                    if self.listen_conn.notifies:
+                        self.stats['notifications'] += len(self.listen_conn.notifies)
+                        self.listen_conn.notifies.clear()
+                        notified = True
+                else:
+                    subscriber = key.data
+                    if events & selectors.EVENT_READ and not self.drain(subscriber):
+                        continue
+                    if events & selectors.EVENT_WRITE:
+                        self.flush(subscriber)
+
+            while self.incoming:
+                self.accept(self.incoming.popleft())
+
+            # All notifications that arrived together are served by one delta read
+            if notified:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f'chatstream: delta read failed: {e}', flush=True)
+
+            if time.monotonic() - last_keepalive >= KEEPALIVE_INTERVAL:
+                last_keepalive = time.monotonic()
+                self.broadcast(b': keepalive\n\n')
+
+        for subscriber in list(self.subscribers.values()):
+            self.drop(subscriber)
+        self.close_listen()
+
+    def read_delta(self, cursor: Cursor) -> Tuple[Cursor, list]:
+        '''Deltas from cursor up to now, following hasMore; returns the new cursor and the SSE events.'''
+        events = []
+        while True:
+            self.stats['fetches'] += 1
+            # A notification means the database moved, so skip the function's cache TTL
+            delta = self.fetch({'since_id': str(cursor[0]), 'hidden_since': str(cursor[1]), 'fresh': 'true'})
+            cursor = (delta['lastId'], delta['hiddenSeq'])
+            if delta['messages'] or delta['hiddenIds'] or delta['isFrozen'] != self.is_frozen or not events:
+                events.append((delta, format_event(delta)))
+            if not delta.get('hasMore'):
+                return cursor, events
+
+    def refresh(self) -> None:
+        if self.cursor is None:
+            self.stats['fetches'] += 1
+            latest = self.fetch({'limit': '1', 'fresh': 'true'})
+            self.cursor = (latest['lastId'], latest['hiddenSeq'])
+            self.is_frozen = latest['isFrozen']
+            return
+
+        self.cursor, events = self.read_delta(self.cursor)
+        for delta, data in events:
+            if delta['messages'] or delta['hiddenIds'] or delta['isFrozen'] != self.is_frozen:
+                self.is_frozen = delta['isFrozen']
+                self.stats['broadcasts'] += 1
+                self.broadcast(data)
+
+    def accept(self, subscriber: Subscriber) -> None:
+        subscriber.sock.setblocking(False)
+        self.subscribers[subscriber.sock.fileno()] = subscriber
+        self.selector.register(subscriber.sock, selectors.EVENT_READ, subscriber)
+
+        if self.cursor is None:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f'chatstream: initial read failed: {e}', flush=True)
+                self.drop(subscriber)
+                return
+
+        if subscriber.cursor is None or subscriber.cursor == self.cursor:
+            # Still tell the client where the stream starts, so a reconnect resumes from here
+            self.send(subscriber, f'id: {self.cursor[0]}.{self.cursor[1]}\nretry: 3000\n\n'.encode())
+            return
+
+        try:
+            _, events = self.read_delta(subscriber.cursor)
+        except Exception as e:
+            print(f'chatstream: catch-up read failed: {e}', flush=True)
+            self.drop(subscriber)
+            return
+        for _, data in events:
+            self.send(subscriber, data)
+
+    def broadcast(self, data: bytes) -> None:
+        for subscriber in list(self.subscribers.values()):
+            self.send(subscriber, data)
+
+    def send(self, subscriber: Subscriber, data: bytes) -> None:
+        if subscriber.pending:
+            if len(subscriber.pending) + len(data) > MAX_PENDING:
+                self.drop(subscriber)
+            else:
+                subscriber.pending += data
+            return
+        try:
+            sent = subscriber.sock.send(data)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self.drop(subscriber)
+            return
+        if sent < len(data):
+            subscriber.pending += data[sent:]
+            self.selector.modify(subscriber.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, subscriber)
+
+    def flush(self, subscriber: Subscriber) -> None:
+        try:
+            sent = subscriber.sock.send(subscriber.pending)
+        except BlockingIOError:
+            return
+        except OSError:
+            self.drop(subscriber)
+            return
+        del subscriber.pending[:sent]
+        if not subscriber.pending:
+            self.selector.modify(subscriber.sock, selectors.EVENT_READ, subscriber)
+
+    def drain(self, subscriber: Subscriber) -> bool:
+        '''Clients never send anything after the request, so readable means closed.'''
+        try:
+            if subscriber.sock.recv(4096):
+                return True
+        except BlockingIOError:
+            return True
+        except OSError:
+            pass
+        self.drop(subscriber)
+        return False
+
+    def drop(self, subscriber: Subscriber) -> None:
+        if self.subscribers.pop(subscriber.sock.fileno(), None) is None:
+            return
+        self.stats['disconnects'] += 1
+        try:
+            self.selector.unregister(subscriber.sock)
+        except (KeyError, ValueError):
+            pass
+        subscriber.sock.close()
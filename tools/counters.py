@@ -0,0 +1,136 @@
+'''
+Business: Recompute the maintained comment and tournament counters from the source rows to repair drift
+Args: rebuild [--news-id N ...] [--dry-run] | tournaments [--tournament-id N ...] [--dry-run];
+      DATABASE_URL from the environment
+Returns: prints how many counters were corrected
+
+Usage:
+  DATABASE_URL=postgresql://... python tools/counters.py rebuild
+  DATABASE_URL=postgresql://... python tools/counters.py tournaments
+'''
+
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional, Tuple
+
+import psycopg2
+
+SCHEMA = 't_p15345778_news_shop_project'
+
+
+def rebuild_comment_counters(cur, news_ids: Optional[List[int]] = None) -> Tuple[int, int]:
+    '''
+    Bulk-recompute comments.likes_count and news_comment_stats in two set-based
+    statements, touching only rows whose stored value differs.
+    '''
+    scope = 'WHERE c.news_id = ANY(%(news_ids)s)' if news_ids else ''
+    args = {'news_ids': news_ids}
+
+    cur.execute(f'''
+        UPDATE {SCHEMA}.comments c
+        SET likes_count = actual.likes_count
+        FROM (
+            SELECT c.id, COUNT(l.comment_id) AS likes_count
+            FROM {SCHEMA}.comments c
+            LEFT JOIN {SCHEMA}.comment_likes l ON l.comment_id = c.id
+            {scope}
+            GROUP BY c.id
+        ) actual
+        WHERE actual.id = c.id AND c.likes_count IS DISTINCT FROM actual.likes_count
+    ''', args)
+    comments_fixed = cur.rowcount
+
+    news_scope = 'WHERE news_id = ANY(%(news_ids)s)' if news_ids else ''
+    cur.execute(f'''
+        WITH actual AS (
+            SELECT ids.news_id, COUNT(c.id) AS comments_count, COALESCE(SUM(c.likes_count), 0) AS likes_count
+            FROM (
+                SELECT news_id FROM {SCHEMA}.comments {news_scope}
+                UNION
+                SELECT news_id FROM {SCHEMA}.news_comment_stats {news_scope}
+            ) ids
+            LEFT JOIN {SCHEMA}.comments c ON c.news_id = ids.news_id
+            GROUP BY ids.news_id
+        )
+        INSERT INTO {SCHEMA}.news_comment_stats AS s (news_id, comments_count, likes_count)
+        SELECT news_id, comments_count, likes_count FROM actual
+        ON CONFLICT (news_id) DO UPDATE
+        SET comments_count = EXCLUDED.comments_count,
+            likes_count = EXCLUDED.likes_count,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE (s.comments_count, s.likes_count) IS DISTINCT FROM (EXCLUDED.comments_count, EXCLUDED.likes_count)
+    ''', args)
+    news_fixed = cur.rowcount
+
+    return comments_fixed, news_fixed
+
+
+def rebuild_tournament_counters(cur, tournament_ids: Optional[List[int]] = None) -> int:
+    '''Recompute tournaments.participants_count, confirmed_count and waitlist_count, touching only rows that drifted.'''
+    scope = 'WHERE t.id = ANY(%(tournament_ids)s)' if tournament_ids else ''
+
+    cur.execute(f'''
+        UPDATE {SCHEMA}.tournaments t
+        SET participants_count = actual.participants_count,
+            confirmed_count = actual.confirmed_count,
+            waitlist_count = actual.waitlist_count
+        FROM (
+            SELECT t.id, COUNT(r.id) AS participants_count, COUNT(r.confirmed_at) AS confirmed_count,
+                   (SELECT COUNT(*) FROM {SCHEMA}.tournament_waitlist w WHERE w.tournament_id = t.id) AS waitlist_count
+            FROM {SCHEMA}.tournaments t
+            LEFT JOIN {SCHEMA}.tournament_registrations r ON r.tournament_id = t.id
+            {scope}
+            GROUP BY t.id
+        ) actual
+        WHERE actual.id = t.id
+          AND (t.participants_count, t.confirmed_count, t.waitlist_count)
+              IS DISTINCT FROM (actual.participants_count, actual.confirmed_count, actual.waitlist_count)
+    ''', {'tournament_ids': tournament_ids})
+    return cur.rowcount
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Maintain denormalized counters')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    rebuild = subparsers.add_parser('rebuild', help='recompute comment and per-news counters')
+    rebuild.add_argument('--news-id', type=int, nargs='*', help='only these news items')
+    rebuild.add_argument('--dry-run', action='store_true', help='report drift and roll back')
+
+    tournaments = subparsers.add_parser('tournaments', help='recompute tournament participant and waitlist counters')
+    tournaments.add_argument('--tournament-id', type=int, nargs='*', help='only these tournaments')
+    tournaments.add_argument('--dry-run', action='store_true', help='report drift and roll back')
+
+    args = parser.parse_args()
+
+    db_url = os.environ.get('DATABASE_URL')
+    if not db_url:
+        sys.exit('DATABASE_URL is not set')
+
+    started = time.perf_counter()
+    conn = psycopg2.connect(db_url)
+    try:
+        with conn.cursor() as cur:
+            if args.command == 'tournaments':
+                tournaments_fixed = rebuild_tournament_counters(cur, args.tournament_id)
+            else:
+                comments_fixed, news_fixed = rebuild_comment_counters(cur, args.news_id)
+        if args.dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    finally:
+        conn.close()
+
+    action = 'would correct' if args.dry_run else 'corrected'
+    if args.command == 'tournaments':
+        print(f'{action} {tournaments_fixed} tournament participant counters in {time.perf_counter() - started:.1f} s')
+    else:
+        print(f'{action} {comments_fixed} comment like counters and {news_fixed} news counters '
+              f'in {time.perf_counter() - started:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
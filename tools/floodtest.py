@@ -0,0 +1,150 @@
+'''
+Business: Flood benchmark - spam chat or comment posts while normal readers poll, and see what readers feel
+Args: --target chat|comments, --spammers, --readers, --duration, --rotate-ids, --no-limit, --url
+Returns: reader latency and payload before and during the flood, and how many spam posts got through
+
+Usage:
+  DATABASE_URL=postgresql://... python tools/floodtest.py --target chat --spammers 8 --readers 8
+  DATABASE_URL=postgresql://... python tools/floodtest.py --target chat --no-limit
+  python tools/floodtest.py --target comments --rotate-ids --url http://127.0.0.1:8000
+
+--rotate-ids gives every spam post a new steam_id, so only the global bucket can stop it.
+--no-limit raises the limits out of reach (in-process only) to measure the same flood unprotected.
+'''
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, Any, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import HttpClient, InProcessClient, percentile
+
+NO_LIMIT = {
+    'CHAT_RATE_PER_USER': '1000000', 'CHAT_RATE_GLOBAL': '1000000',
+    'CHAT_BURST_PER_USER': '1000000', 'CHAT_BURST_GLOBAL': '1000000',
+    'COMMENTS_RATE_PER_USER': '1000000', 'COMMENTS_RATE_GLOBAL': '1000000',
+    'COMMENTS_BURST_PER_USER': '1000000', 'COMMENTS_BURST_GLOBAL': '1000000',
+}
+
+
+class Reader:
+    '''Polls like a client: chat deltas since the last seen message, or the first comments page.'''
+
+    def __init__(self, client, target: str, news_id: int):
+        self.client = client
+        self.target = target
+        self.news_id = news_id
+        self.cursor = None
+
+    def case(self) -> Dict[str, Any]:
+        if self.target == 'comments':
+            return {'function': 'comments', 'method': 'GET', 'path': f'/?news_id={self.news_id}&limit=20'}
+        if self.cursor is None:
+            return {'function': 'chat', 'method': 'GET', 'path': '/?limit=50'}
+        return {'function': 'chat', 'method': 'GET', 'path': f'/?since_id={self.cursor[0]}&hidden_since={self.cursor[1]}'}
+
+    def poll(self) -> int:
+        status, body, _ = self.client.call(self.case(), 0)
+        if self.target == 'chat' and status == 200:
+            data = json.loads(body)
+            self.cursor = (data['lastId'], data['hiddenSeq'])
+        return len(body)
+
+
+def spam_case(target: str, news_id: int, sequence: int, rotate_ids: bool) -> Dict[str, Any]:
+    steam_id = f'76561190{sequence}' if rotate_ids else '76561190000000001'
+    if target == 'comments':
+        body = {'news_id': news_id, 'author': 'Spammer', 'text': f'spam {sequence}', 'steam_id': steam_id}
+    else:
+        body = {'steam_id': steam_id, 'persona_name': 'Spammer', 'message': f'spam {sequence}'}
+    return {'function': target, 'method': 'POST', 'path': '/', 'body': body}
+
+
+def run_phase(client, args, spammers: int) -> Dict[str, Any]:
+    stop = threading.Event()
+    lock = threading.Lock()
+    latencies: List[float] = []
+    sizes: List[int] = []
+    statuses: Dict[int, int] = {}
+    sequence = iter(range(10 ** 12))
+
+    def read() -> None:
+        reader = Reader(client, args.target, args.news_id)
+        reader.poll()
+        while not stop.is_set():
+            started = time.perf_counter()
+            size = reader.poll()
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+                sizes.append(size)
+            time.sleep(args.poll_interval)
+
+    def spam() -> None:
+        while not stop.is_set():
+            with lock:
+                number = next(sequence)
+            status, _, _ = client.call(spam_case(args.target, args.news_id, number, args.rotate_ids), number)
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=read) for _ in range(args.readers)]
+    threads += [threading.Thread(target=spam) for _ in range(spammers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'polls': len(latencies),
+        'p50': round(percentile(latencies, 0.50), 2),
+        'p95': round(percentile(latencies, 0.95), 2),
+        'p99': round(percentile(latencies, 0.99), 2),
+        'bytes': round(sum(sizes) / len(sizes)) if sizes else 0,
+        'posted': statuses.get(201, 0),
+        'limited': statuses.get(429, 0),
+        'other': sum(count for status, count in statuses.items() if status not in (201, 429)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure readers while chat or comment posts are flooded')
+    parser.add_argument('--target', choices=['chat', 'comments'], default='chat')
+    parser.add_argument('--news-id', type=int, default=1, help='news item the comment flood and readers use')
+    parser.add_argument('--spammers', type=int, default=8, help='threads posting as fast as they can')
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--poll-interval', type=float, default=0.05, help='pause between one reader\'s polls')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per phase')
+    parser.add_argument('--rotate-ids', action='store_true', help='a new steam_id for every spam post')
+    parser.add_argument('--no-limit', action='store_true', help='disable the rate limits (in-process only)')
+    parser.add_argument('--url', help='base URL of a running tools/gateway.py instead of in-process handlers')
+    args = parser.parse_args()
+
+    if args.no_limit:
+        if args.url:
+            sys.exit('--no-limit only works in-process; start the gateway with the *_RATE_* variables instead')
+        os.environ.update(NO_LIMIT)
+
+    client = HttpClient(args.url) if args.url else InProcessClient([args.target])
+
+    quiet = run_phase(client, args, spammers=0)
+    flood = run_phase(client, args, spammers=args.spammers)
+
+    print(f"{'phase':<8}  {'polls':>6}  {'p50 ms':>7}  {'p95 ms':>7}  {'p99 ms':>7}  {'bytes':>7}  "
+          f"{'posted':>7}  {'429':>7}  {'other':>5}")
+    for name, result in (('quiet', quiet), ('flood', flood)):
+        print(f"{name:<8}  {result['polls']:>6}  {result['p50']:>7}  {result['p95']:>7}  {result['p99']:>7}  "
+              f"{result['bytes']:>7}  {result['posted']:>7}  {result['limited']:>7}  {result['other']:>5}")
+    print(f"spam accepted: {flood['posted'] / args.duration:.1f} posts/s")
+
+
+if __name__ == '__main__':
+    main()
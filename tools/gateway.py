@@ -0,0 +1,283 @@
+'''
+Business: Local HTTP gateway that serves every backend function from one process
+Args: --host, --port, --workers, --functions; DATABASE_URL and other secrets from the environment
+Returns: runs a threaded HTTP server routing /<function-name>/... to that function's handler,
+         logging one JSON line per request with its SQL statistics (see sqlstats.py);
+         GET /chat/stream is a Server-Sent Events feed of the chat (see chatstream.py)
+
+Usage: DATABASE_URL=postgresql://... python tools/gateway.py --port 8000
+'''
+
+import argparse
+import base64
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Dict, Any, Callable, Optional, List
+from urllib.parse import urlsplit, parse_qsl
+
+import sqlstats
+from chatstream import ChatStreamHub, parse_cursor
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+Handler = Callable[[Dict[str, Any], Any], Dict[str, Any]]
+
+_import_lock = threading.Lock()
+
+
+def function_names(backend_dir: str = BACKEND_DIR) -> List[str]:
+    with open(os.path.join(backend_dir, 'func2url.json')) as f:
+        return sorted(json.load(f))
+
+
+def load_function(name: str, backend_dir: str = BACKEND_DIR) -> Handler:
+    '''
+    Import backend/<name>/index.py as its own module. Helper modules next to it
+    (db.py, a2s.py) are imported from the function directory and then removed
+    from sys.modules, so every function keeps its own copies as in production.
+    '''
+    function_dir = os.path.abspath(os.path.join(backend_dir, name))
+
+    with _import_lock:
+        before = set(sys.modules)
+        sys.path.insert(0, function_dir)
+        try:
+            spec = importlib.util.spec_from_file_location(f'functions.{name}', os.path.join(function_dir, 'index.py'))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        finally:
+            sys.path.remove(function_dir)
+            for module_name in set(sys.modules) - before:
+                module_file = getattr(sys.modules[module_name], '__file__', None) or ''
+                if os.path.abspath(module_file).startswith(function_dir + os.sep):
+                    del sys.modules[module_name]
+
+    return module.handler
+
+
+def load_functions(names: Optional[List[str]] = None, backend_dir: str = BACKEND_DIR) -> Dict[str, Handler]:
+    return {name: load_function(name, backend_dir) for name in (names or function_names(backend_dir))}
+
+
+def build_event(method: str, path: str, headers: Optional[Dict[str, str]] = None,
+                body: str = '', source_ip: str = '127.0.0.1') -> Dict[str, Any]:
+    '''Translate an HTTP request into the event dict the cloud functions receive.'''
+    url = urlsplit(path)
+    params = dict(parse_qsl(url.query, keep_blank_values=True))
+    return {
+        'httpMethod': method,
+        'url': path,
+        'headers': dict(headers or {}),
+        'params': params,
+        'queryStringParameters': params,
+        'pathParams': {},
+        'body': body,
+        'isBase64Encoded': False,
+        'requestContext': {
+            'requestId': str(uuid.uuid4()),
+            'identity': {'sourceIp': source_ip}
+        }
+    }
+
+
+def invoke(name: str, handler: Handler, event: Dict[str, Any]) -> Dict[str, Any]:
+    context = SimpleNamespace(request_id=event['requestContext']['requestId'], function_name=name)
+    try:
+        return handler(event, context)
+    except Exception as e:
+        return {
+            'statusCode': 502,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': f'{type(e).__name__}: {e}'})
+        }
+
+
+class FunctionRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    functions: Dict[str, Handler] = {}
+    chat_stream: Optional[ChatStreamHub] = None
+    quiet = False
+
+    def route(self) -> None:
+        name, _, rest = self.path.lstrip('/').partition('/')
+        name, _, query = name.partition('?')
+        handler = self.functions.get(name)
+
+        if name == 'chat' and self.command == 'GET' and rest.partition('?')[0] == 'stream' and self.chat_stream:
+            self.open_stream(rest.partition('?')[2])
+            return
+
+        if not handler:
+            self.respond(404, {'Content-Type': 'application/json'}, json.dumps({
+                'error': 'Unknown function',
+                'functions': sorted(self.functions)
+            }).encode())
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8') if length else ''
+        path = '/' + rest + (('?' + query) if query else '')
+        event = build_event(self.command, path, dict(self.headers.items()), body, self.client_address[0])
+
+        started = time.perf_counter()
+        with sqlstats.track() as stats:
+            response = invoke(name, handler, event)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        payload = response.get('body') or ''
+        if response.get('isBase64Encoded'):
+            data = base64.b64decode(payload)
+        else:
+            data = payload.encode('utf-8') if isinstance(payload, str) else json.dumps(payload).encode('utf-8')
+
+        headers = dict(response.get('headers') or {})
+        headers['X-Query-Count'] = stats.queries
+        headers['X-DB-Time-Ms'] = round(stats.db_time * 1000, 2)
+        repeated = stats.repeated()
+        if repeated:
+            # The most repeated statement shape, for loadtest.py --url --fail-on-repeated
+            headers['X-Repeated-Count'] = repeated[0]['count']
+            headers['X-Repeated-Sql'] = repeated[0]['sql'][:200].encode('ascii', 'replace').decode('ascii')
+        self.respond(response.get('statusCode', 200), headers, data)
+
+        if not self.quiet:
+            print(json.dumps(dict({
+                'function': name,
+                'method': self.command,
+                'path': path,
+                'status': response.get('statusCode', 200),
+                'ms': round(elapsed, 1)
+            }, **stats.as_dict()), ensure_ascii=False), flush=True)
+
+    def open_stream(self, query: str) -> None:
+        '''Send the SSE response headers and hand the socket to the hub, freeing this worker.'''
+        cursor = parse_cursor(self.headers.get('Last-Event-ID'), dict(parse_qsl(query)))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+        self.server.detach(self.connection)
+        self.chat_stream.subscribe(self.connection.dup(), cursor)
+
+        if not self.quiet:
+            print(json.dumps({'function': 'chat', 'method': 'GET', 'path': '/stream', 'status': 200,
+                              'subscribers': len(self.chat_stream.subscribers) + 1}), flush=True)
+
+    def respond(self, status: int, headers: Dict[str, str], data: bytes) -> None:
+        self.send_response(status)
+        for key, value in headers.items():
+            if key.lower() != 'content-length':
+                self.send_header(key, str(value))
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = do_OPTIONS = route
+
+
+class GatewayServer(ThreadingHTTPServer):
+    '''HTTP server that runs requests on a bounded worker pool instead of a thread per connection.'''
+
+    daemon_threads = True
+    # The default backlog of 5 makes bursts of new connections wait for SYN retries;
+    # chat stream subscribers all reconnect at once after a restart, so leave room for that burst
+    request_queue_size = 1024
+
+    def __init__(self, address, handler_class, workers: int):
+        super().__init__(address, handler_class)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gateway')
+        self.detached = set()
+        self.detached_lock = threading.Lock()
+
+    def process_request(self, request, client_address) -> None:
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def detach(self, request) -> None:
+        '''Keep the connection open after the handler returns; a duplicate of the socket lives on elsewhere.'''
+        with self.detached_lock:
+            self.detached.add(request)
+
+    def shutdown_request(self, request) -> None:
+        with self.detached_lock:
+            detached = request in self.detached
+            self.detached.discard(request)
+        if detached:
+            # shutdown() would end the TCP stream for the duplicate too, close() only drops this descriptor
+            self.close_request(request)
+        else:
+            super().shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
+
+def make_chat_stream(handler: Handler, dsn: str) -> ChatStreamHub:
+    def fetch(params: Dict[str, str]) -> Dict[str, Any]:
+        event = build_event('GET', '/?' + '&'.join(f'{key}={value}' for key, value in params.items()))
+        response = invoke('chat', handler, event)
+        if response.get('statusCode', 200) != 200:
+            raise RuntimeError(f"chat GET returned {response.get('statusCode')}: {response.get('body')}")
+        return json.loads(response['body'])
+
+    return ChatStreamHub(dsn, fetch)
+
+
+def make_server(functions: Dict[str, Handler], host: str = '127.0.0.1', port: int = 8000,
+                workers: int = 32, quiet: bool = False,
+                chat_stream: Optional[ChatStreamHub] = None) -> GatewayServer:
+    handler_class = type('BoundFunctionRequestHandler', (FunctionRequestHandler,), {
+        'functions': functions,
+        'chat_stream': chat_stream,
+        'quiet': quiet
+    })
+    return GatewayServer((host, port), handler_class, workers)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Serve all backend functions from one process')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=32, help='concurrent requests handled at once')
+    parser.add_argument('--functions', nargs='*', help='subset of functions to load (default: all)')
+    parser.add_argument('--quiet', action='store_true', help='do not log every request')
+    parser.add_argument('--no-chat-stream', action='store_true', help='do not serve GET /chat/stream')
+    args = parser.parse_args()
+
+    sqlstats.install()
+    functions = load_functions(args.functions)
+
+    chat_stream = None
+    if 'chat' in functions and os.environ.get('DATABASE_URL') and not args.no_chat_stream:
+        chat_stream = make_chat_stream(functions['chat'], os.environ['DATABASE_URL'])
+        chat_stream.start()
+
+    server = make_server(functions, args.host, args.port, args.workers, args.quiet, chat_stream)
+
+    print(f'Serving {len(functions)} functions on http://{args.host}:{args.port}/<function-name>/', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if chat_stream:
+            chat_stream.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+'''
+Business: Contention test of the comment like toggle - a rush of likes from many users at the same comments,
+          double clicks sent in parallel by the same user, then a concurrent toggle of every pair
+Args: --comments, --users, --concurrency, --news-id, --url; DATABASE_URL for setup and checks
+Returns: outcome counts and latency per phase; exit code 1 if a like was lost or doubled, comments.likes_count or
+         news_comment_stats drifted from the rows, or a final toggle did not flip its pair
+
+Usage:
+  DATABASE_URL=postgresql://... python tools/liketest.py --comments 5 --users 200
+  DATABASE_URL=postgresql://... python tools/liketest.py --url http://127.0.0.1:8000
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Set, Tuple
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from counters import rebuild_comment_counters
+from loadtest import HttpClient, InProcessClient, percentile
+
+SCHEMA = 't_p15345778_news_shop_project'
+
+Pair = Tuple[int, str]
+
+
+def create_comments(dsn: str, news_id: int, comments: int) -> List[int]:
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn, conn.cursor() as cur:
+            ids = [row[0] for row in execute_values(cur, f'''
+                INSERT INTO {SCHEMA}.comments (news_id, author, text, steam_id) VALUES %s RETURNING id
+            ''', [(news_id, 'Like test', f'Like test comment {i}', '76561198000000000') for i in range(comments)],
+                fetch=True)]
+            rebuild_comment_counters(cur, [news_id])
+            return ids
+    finally:
+        conn.close()
+
+
+def stored_state(dsn: str, news_id: int) -> Dict[str, Any]:
+    '''Like rows, each comment's counter against its rows, and the news counter against the comments.'''
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f'''
+                SELECT l.comment_id, l.steam_id, COUNT(*) OVER (PARTITION BY l.comment_id, l.steam_id)
+                FROM {SCHEMA}.comment_likes l
+                JOIN {SCHEMA}.comments c ON c.id = l.comment_id
+                WHERE c.news_id = %s
+            ''', (news_id,))
+            rows = cur.fetchall()
+            cur.execute(f'''
+                SELECT c.id, c.likes_count, (SELECT COUNT(*) FROM {SCHEMA}.comment_likes l WHERE l.comment_id = c.id)
+                FROM {SCHEMA}.comments c
+                WHERE c.news_id = %s
+            ''', (news_id,))
+            drifted = [row for row in cur.fetchall() if row[1] != row[2]]
+            cur.execute(f'''
+                SELECT s.likes_count, (SELECT COALESCE(SUM(likes_count), 0) FROM {SCHEMA}.comments WHERE news_id = s.news_id)
+                FROM {SCHEMA}.news_comment_stats s
+                WHERE s.news_id = %s
+            ''', (news_id,))
+            news_counter, news_sum = cur.fetchone()
+            return {
+                'likes': {(comment_id, steam_id) for comment_id, steam_id, _ in rows},
+                'duplicates': sum(1 for _, _, copies in rows if copies > 1),
+                'drifted': drifted,
+                'news_drifted': news_counter != news_sum
+            }
+    finally:
+        conn.close()
+
+
+def delete_comments(dsn: str, news_id: int) -> None:
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(f'DELETE FROM {SCHEMA}.comment_likes WHERE comment_id IN (SELECT id FROM {SCHEMA}.comments WHERE news_id = %s)',
+                        (news_id,))
+            cur.execute(f'DELETE FROM {SCHEMA}.comments WHERE news_id = %s', (news_id,))
+            cur.execute(f'DELETE FROM {SCHEMA}.news_comment_stats WHERE news_id = %s', (news_id,))
+    finally:
+        conn.close()
+
+
+def like_case(pair: Pair) -> Dict[str, Any]:
+    return {
+        'function': 'comments', 'method': 'PUT', 'path': '/',
+        'body': {'action': 'like', 'comment_id': pair[0], 'steam_id': pair[1]}
+    }
+
+
+def fire(client, pairs: List[Pair], concurrency: int) -> Dict[str, Any]:
+    '''Release all workers at once and toggle every pair in the list; a pair listed twice is a double click.'''
+    lock = threading.Lock()
+    pending = iter(enumerate(pairs))
+    outcomes: Dict[str, int] = {}
+    latencies: List[float] = []
+
+    def work() -> None:
+        start.wait()
+        while True:
+            with lock:
+                item = next(pending, None)
+            if item is None:
+                return
+            number, pair = item
+            started = time.perf_counter()
+            status, body, _ = client.call(like_case(pair), number)
+            elapsed = (time.perf_counter() - started) * 1000
+            try:
+                data = json.loads(body)
+            except ValueError:
+                data = {}
+            outcome = ('liked' if data.get('is_liked') else 'unliked') if status == 200 else f'http {status}'
+            with lock:
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=work) for _ in range(min(concurrency, len(pairs)))]
+    start = threading.Barrier(len(threads) + 1)
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {'elapsed': time.perf_counter() - began, 'outcomes': outcomes, 'latencies': latencies}
+
+
+def report(name: str, requests: int, run: Dict[str, Any], state: Dict[str, Any]) -> None:
+    latencies = run['latencies']
+    print(f"{name:<13} {requests} toggles in {run['elapsed']:.2f} s ({requests / run['elapsed']:.0f}/s), "
+          f"p50 {percentile(latencies, 0.5):.1f} ms  p99 {percentile(latencies, 0.99):.1f} ms")
+    print('  outcomes    ' + ', '.join(f'{outcome} {count}' for outcome, count in sorted(run['outcomes'].items())))
+    print(f"  stored      {len(state['likes'])} likes, {state['duplicates']} duplicated, "
+          f"{len(state['drifted'])} comment counters drifted, news counter {'drifted' if state['news_drifted'] else 'ok'}")
+
+
+def check_state(failures: List[str], phase: str, state: Dict[str, Any], expected: Set[Pair]) -> None:
+    if state['likes'] != expected:
+        failures.append(f"{phase}: {len(expected - state['likes'])} likes lost, "
+                        f"{len(state['likes'] - expected)} unexpected")
+    if state['duplicates']:
+        failures.append(f"{phase}: {state['duplicates']} duplicated like rows")
+    if state['drifted']:
+        failures.append(f"{phase}: likes_count differs from the rows for comments {[row[0] for row in state['drifted'][:5]]}")
+    if state['news_drifted']:
+        failures.append(f'{phase}: news_comment_stats.likes_count differs from the comments')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Fire concurrent like toggles at a few comments')
+    parser.add_argument('--comments', type=int, default=5)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=64, help='requests in flight (keep under max_connections)')
+    parser.add_argument('--double-clicks', type=float, default=0.3, help='share of pairs clicked twice at once')
+    parser.add_argument('--news-id', type=int, default=990, help='news id the test comments are created under')
+    parser.add_argument('--url', help='base URL of a running tools/gateway.py instead of in-process handlers')
+    parser.add_argument('--keep', action='store_true', help='leave the test comments in the database')
+    args = parser.parse_args()
+
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        sys.exit('DATABASE_URL is not set')
+
+    client = HttpClient(args.url) if args.url else InProcessClient(['comments'])
+    comment_ids = create_comments(dsn, args.news_id, args.comments)
+    users = [str(76561198800000000 + i) for i in range(args.users)]
+    pairs = [(comment_id, steam_id) for comment_id in comment_ids for steam_id in users]
+    failures: List[str] = []
+    random.seed(0)
+
+    try:
+        # Everyone likes every comment once, all at the same time: no like may be lost
+        shuffled = random.sample(pairs, len(pairs))
+        rush = fire(client, shuffled, args.concurrency)
+        state = stored_state(dsn, args.news_id)
+        report('rush', len(shuffled), rush, state)
+        check_state(failures, 'rush', state, set(pairs))
+        if rush['outcomes'].get('liked', 0) != len(pairs):
+            failures.append('rush: not every first click answered liked')
+
+        # Double clicks: both toggles of a pair go out back to back and race each other, so either
+        # order may win, but every like row must still be counted exactly once
+        doubled = random.sample(pairs, int(len(pairs) * args.double_clicks))
+        clicks = [pair for pair in doubled for _ in range(2)]
+        double = fire(client, clicks, args.concurrency)
+        state = stored_state(dsn, args.news_id)
+        report('double clicks', len(clicks), double, state)
+        check_state(failures, 'double clicks', state, state['likes'])
+        if not state['likes'] >= set(pairs) - set(doubled):
+            failures.append('double clicks: likes of pairs that were not clicked changed')
+
+        # One toggle of every pair at once must flip exactly that pair
+        before = state['likes']
+        flip = fire(client, random.sample(pairs, len(pairs)), args.concurrency)
+        state = stored_state(dsn, args.news_id)
+        report('flip', len(pairs), flip, state)
+        check_state(failures, 'flip', state, set(pairs) - before)
+        if flip['outcomes'].get('liked', 0) != len(pairs) - len(before):
+            failures.append('flip: answers disagree with the stored likes')
+    finally:
+        if not args.keep:
+            delete_comments(dsn, args.news_id)
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if not failures:
+        print('OK: no like was lost or doubled and every counter matches the like rows')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+'''
+Business: Replay every function's tests.json as a benchmark, in-process or against a running gateway
+Args: --functions, --match, --requests, --concurrency, --url, --save-baseline, --compare
+Returns: per-case throughput, p50/p95/p99 latency, queries per request and failures; exit code 1 on failures or regressions
+
+Usage:
+  DATABASE_URL=postgresql://... python tools/loadtest.py --requests 200 --concurrency 16
+  python tools/loadtest.py --url http://127.0.0.1:8000 --match "GET" --save-baseline bench.json
+  python tools/loadtest.py --compare bench.json --tolerance 0.2
+
+Cases may declare "variants": a list of overrides (path, body, ...) that run as extra cases.
+"{i}" in a path or body is replaced with the request sequence number, so write cases can use unique ids.
+"maxQueries" in a case (or --max-queries for all cases) is a query budget: a request running more
+SQL statements than that counts as a failure. --fail-on-repeated also fails requests that repeat one
+statement shape (a likely N+1, see sqlstats.REPEAT_THRESHOLD).
+'''
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import gateway
+import sqlstats
+
+TYPE_MARKERS = {
+    'string': (str,),
+    'number': (int, float),
+    'boolean': (bool,),
+    'array': (list,),
+    'object': (dict,),
+}
+
+
+def load_cases(backend_dir: str = gateway.BACKEND_DIR, functions: Optional[List[str]] = None,
+               match: Optional[str] = None) -> List[Dict[str, Any]]:
+    cases = []
+    for path in sorted(glob.glob(os.path.join(backend_dir, '*', 'tests.json'))):
+        function = os.path.basename(os.path.dirname(path))
+        if functions and function not in functions:
+            continue
+        with open(path) as f:
+            tests = json.load(f).get('tests', [])
+        for test in tests:
+            variants = test.get('variants') or [{}]
+            for index, overrides in enumerate(variants):
+                case = {key: value for key, value in test.items() if key != 'variants'}
+                case.update(overrides)
+                case['function'] = function
+                if len(variants) > 1:
+                    case['name'] = f"{test['name']} [{overrides.get('name', index)}]"
+                case['id'] = f"{function} / {case['method']} {case['name']}"
+                if match and not re.search(match, case['id']):
+                    continue
+                cases.append(case)
+    return cases
+
+
+def body_matches(expected: Any, actual: Any, partial: bool) -> bool:
+    if partial and isinstance(expected, str) and expected in TYPE_MARKERS:
+        if expected == 'number' and isinstance(actual, bool):
+            return False
+        return isinstance(actual, TYPE_MARKERS[expected])
+    if isinstance(expected, dict):
+        if not isinstance(actual, dict):
+            return False
+        if not partial and set(expected) != set(actual):
+            return False
+        return all(key in actual and body_matches(value, actual[key], partial) for key, value in expected.items())
+    if isinstance(expected, list):
+        if not isinstance(actual, list):
+            return False
+        if partial:
+            return all(any(body_matches(item, candidate, partial) for candidate in actual) for item in expected)
+        return len(expected) == len(actual) and all(body_matches(e, a, partial) for e, a in zip(expected, actual))
+    return expected == actual
+
+
+def check_response(case: Dict[str, Any], status: int, body: str) -> Optional[str]:
+    if status != case.get('expectedStatus', 200):
+        return f'status {status} != {case.get("expectedStatus", 200)}'
+    if 'expectedBody' in case:
+        try:
+            actual = json.loads(body) if body else None
+        except ValueError:
+            return 'body is not JSON'
+        if not body_matches(case['expectedBody'], actual, case.get('bodyMatcher') == 'partial'):
+            return 'body mismatch'
+    return None
+
+
+def render(case: Dict[str, Any], sequence: int) -> Tuple[str, str]:
+    path = case.get('path', '/').replace('{i}', str(sequence))
+    body = json.dumps(case['body'], ensure_ascii=False).replace('{i}', str(sequence)) if 'body' in case else ''
+    return path, body
+
+
+class InProcessClient:
+    def __init__(self, functions: List[str]):
+        sqlstats.install()
+        self.handlers = gateway.load_functions(functions)
+
+    def call(self, case: Dict[str, Any], sequence: int) -> Tuple[int, str, Optional[Dict[str, Any]]]:
+        path, body = render(case, sequence)
+        event = gateway.build_event(case['method'], path, case.get('headers'), body)
+        with sqlstats.track() as stats:
+            response = gateway.invoke(case['function'], self.handlers[case['function']], event)
+        return response.get('statusCode', 200), response.get('body') or '', stats.as_dict()
+
+
+class HttpClient:
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+
+    def call(self, case: Dict[str, Any], sequence: int) -> Tuple[int, str, Optional[Dict[str, Any]]]:
+        path, body = render(case, sequence)
+        request = urllib.request.Request(
+            f"{self.base_url}/{case['function']}{path}",
+            data=body.encode('utf-8') if body else None,
+            method=case['method'],
+            headers=dict(case.get('headers') or {}, **{'Content-Type': 'application/json'})
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                status, data, headers = response.status, response.read(), response.headers
+        except urllib.error.HTTPError as e:
+            status, data, headers = e.code, e.read(), e.headers
+        queries = headers.get('X-Query-Count')
+        repeated = headers.get('X-Repeated-Count')
+        stats = {
+            'queries': int(queries),
+            'repeated': [{'count': int(repeated), 'sql': headers.get('X-Repeated-Sql', '')}] if repeated else []
+        } if queries else None
+        return status, data.decode('utf-8', errors='replace'), stats
+
+
+def check_queries(case: Dict[str, Any], stats: Optional[Dict[str, Any]], max_queries: Optional[int],
+                  fail_on_repeated: bool) -> Optional[str]:
+    if stats is None:
+        return None
+    budget = case.get('maxQueries', max_queries)
+    if budget is not None and stats['queries'] > budget:
+        return f"{stats['queries']} queries over the budget of {budget}"
+    if fail_on_repeated and stats['repeated']:
+        worst = stats['repeated'][0]
+        return f"statement repeated {worst['count']} times: {worst['sql'][:120]}"
+    return None
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_case(client, case: Dict[str, Any], requests: int, concurrency: int, warmup: int,
+             max_queries: Optional[int] = None, fail_on_repeated: bool = False) -> Dict[str, Any]:
+    counter = iter(range(10 ** 12))
+    counter_lock = threading.Lock()
+
+    def one(_) -> Tuple[float, Optional[str], Optional[Dict[str, Any]]]:
+        with counter_lock:
+            sequence = next(counter)
+        started = time.perf_counter()
+        try:
+            status, body, stats = client.call(case, sequence)
+            error = check_response(case, status, body) or check_queries(case, stats, max_queries, fail_on_repeated)
+        except Exception as e:
+            error, stats = f'{type(e).__name__}: {e}', None
+        return time.perf_counter() - started, error, stats
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(warmup)))
+        started = time.perf_counter()
+        samples = list(executor.map(one, range(requests)))
+        wall = time.perf_counter() - started
+
+    latencies = sorted(sample[0] * 1000 for sample in samples)
+    errors = [sample[1] for sample in samples if sample[1]]
+    stats = [sample[2] for sample in samples if sample[2] is not None]
+    queries = [item['queries'] for item in stats]
+    repeated = max((item['repeated'][0]['count'] for item in stats if item['repeated']), default=0)
+
+    return {
+        'case': case['id'],
+        'requests': requests,
+        'throughput': round(requests / wall, 1) if wall else 0.0,
+        'p50': round(percentile(latencies, 0.50), 2),
+        'p95': round(percentile(latencies, 0.95), 2),
+        'p99': round(percentile(latencies, 0.99), 2),
+        'queries': round(sum(queries) / len(queries), 2) if queries else None,
+        'maxQueries': max(queries) if queries else None,
+        'repeated': repeated,
+        'failures': len(errors),
+        'firstError': errors[0] if errors else None,
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float) -> List[str]:
+    '''Flag cases that got slower, lost throughput or started running more queries than the baseline.'''
+    regressions = []
+    for result in results:
+        before = baseline.get(result['case'])
+        if not before:
+            continue
+        if result['p95'] > before['p95'] * (1 + tolerance):
+            regressions.append(f"{result['case']}: p95 {before['p95']} -> {result['p95']} ms")
+        if result['throughput'] < before['throughput'] * (1 - tolerance):
+            regressions.append(f"{result['case']}: throughput {before['throughput']} -> {result['throughput']} req/s")
+        if result['queries'] is not None and before.get('queries') is not None and result['queries'] > before['queries']:
+            regressions.append(f"{result['case']}: queries/request {before['queries']} -> {result['queries']}")
+    return regressions
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    width = max([len(result['case']) for result in results] + [4])
+    print(f"{'case':<{width}}  {'req/s':>8}  {'p50':>8}  {'p95':>8}  {'p99':>8}  {'queries':>7}  {'n+1':>4}  {'fail':>5}")
+    for result in results:
+        queries = '-' if result['queries'] is None else f"{result['queries']:g}"
+        repeated = f"{result['repeated']}x" if result['repeated'] else '-'
+        print(f"{result['case']:<{width}}  {result['throughput']:>8}  {result['p50']:>8}  {result['p95']:>8}  "
+              f"{result['p99']:>8}  {queries:>7}  {repeated:>4}  {result['failures']:>5}")
+        if result['firstError']:
+            print(f"{'':<{width}}  first failure: {result['firstError']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark backend functions with their tests.json cases")
+    parser.add_argument('--functions', nargs='*', help='only these functions')
+    parser.add_argument('--match', help='regex over "function / METHOD case name"')
+    parser.add_argument('--requests', type=int, default=100, help='measured requests per case')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=5, help='unmeasured requests per case')
+    parser.add_argument('--url', help='base URL of a running tools/gateway.py instead of in-process handlers')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--save-baseline', help='store the results as a baseline file')
+    parser.add_argument('--compare', help='baseline file to check the results against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown before flagging')
+    parser.add_argument('--max-queries', type=int, help='query budget for cases without their own "maxQueries"')
+    parser.add_argument('--fail-on-repeated', action='store_true', help='fail requests that repeat a statement shape')
+    args = parser.parse_args()
+
+    cases = load_cases(functions=args.functions, match=args.match)
+    if not cases:
+        sys.exit('No matching cases')
+
+    client = HttpClient(args.url) if args.url else InProcessClient(sorted({case['function'] for case in cases}))
+    results = [
+        run_case(client, case, args.requests, args.concurrency, args.warmup, args.max_queries, args.fail_on_repeated)
+        for case in cases
+    ]
+
+    print_report(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({result['case']: result for result in results}, f, indent=2, ensure_ascii=False)
+
+    failed = any(result['failures'] for result in results)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        failed = failed or bool(regressions)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+'''
+Business: Simulation of the server-status polling schedule - per-server timeouts, short probes and backoff -
+          over many poll cycles against a fake fleet with fast, slow, lossy, dead and recovering servers
+Args: --cycles, --interval, --fast, --slow, --dead, --recovering, --loss, --fixed-probe
+Returns: per-cycle wall time, servers polled, online and in backoff, and availability per server class; exit code 1
+         if a live server that answered once was never online in the last third of the run, dead servers were
+         polled every cycle or a cycle probing only servers that never answered outlasted SERVER_PROBE_TIMEOUT
+
+The schedule runs on a virtual clock (one cycle every --interval seconds) so hours of backoff take seconds;
+the A2S polls themselves are real, through backend/server-status/a2s.py, against tools/a2sfleet.py.
+
+Usage:
+  python tools/pollsim.py
+  python tools/pollsim.py --cycles 120 --slow 20 --loss 0.3
+  python tools/pollsim.py --fixed-probe      # failing servers probed for a flat SERVER_PROBE_TIMEOUT, as before
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Dict, Any, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'server-status'))
+
+import a2s
+import index
+from a2sfleet import FakeServer, Fleet
+
+
+def build_fleet(args) -> List[Dict[str, Any]]:
+    '''Server classes: fast (<50 ms), slow (0.6-0.9 s), lossy slow, dead and dead for the first third of the run.'''
+    rng = random.Random(0)
+    spec = []
+    for _ in range(args.fast):
+        spec.append({'class': 'fast', 'server': FakeServer(delay=rng.uniform(0.005, 0.05))})
+    for _ in range(args.slow):
+        spec.append({'class': 'slow', 'server': FakeServer(delay=rng.uniform(0.6, 0.9))})
+    for _ in range(args.slow):
+        spec.append({'class': 'slow lossy', 'server': FakeServer(delay=rng.uniform(0.6, 0.9), loss=args.loss)})
+    for _ in range(args.dead):
+        spec.append({'class': 'dead', 'server': FakeServer(dead=True)})
+    for _ in range(args.recovering):
+        spec.append({'class': 'recovering', 'server': FakeServer(delay=rng.uniform(0.005, 0.05), dead=True)})
+    for item in spec:
+        item.update({'failures': 0, 'rtt_samples': [], 'next_poll': 0.0, 'online': False, 'online_cycles': 0,
+                     'last_online': -1, 'polls': 0})
+    return spec
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Simulate the server-status polling schedule against a fake fleet')
+    parser.add_argument('--cycles', type=int, default=60)
+    parser.add_argument('--interval', type=float, default=60, help='virtual seconds between scheduled polls')
+    parser.add_argument('--fast', type=int, default=50)
+    parser.add_argument('--slow', type=int, default=10, help='slow servers, and as many slow ones with --loss')
+    parser.add_argument('--dead', type=int, default=20)
+    parser.add_argument('--recovering', type=int, default=10, help='servers dead for the first third of the run')
+    parser.add_argument('--loss', type=float, default=0.2, help='share of requests the lossy servers drop')
+    parser.add_argument('--fixed-probe', action='store_true', help='probe failing servers for a flat PROBE_TIMEOUT')
+    parser.add_argument('--quiet', action='store_true', help='print only the summary')
+    args = parser.parse_args()
+
+    if args.fixed_probe:
+        index.probe_timeout = lambda failures, rtt_samples: (
+            min(index.PROBE_TIMEOUT, index.POLL_TIMEOUT) if failures > 0 else
+            min(max(index.rtt_timeout(rtt_samples), index.MIN_TIMEOUT), index.POLL_TIMEOUT) if rtt_samples else
+            index.POLL_TIMEOUT)
+
+    spec = build_fleet(args)
+    failures: List[str] = []
+    cycle_times: List[float] = []
+    dead_polls_late = 0
+
+    with Fleet([item['server'] for item in spec]) as fleet:
+        for item, target in zip(spec, fleet.targets):
+            item['target'] = target
+
+        for cycle in range(args.cycles):
+            now = cycle * args.interval
+            if cycle == args.cycles // 3:
+                for item in spec:
+                    if item['class'] == 'recovering':
+                        item['server'].dead = False
+
+            # The same schedule as refresh_servers: due servers only, each with its own timeout
+            due = [item for item in spec if item['next_poll'] <= now]
+            timeouts = {item['target']: index.probe_timeout(item['failures'], item['rtt_samples']) for item in due}
+            started = time.perf_counter()
+            statuses = a2s.query_info(list(timeouts), index.POLL_TIMEOUT, timeouts)
+            cycle_times.append(time.perf_counter() - started)
+
+            for item in due:
+                item['polls'] += 1
+                result = statuses[item['target']]
+                if result['status'] == 'online':
+                    item['failures'] = 0
+                    item['rtt_samples'] = (item['rtt_samples'] + [result['rtt']])[-index.RTT_SAMPLES:]
+                    item['online'] = True
+                    item['next_poll'] = now
+                else:
+                    item['failures'] += 1
+                    item['online'] = False
+                    item['next_poll'] = now + index.backoff_delay(item['failures'])
+                if item['class'] == 'dead' and cycle >= args.cycles // 2:
+                    dead_polls_late += 1
+
+            for item in spec:
+                item['online_cycles'] += item['online']
+                if item['online']:
+                    item['last_online'] = cycle
+
+            if not args.quiet:
+                online = sum(item['online'] for item in spec)
+                backoff = sum(1 for item in spec if item['next_poll'] > now + args.interval)
+                print(f'cycle {cycle + 1:>3}  {cycle_times[-1]:6.3f} s  polled {len(due):>3}  online {online:>3}  '
+                      f'backoff {backoff:>3}')
+
+        # One more cycle with only the servers that never answered due, as when the rest of the fleet is fast
+        probes = [item for item in spec if item['failures'] > 0 and not item['rtt_samples']]
+        probe_time = None
+        if probes:
+            timeouts = {item['target']: index.probe_timeout(item['failures'], item['rtt_samples']) for item in probes}
+            started = time.perf_counter()
+            a2s.query_info(list(timeouts), index.POLL_TIMEOUT, timeouts)
+            probe_time = time.perf_counter() - started
+
+    print()
+    print(f'{"class":<12} {"servers":>7} {"online at end":>13} {"availability":>12} {"polls each":>10} '
+          f'{"never":>6} {"stuck":>6}')
+    for name in ('fast', 'slow', 'slow lossy', 'dead', 'recovering'):
+        items = [item for item in spec if item['class'] == name]
+        if not items:
+            continue
+        online = sum(item['online'] for item in items)
+        availability = sum(item['online_cycles'] for item in items) / (len(items) * args.cycles)
+        polls = sum(item['polls'] for item in items) / len(items)
+        # A server that never answered is probed like a dead one; one that did but was not seen online in the
+        # last third of the run is stuck offline
+        never = sum(1 for item in items if not item['rtt_samples'])
+        stuck = sum(1 for item in items
+                    if item['rtt_samples'] and item['last_online'] < args.cycles - args.cycles // 3)
+        print(f'{name:<12} {len(items):>7} {online:>13} {availability:>12.1%} {polls:>10.1f} {never:>6} '
+              f'{"-" if name == "dead" else stuck:>6}')
+        if name != 'dead' and stuck:
+            failures.append(f'{name}: {stuck} live servers were never online in the last third of the run')
+
+    ordered = sorted(cycle_times)
+    print(f'\ncycle time  p50 {ordered[len(ordered) // 2]:.3f} s  max {ordered[-1]:.3f} s  '
+          f'first {cycle_times[0]:.3f} s')
+
+    if probe_time is not None:
+        print(f'probe cycle {probe_time:.3f} s for {len(probes)} servers that never answered  '
+              f'(SERVER_PROBE_TIMEOUT {index.PROBE_TIMEOUT} s)')
+        if probe_time > index.PROBE_TIMEOUT + 0.25:
+            failures.append(f'probes: a cycle probing only servers that never answered took {probe_time:.3f} s, '
+                            f'longer than SERVER_PROBE_TIMEOUT')
+
+    dead = sum(1 for item in spec if item['class'] == 'dead')
+    late_cycles = args.cycles - args.cycles // 2
+    if dead and dead_polls_late >= dead * late_cycles:
+        failures.append('dead: dead servers were polled every cycle, backoff did not apply')
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if not failures:
+        print('OK: every live server that answered, slow or lossy, kept coming back online and dead servers were '
+              'backed off with short probes')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+'''
+Business: Benchmark of the per-function connection pool (db.py) - latency of simple handlers when every invocation
+          opens its own Postgres connection (cold) against reusing a pooled one (warm)
+Args: --functions, --match, --requests; DATABASE_URL
+Returns: p50/p99 latency per case for cold and pooled invocations and the connections opened; exit code 1 if the
+         pooled run opened more than one connection per function or answered differently
+
+Usage:
+  DATABASE_URL=postgresql://... python tools/poolbench.py
+  DATABASE_URL=postgresql://... python tools/poolbench.py --functions servers news --requests 1000
+'''
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from typing import Dict, Any, List
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import gateway
+from loadtest import check_response, load_cases, percentile, render
+
+
+def count_connects() -> Dict[str, int]:
+    '''Count new Postgres connections, the same way sqlstats.install() routes them through psycopg2.connect.'''
+    counter = {'connects': 0}
+    connect = psycopg2.connect
+
+    def counted(*args, **kwargs):
+        counter['connects'] += 1
+        return connect(*args, **kwargs)
+
+    psycopg2.connect = counted
+    return counter
+
+
+def run(handler, case: Dict[str, Any], requests: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    for sequence in range(requests):
+        path, body = render(case, sequence)
+        event = gateway.build_event(case['method'], path, case.get('headers'), body)
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            response = gateway.invoke(case['function'], handler, event)
+            latencies.append((time.perf_counter() - started) * 1000)
+        if check_response(case, response.get('statusCode', 200), response.get('body') or ''):
+            errors += 1
+    latencies.sort()
+    return {'p50': percentile(latencies, 0.5), 'p99': percentile(latencies, 0.99), 'errors': errors}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compare cold and pooled database connections in simple handlers')
+    parser.add_argument('--functions', nargs='+', default=['servers', 'menu-items', 'partners'])
+    parser.add_argument('--match', default=' GET ', help='regex on "<function> / <METHOD> <name>" of the cases to run')
+    parser.add_argument('--requests', type=int, default=500, help='invocations per case and mode')
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        sys.exit('DATABASE_URL is not set')
+
+    cases = load_cases(functions=args.functions, match=args.match)
+    counter = count_connects()
+    failures: List[str] = []
+
+    print(f'{"case":<44} {"cold p50":>9} {"p99":>8} {"pooled p50":>11} {"p99":>8} {"connects":>9}')
+    for case in cases:
+        handler = gateway.load_function(case['function'])
+        db = handler.__globals__['db']
+        counter['connects'] = 0
+        pool_size = db.POOL_MAX_SIZE
+
+        # Cold: a pool that keeps nothing, so every invocation connects and disconnects
+        db.POOL_MAX_SIZE = 0
+        cold = run(handler, case, args.requests)
+        cold_connects = counter['connects']
+
+        db.POOL_MAX_SIZE = pool_size
+        counter['connects'] = 0
+        run(handler, case, 1)
+        warm = run(handler, case, args.requests)
+        warm_connects = counter['connects']
+
+        print(f"{case['id'][:44]:<44} {cold['p50']:8.2f}ms {cold['p99']:7.2f}ms {warm['p50']:10.2f}ms "
+              f"{warm['p99']:7.2f}ms {cold_connects:>4}/{warm_connects:<4}")
+
+        if warm_connects > 1:
+            failures.append(f"{case['id']}: pooled run opened {warm_connects} connections")
+        if warm['errors'] != cold['errors']:
+            failures.append(f"{case['id']}: {warm['errors']} pooled and {cold['errors']} cold responses failed checks")
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if not failures:
+        print('OK: pooled invocations reused one connection per function and answered like cold ones')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+'''
+Business: Contention test of tournament registration - a rush of concurrent registrations at a small tournament,
+          then simultaneous cancellations that promote from the waitlist, then confirmations racing cancellations,
+          then a cancellation while the head of the waitlist is registered already
+Args: --seats, --attempts, --concurrency, --duplicates, --cancels, --late, --confirms, --url; DATABASE_URL for setup
+      and checks
+Returns: outcome counts, latency and queries per request for every phase; exit code 1 unless exactly --seats
+         registrations succeeded, the rest queued in order, every cancellation promoted the head of the waitlist
+         (the next one when the head is registered already), no confirmation deadlocked with a cancellation
+         and the counters match the stored rows
+
+Usage:
+  DATABASE_URL=postgresql://... python tools/registrationtest.py --seats 64 --attempts 2000 --cancels 32
+  DATABASE_URL=postgresql://... python tools/registrationtest.py --url http://127.0.0.1:8000
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Tuple
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import HttpClient, InProcessClient, percentile
+
+SCHEMA = 't_p15345778_news_shop_project'
+
+
+def create_tournament(dsn: str, seats: int) -> int:
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(f'''
+                INSERT INTO {SCHEMA}.tournaments (name, description, prize_pool, max_participants, tournament_type, start_date, status, game)
+                VALUES ('Registration rush', 'Created by tools/registrationtest.py', 0, %s, 'solo', now() + interval '1 day', 'upcoming', 'CS2')
+                RETURNING id
+            ''', (seats,))
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def stored_state(dsn: str, tournament_id: int) -> Dict[str, Any]:
+    '''Counters, registered steam ids, the waitlist in queue order and anyone listed in both.'''
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f'SELECT participants_count, waitlist_count, confirmed_count FROM {SCHEMA}.tournaments WHERE id = %s',
+                        (tournament_id,))
+            participants_count, waitlist_count, confirmed_count = cur.fetchone()
+            cur.execute(f'SELECT steam_id, confirmed_at FROM {SCHEMA}.tournament_registrations WHERE tournament_id = %s',
+                        (tournament_id,))
+            rows = cur.fetchall()
+            registered = {row[0] for row in rows}
+            cur.execute(f'SELECT steam_id FROM {SCHEMA}.tournament_waitlist WHERE tournament_id = %s ORDER BY id',
+                        (tournament_id,))
+            waitlist = [row[0] for row in cur.fetchall()]
+            return {
+                'participants_count': participants_count,
+                'waitlist_count': waitlist_count,
+                'confirmed_count': confirmed_count,
+                'registered': registered,
+                'confirmed': {steam_id for steam_id, confirmed_at in rows if confirmed_at is not None},
+                'waitlist': waitlist,
+                'both': registered & set(waitlist)
+            }
+    finally:
+        conn.close()
+
+
+def delete_tournament(dsn: str, tournament_id: int) -> None:
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(f'DELETE FROM {SCHEMA}.tournament_registrations WHERE tournament_id = %s', (tournament_id,))
+            cur.execute(f'DELETE FROM {SCHEMA}.tournament_waitlist WHERE tournament_id = %s', (tournament_id,))
+            cur.execute(f'DELETE FROM {SCHEMA}.tournaments WHERE id = %s', (tournament_id,))
+    finally:
+        conn.close()
+
+
+def registration_case(tournament_id: int, steam_id: str, name: str) -> Dict[str, Any]:
+    return {
+        'function': 'tournaments', 'method': 'POST', 'path': '/',
+        'body': {'tournament_id': tournament_id, 'steam_id': steam_id, 'persona_name': name}
+    }
+
+
+def cancel_case(tournament_id: int, steam_id: str) -> Dict[str, Any]:
+    return {
+        'function': 'tournaments', 'method': 'DELETE', 'path': '/',
+        'body': {'tournament_id': tournament_id, 'steam_id': steam_id}
+    }
+
+
+def confirm_case(tournament_id: int, steam_id: str) -> Dict[str, Any]:
+    return {
+        'function': 'tournaments', 'method': 'PATCH', 'path': '/',
+        'body': {'tournament_id': tournament_id, 'steam_id': steam_id}
+    }
+
+
+def plan_attempts(tournament_id: int, attempts: int, duplicates: float) -> List[Dict[str, Any]]:
+    '''One registration case per attempt; a share of them repeat a steam id used earlier in the rush.'''
+    random.seed(0)
+    steam_ids: List[str] = []
+    cases = []
+    for i in range(attempts):
+        if steam_ids and random.random() < duplicates:
+            steam_id = random.choice(steam_ids)
+        else:
+            steam_id = str(76561198500000000 + i)
+            steam_ids.append(steam_id)
+        cases.append(registration_case(tournament_id, steam_id, f'Rusher {i}'))
+    return cases
+
+
+def fire(client, cases: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    '''Release all workers at once and send every case; outcomes are the responses' "status" fields.'''
+    lock = threading.Lock()
+    pending = iter(enumerate(cases))
+    outcomes: Dict[str, int] = {}
+    results: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+    latencies: List[float] = []
+    queries: List[int] = []
+    start = threading.Barrier(concurrency + 1)
+
+    def work() -> None:
+        start.wait()
+        while True:
+            with lock:
+                item = next(pending, None)
+            if item is None:
+                return
+            number, case = item
+            started = time.perf_counter()
+            status, body, stats = client.call(case, number)
+            elapsed = (time.perf_counter() - started) * 1000
+            try:
+                data = json.loads(body)
+            except ValueError:
+                data = {}
+            outcome = data.get('status') or f'http {status}'
+            with lock:
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                results.append((case, data))
+                latencies.append(elapsed)
+                if stats:
+                    queries.append(stats['queries'])
+
+    threads = [threading.Thread(target=work) for _ in range(min(concurrency, len(cases)))]
+    start = threading.Barrier(len(threads) + 1)
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'elapsed': time.perf_counter() - began,
+        'outcomes': outcomes,
+        'results': results,
+        'latencies': latencies,
+        'queries': sum(queries) / len(queries) if queries else None
+    }
+
+
+def report(name: str, requests: int, run: Dict[str, Any]) -> None:
+    latencies = run['latencies']
+    print(f"{name:<12} {requests} requests in {run['elapsed']:.2f} s ({requests / run['elapsed']:.0f}/s)")
+    print('  outcomes   ' + ', '.join(f'{outcome} {count}' for outcome, count in sorted(run['outcomes'].items())))
+    print(f'  latency ms p50 {percentile(latencies, 0.5):.1f}  p95 {percentile(latencies, 0.95):.1f}  '
+          f'p99 {percentile(latencies, 0.99):.1f}')
+    if run['queries'] is not None:
+        print(f"  queries    {run['queries']:.2f} per request")
+
+
+def check(failures: List[str], condition: bool, message: str) -> None:
+    if not condition:
+        failures.append(message)
+
+
+def stale_phase(failures: List[str], client, dsn: str, tournament_id: int) -> None:
+    '''A waitlist entry whose player is registered already (e.g. added by hand) must not take the freed seat.'''
+    registered = sorted(stored_state(dsn, tournament_id)['registered'])
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(f'''
+                UPDATE {SCHEMA}.tournament_waitlist SET steam_id = %s
+                WHERE id = (SELECT MIN(id) FROM {SCHEMA}.tournament_waitlist WHERE tournament_id = %s)
+            ''', (registered[0], tournament_id))
+    finally:
+        conn.close()
+
+    before = stored_state(dsn, tournament_id)
+    queue = [steam_id for steam_id in before['waitlist'] if steam_id not in before['registered']]
+    answer = json.loads(client.call(cancel_case(tournament_id, registered[1]), 0)[1])
+    after = stored_state(dsn, tournament_id)
+    print(f"{'stale head':<12} cancel promoted {answer.get('promoted')}, next in line {queue[0]}")
+    check(failures, answer.get('promoted') == [queue[0]], 'stale head: the freed seat did not go to the next in line')
+    check(failures, after['waitlist'] == queue[1:], 'stale head: the queue lost a player or kept a registered one')
+    check(failures, not after['both'], 'stale head: players both registered and waitlisted')
+    check(failures, len(after['registered']) == after['participants_count'] == before['participants_count'],
+          'stale head: seats were over- or undersubscribed')
+    check(failures, len(after['waitlist']) == after['waitlist_count'], 'stale head: waitlist counter drifted')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Fire concurrent registrations and cancellations at one tournament')
+    parser.add_argument('--seats', type=int, default=64)
+    parser.add_argument('--attempts', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=80, help='requests in flight (keep under max_connections)')
+    parser.add_argument('--duplicates', type=float, default=0.1, help='share of attempts repeating an earlier steam id')
+    parser.add_argument('--cancels', type=int, default=32, help='registered players cancelling at the same moment')
+    parser.add_argument('--late', type=int, default=100, help='new registrations sent along with the cancellations')
+    parser.add_argument('--confirms', type=int, default=48,
+                        help='registered players confirming at once, the first --cancels of them also cancelling')
+    parser.add_argument('--url', help='base URL of a running tools/gateway.py instead of in-process handlers')
+    parser.add_argument('--keep', action='store_true', help='leave the test tournament in the database')
+    args = parser.parse_args()
+
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        sys.exit('DATABASE_URL is not set')
+
+    client = HttpClient(args.url) if args.url else InProcessClient(['tournaments'])
+    tournament_id = create_tournament(dsn, args.seats)
+    failures: List[str] = []
+
+    try:
+        rush = fire(client, plan_attempts(tournament_id, args.attempts, args.duplicates), args.concurrency)
+        report('rush', args.attempts, rush)
+        after_rush = stored_state(dsn, tournament_id)
+        print(f"  stored     {len(after_rush['registered'])} registered (counter {after_rush['participants_count']}), "
+              f"{len(after_rush['waitlist'])} waitlisted (counter {after_rush['waitlist_count']})")
+
+        check(failures, rush['outcomes'].get('registered', 0) == len(after_rush['registered'])
+              == after_rush['participants_count'] == args.seats, 'rush: seats were over- or undersubscribed')
+        check(failures, rush['outcomes'].get('waitlisted', 0) == len(after_rush['waitlist'])
+              == after_rush['waitlist_count'], 'rush: waitlist rows, counter and answers disagree')
+        check(failures, not after_rush['both'], 'rush: players both registered and waitlisted')
+        positions = sorted(data['position'] for _, data in rush['results'] if data.get('status') == 'waitlisted')
+        check(failures, positions == list(range(1, len(positions) + 1)), 'rush: waitlist positions are not 1..N')
+
+        # Simultaneous cancellations, mixed with new registrations that must queue behind everyone
+        cancelling = random.sample(sorted(after_rush['registered']), min(args.cancels, len(after_rush['registered'])))
+        cases = [cancel_case(tournament_id, steam_id) for steam_id in cancelling]
+        cases += [registration_case(tournament_id, str(76561198600000000 + i), f'Late {i}') for i in range(args.late)]
+        random.shuffle(cases)
+
+        cancels = fire(client, cases, args.concurrency)
+        report('cancels', len(cases), cancels)
+        after = stored_state(dsn, tournament_id)
+        print(f"  stored     {len(after['registered'])} registered (counter {after['participants_count']}), "
+              f"{len(after['waitlist'])} waitlisted (counter {after['waitlist_count']})")
+
+        expected_promoted = after_rush['waitlist'][:len(cancelling)]
+        promoted = [steam_id for _, data in cancels['results'] for steam_id in data.get('promoted', [])]
+        check(failures, cancels['outcomes'].get('cancelled', 0) == len(cancelling), 'cancels: not every cancel succeeded')
+        check(failures, sorted(promoted) == sorted(expected_promoted),
+              'cancels: promoted players are not the head of the waitlist')
+        check(failures, after['registered'] == (after_rush['registered'] - set(cancelling)) | set(expected_promoted),
+              'cancels: registrations are not the survivors plus the promoted players')
+        check(failures, len(after['registered']) == after['participants_count'] == args.seats,
+              'cancels: seats were over- or undersubscribed')
+        check(failures, after['waitlist'][:len(after_rush['waitlist']) - len(cancelling)]
+              == after_rush['waitlist'][len(cancelling):], 'cancels: the rest of the queue lost its order')
+        check(failures, len(after['waitlist']) == after['waitlist_count'], 'cancels: waitlist counter drifted')
+        check(failures, not after['both'], 'cancels: players both registered and waitlisted')
+
+        # Confirmations sent together with cancellations of the same players: both must lock the tournament
+        # row before the registration, or each can end up waiting for the row the other holds
+        confirming = random.sample(sorted(after['registered']), min(args.confirms, len(after['registered'])))
+        leaving = set(confirming[:args.cancels])
+        cases = []
+        for steam_id in confirming:
+            cases.append(confirm_case(tournament_id, steam_id))
+            if steam_id in leaving:
+                cases.append(cancel_case(tournament_id, steam_id))
+
+        confirms = fire(client, cases, args.concurrency)
+        report('confirms', len(cases), confirms)
+        final = stored_state(dsn, tournament_id)
+        print(f"  stored     {len(final['registered'])} registered, {len(final['confirmed'])} confirmed "
+              f"(counter {final['confirmed_count']})")
+
+        failed = {outcome: count for outcome, count in confirms['outcomes'].items()
+                  if outcome not in ('http 200', 'http 404', 'cancelled')}
+        check(failures, not failed, f'confirms: requests failed {failed}')
+        check(failures, confirms['outcomes'].get('cancelled', 0) == len(leaving), 'confirms: not every cancel succeeded')
+        check(failures, final['confirmed'] == set(confirming) - leaving,
+              'confirms: confirmed players are not the ones that stayed')
+        check(failures, len(final['confirmed']) == final['confirmed_count'], 'confirms: confirmed_count drifted')
+        check(failures, len(final['registered']) == final['participants_count'] == args.seats,
+              'confirms: seats were over- or undersubscribed')
+
+        stale_phase(failures, client, dsn, tournament_id)
+    finally:
+        if not args.keep:
+            delete_tournament(dsn, tournament_id)
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if not failures:
+        print('OK: exactly the seats were filled, every cancellation promoted the head of the waitlist '
+              'and confirmations never deadlocked with cancellations')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+'''
+Business: Benchmark of the server-status write-back - the old UPDATE per server against save_server_statuses,
+          one UPDATE ... FROM (VALUES ...) that skips unchanged rows
+Args: --servers, --changed, --runs, --rtt; DATABASE_URL of a database with the migrations applied
+Returns: statements (round trips), rows written and wall time per strategy; the servers rows are created and
+         written inside one transaction that is rolled back, so the database is left as it was
+
+Usage:
+  DATABASE_URL=postgresql://... python tools/savebench.py --servers 500 --changed 0.1
+  DATABASE_URL=postgresql://... python tools/savebench.py --rtt 2     # add 2 ms network round trip per statement
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'server-status'))
+
+import sqlstats
+from index import save_server_statuses
+from loadtest import percentile
+
+SCHEMA = 't_p15345778_news_shop_project'
+
+Row = Tuple[int, str, int, Optional[int], Optional[str]]
+
+
+def save_row_by_row(cursor, rows: List[Row]) -> int:
+    '''The write-back as it was before batching: one UPDATE per polled server, changed or not.'''
+    for server_id, status, players, max_players, map_name in rows:
+        if status == 'online':
+            cursor.execute(f"""
+                UPDATE {SCHEMA}.servers
+                SET status = 'online',
+                    current_players = {int(players)},
+                    max_players = {int(max_players)},
+                    map = '{map_name.replace("'", "''")}',
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = {int(server_id)}
+            """)
+        else:
+            cursor.execute(f"""
+                UPDATE {SCHEMA}.servers
+                SET status = 'offline',
+                    current_players = 0,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = {int(server_id)}
+            """)
+    return len(rows)
+
+
+def create_servers(cursor, count: int) -> List[Row]:
+    '''Insert `count` online servers and return their current state as poll rows.'''
+    cursor.execute(f'''
+        INSERT INTO {SCHEMA}.servers (name, ip_address, port, game_type, map, max_players, current_players, status)
+        SELECT 'Bench ' || i, '10.0.' || (i / 250) || '.' || (i %% 250), 27015, 'cs2', 'de_dust2', 32, i %% 32, 'online'
+        FROM generate_series(1, %s) i
+        RETURNING id, current_players
+    ''', (count,))
+    return [(server_id, 'online', players, 32, 'de_dust2') for server_id, players in cursor.fetchall()]
+
+
+def poll_results(current: List[Row], changed: float, rng: random.Random) -> List[Row]:
+    '''Poll rows where a `changed` share of servers differ: player count moved, or went offline.'''
+    rows = []
+    for server_id, status, players, max_players, map_name in current:
+        if rng.random() >= changed:
+            rows.append((server_id, status, players, max_players, map_name))
+        elif rng.random() < 0.2:
+            rows.append((server_id, 'offline', 0, None, None))
+        else:
+            rows.append((server_id, 'online', (players + 1) % 32, max_players, map_name))
+    return rows
+
+
+def measure(conn, save, rows: List[Row], runs: int) -> Dict[str, Any]:
+    times: List[float] = []
+    for _ in range(runs):
+        with conn.cursor() as cur:
+            cur.execute('SAVEPOINT bench')
+            with sqlstats.track() as stats:
+                started = time.perf_counter()
+                written = save(cur, rows)
+                times.append(time.perf_counter() - started)
+            cur.execute('ROLLBACK TO SAVEPOINT bench')
+    times.sort()
+    return {'p50': percentile(times, 0.5), 'statements': stats.queries, 'written': written}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compare per-row and batched server status write-back')
+    parser.add_argument('--servers', type=int, default=500)
+    parser.add_argument('--changed', type=float, nargs='+', default=[0.1, 1.0],
+                        help='shares of servers whose status changed since the last poll')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--rtt', type=float, default=0.0,
+                        help='network round trip in ms added per statement to the reported time')
+    args = parser.parse_args()
+
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        sys.exit('DATABASE_URL is not set')
+
+    conn = sqlstats.connect(dsn)
+    rng = random.Random(0)
+    try:
+        with conn.cursor() as cur:
+            current = create_servers(cur, args.servers)
+
+        print(f'{"changed":>8}  {"strategy":<12} {"statements":>10} {"rows":>6} {"p50 ms":>8} {"with rtt":>9}')
+        for changed in args.changed:
+            rows = poll_results(current, changed, rng)
+            for name, save in (('row by row', save_row_by_row), ('batched', save_server_statuses)):
+                result = measure(conn, save, rows, args.runs)
+                p50 = result['p50'] * 1000
+                print(f"{changed:>8.0%}  {name:<12} {result['statements']:>10} {result['written']:>6} {p50:>8.2f} "
+                      f"{p50 + result['statements'] * args.rtt:>9.2f}")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+'''
+Business: Fill a development database with bulk data for benchmarks
+Args: subcommand (comments, chat, tournaments) and its sizes; DATABASE_URL from the environment
+Returns: prints what was inserted; pair with tools/loadtest.py to measure the affected endpoint
+
+Usage:
+  DATABASE_URL=postgresql://... python tools/seed.py comments --news-id 900 --comments 1000 --likes 20000
+  python tools/loadtest.py --functions comments --match "news_id=900"
+  DATABASE_URL=postgresql://... python tools/seed.py chat --messages 5000
+  DATABASE_URL=postgresql://... python tools/seed.py tournaments --tournaments 500 --registrations 512
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from counters import rebuild_comment_counters, rebuild_tournament_counters
+
+SCHEMA = 't_p15345778_news_shop_project'
+
+
+def seed_comments(cur, news_id: int, comments: int, likes: int, reply_share: float, users: int,
+                  reply_parents: int = 0) -> None:
+    '''Insert top-level comments, replies to random earlier comments and unique likes spread over them.'''
+    steam_ids = [str(76561198000000000 + i) for i in range(users)]
+
+    cur.execute(f'DELETE FROM {SCHEMA}.comment_likes WHERE comment_id IN (SELECT id FROM {SCHEMA}.comments WHERE news_id = %s)', (news_id,))
+    cur.execute(f'UPDATE {SCHEMA}.comments SET parent_comment_id = NULL WHERE news_id = %s', (news_id,))
+    cur.execute(f'DELETE FROM {SCHEMA}.comments WHERE news_id = %s', (news_id,))
+
+    roots = max(1, int(comments * (1 - reply_share)))
+    # Replies interleave with new top-level comments over the whole timeline, as in a live thread
+    ages = list(range(comments, 0, -1))
+    random.shuffle(ages)
+    ids = [row[0] for row in execute_values(cur, f'''
+        INSERT INTO {SCHEMA}.comments (news_id, author, text, steam_id, created_at)
+        VALUES %s RETURNING id
+    ''', [
+        (news_id, f'Player {i}', f'Seed comment {i}', random.choice(steam_ids), f'-{ages[i]} seconds')
+        for i in range(roots)
+    ], template="(%s, %s, %s, %s, now() + %s::interval)", page_size=1000, fetch=True)]
+    parents = ids[:reply_parents] if reply_parents else ids
+
+    replies = execute_values(cur, f'''
+        INSERT INTO {SCHEMA}.comments (news_id, author, text, steam_id, parent_comment_id, created_at)
+        VALUES %s RETURNING id
+    ''', [
+        (news_id, f'Player {i}', f'Seed reply {i}', random.choice(steam_ids), random.choice(parents), f'-{ages[i]} seconds')
+        for i in range(roots, comments)
+    ], template="(%s, %s, %s, %s, %s, now() + %s::interval)", page_size=1000, fetch=True) if comments > roots else []
+    ids += [row[0] for row in replies]
+
+    pairs = set()
+    limit = min(likes, len(ids) * len(steam_ids))
+    while len(pairs) < limit:
+        pairs.add((random.choice(ids), random.choice(steam_ids)))
+
+    execute_values(cur, f'INSERT INTO {SCHEMA}.comment_likes (comment_id, steam_id) VALUES %s', list(pairs), page_size=5000)
+    rebuild_comment_counters(cur, [news_id])
+
+    print(f'news {news_id}: {roots} comments, {len(ids) - roots} replies, {len(pairs)} likes from {users} users')
+
+
+def seed_chat(cur, messages: int, reply_share: float, hidden_share: float, users: int) -> None:
+    '''Append chat messages one second apart, some replying to an earlier message and some hidden.'''
+    steam_ids = [str(76561198000000000 + i) for i in range(users)]
+
+    cur.execute(f'SELECT COALESCE(MAX(id), 0) FROM {SCHEMA}.chat_messages')
+    first_id = cur.fetchone()[0] + 1
+
+    rows = []
+    for i in range(messages):
+        reply_to = first_id + random.randrange(i) if i and random.random() < reply_share else None
+        rows.append((
+            random.choice(steam_ids), f'Player {i}', f'Seed message {i}', reply_to,
+            random.random() < hidden_share, f'-{messages - i} seconds'
+        ))
+
+    execute_values(cur, f'''
+        INSERT INTO {SCHEMA}.chat_messages (id, steam_id, persona_name, message, reply_to_message_id, is_hidden, created_at)
+        VALUES %s
+    ''', [(first_id + i,) + row for i, row in enumerate(rows)],
+        template='(%s, %s, %s, %s, %s, %s, now() + %s::interval)', page_size=1000)
+    cur.execute(f"SELECT setval(pg_get_serial_sequence('{SCHEMA}.chat_messages', 'id'), %s)", (first_id + messages - 1,))
+
+    print(f'chat: {messages} messages from {users} users')
+
+
+def seed_tournaments(cur, tournaments: int, registrations: int, confirmed_share: float, users: int) -> None:
+    '''Replace earlier seed tournaments with new ones starting over the coming days, each with its registrations.'''
+    steam_ids = [str(76561198000000000 + i) for i in range(max(users, registrations))]
+
+    cur.execute(f"SELECT id FROM {SCHEMA}.tournaments WHERE name LIKE 'Seed tournament %%'")
+    old_ids = [row[0] for row in cur.fetchall()]
+    if old_ids:
+        cur.execute(f'DELETE FROM {SCHEMA}.tournament_brackets WHERE tournament_id = ANY(%s)', (old_ids,))
+        cur.execute(f'DELETE FROM {SCHEMA}.tournament_registrations WHERE tournament_id = ANY(%s)', (old_ids,))
+        cur.execute(f'DELETE FROM {SCHEMA}.tournament_waitlist WHERE tournament_id = ANY(%s)', (old_ids,))
+        cur.execute(f'DELETE FROM {SCHEMA}.tournaments WHERE id = ANY(%s)', (old_ids,))
+
+    ids = [row[0] for row in execute_values(cur, f'''
+        INSERT INTO {SCHEMA}.tournaments (name, description, prize_pool, max_participants, tournament_type, start_date, status, game)
+        VALUES %s
+        RETURNING id
+    ''', [(f'Seed tournament {i}', 'Seeded for benchmarks', 10000, registrations, 'solo', f'{i + 1} days', 'upcoming', 'CS2')
+          for i in range(tournaments)],
+        template='(%s, %s, %s, %s, %s, now() + %s::interval, %s, %s)', page_size=1000, fetch=True)]
+
+    rows = []
+    for tournament_id in ids:
+        for steam_id in random.sample(steam_ids, registrations):
+            rows.append((tournament_id, steam_id, f'Player {steam_id[-4:]}', random.random() < confirmed_share))
+    execute_values(cur, f'''
+        INSERT INTO {SCHEMA}.tournament_registrations (tournament_id, steam_id, persona_name, confirmed_at)
+        VALUES %s
+    ''', rows, template='(%s, %s, %s, CASE WHEN %s THEN now() END)', page_size=5000)
+    rebuild_tournament_counters(cur, ids)
+
+    print(f'tournaments: {tournaments} with {registrations} registrations each from {len(steam_ids)} users')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Seed bulk data for benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    comments = subparsers.add_parser('comments', help='comments, replies and likes for one news item')
+    comments.add_argument('--news-id', type=int, default=900)
+    comments.add_argument('--comments', type=int, default=1000)
+    comments.add_argument('--likes', type=int, default=20000)
+    comments.add_argument('--reply-share', type=float, default=0.3, help='fraction of comments that are replies')
+    comments.add_argument('--users', type=int, default=500, help='distinct steam ids commenting and liking')
+    comments.add_argument('--reply-parents', type=int, default=0, help='put all replies under this many comments (0: any)')
+
+    chat = subparsers.add_parser('chat', help='global chat messages with replies')
+    chat.add_argument('--messages', type=int, default=5000)
+    chat.add_argument('--reply-share', type=float, default=0.3, help='fraction of messages replying to an earlier one')
+    chat.add_argument('--hidden-share', type=float, default=0.02, help='fraction of messages hidden by moderators')
+    chat.add_argument('--users', type=int, default=200)
+
+    tournaments = subparsers.add_parser('tournaments', help='tournaments full of registrations')
+    tournaments.add_argument('--tournaments', type=int, default=500)
+    tournaments.add_argument('--registrations', type=int, default=512, help='registrations (and places) per tournament')
+    tournaments.add_argument('--confirmed-share', type=float, default=0.5, help='fraction of registrations confirmed')
+    tournaments.add_argument('--users', type=int, default=2000, help='distinct steam ids registering')
+
+    args = parser.parse_args()
+
+    db_url = os.environ.get('DATABASE_URL')
+    if not db_url:
+        sys.exit('DATABASE_URL is not set')
+
+    random.seed(0)
+    started = time.perf_counter()
+    conn = psycopg2.connect(db_url)
+    try:
+        with conn, conn.cursor() as cur:
+            if args.command == 'comments':
+                seed_comments(cur, args.news_id, args.comments, args.likes, args.reply_share, args.users,
+                              args.reply_parents)
+            elif args.command == 'chat':
+                seed_chat(cur, args.messages, args.reply_share, args.hidden_share, args.users)
+            elif args.command == 'tournaments':
+                seed_tournaments(cur, args.tournaments, args.registrations, args.confirmed_share, args.users)
+    finally:
+        conn.close()
+
+    print(f'done in {time.perf_counter() - started:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+'''
+Business: Per-request SQL statistics for backend handlers run in-process
+Args: install() patches psycopg2.connect; track() scopes the statements of one request
+Returns: RequestStats with statement count, database time, slowest statements and repeated statement shapes
+'''
+
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+_local = threading.local()
+_original_connect = psycopg2.connect
+_cursor_classes: Dict[type, type] = {}
+_connection_classes: Dict[type, type] = {}
+
+# A statement shape executed this many times in one request is reported as a likely N+1
+REPEAT_THRESHOLD = int(os.environ.get('SQLSTATS_REPEAT_THRESHOLD', '3'))
+SLOWEST_KEPT = int(os.environ.get('SQLSTATS_SLOWEST', '3'))
+
+_string_literal = re.compile(r"'(?:[^']|'')*'")
+_number_literal = re.compile(r'\b(?:\d+(?:\.\d+)?|NULL|TRUE|FALSE)\b', re.IGNORECASE)
+_value_list = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_row_list = re.compile(r'\(\?, \.\.\.\)(?:\s*,\s*\(\?, \.\.\.\))+')
+_whitespace = re.compile(r'\s+')
+
+
+def statement_shape(query: Any) -> str:
+    '''Strip literals and whitespace so the same statement with different values maps to one shape.'''
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    shape = _string_literal.sub('?', str(query))
+    shape = _number_literal.sub('?', shape)
+    shape = _value_list.sub('(?, ...)', shape)
+    shape = _row_list.sub('(?, ...)', shape)
+    return _whitespace.sub(' ', shape).strip()
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.shapes: Dict[str, int] = {}
+        self.slowest: List[Tuple[float, str]] = []
+
+    def record(self, query: Any, elapsed: float) -> None:
+        self.queries += 1
+        self.db_time += elapsed
+
+        shape = statement_shape(query)
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+        if len(self.slowest) < SLOWEST_KEPT or elapsed > self.slowest[-1][0]:
+            self.slowest.append((elapsed, shape))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[SLOWEST_KEPT:]
+
+    def repeated(self, threshold: int = REPEAT_THRESHOLD) -> List[Dict[str, Any]]:
+        return [
+            {'count': count, 'sql': shape}
+            for shape, count in sorted(self.shapes.items(), key=lambda item: -item[1])
+            if count >= threshold
+        ]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'queries': self.queries,
+            'dbTimeMs': round(self.db_time * 1000, 2),
+            'slowest': [{'ms': round(elapsed * 1000, 2), 'sql': shape} for elapsed, shape in self.slowest],
+            'repeated': self.repeated(),
+        }
+
+
+def current() -> Optional[RequestStats]:
+    return getattr(_local, 'stats', None)
+
+
+@contextmanager
+def track() -> Iterator[RequestStats]:
+    '''Collect every statement executed on this thread while the block runs.'''
+    previous = current()
+    stats = RequestStats()
+    _local.stats = stats
+    try:
+        yield stats
+    finally:
+        _local.stats = previous
+
+
+def instrumented_cursor(base: type) -> type:
+    if base not in _cursor_classes:
+        def execute(self, query, vars=None):
+            started = time.perf_counter()
+            try:
+                return base.execute(self, query, vars)
+            finally:
+                stats = current()
+                if stats is not None:
+                    stats.record(query, time.perf_counter() - started)
+
+        def executemany(self, query, vars_list):
+            started = time.perf_counter()
+            try:
+                return base.executemany(self, query, vars_list)
+            finally:
+                stats = current()
+                if stats is not None:
+                    stats.record(query, time.perf_counter() - started)
+
+        _cursor_classes[base] = type(f'Instrumented{base.__name__}', (base,), {
+            'execute': execute,
+            'executemany': executemany
+        })
+    return _cursor_classes[base]
+
+
+def instrumented_connection(base: type) -> type:
+    if base not in _connection_classes:
+        def cursor(self, *args, **kwargs):
+            factory = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+            kwargs['cursor_factory'] = instrumented_cursor(factory)
+            return base.cursor(self, *args, **kwargs)
+
+        _connection_classes[base] = type(f'Instrumented{base.__name__}', (base,), {'cursor': cursor})
+    return _connection_classes[base]
+
+
+def connect(dsn=None, connection_factory=None, cursor_factory=None, **kwargs):
+    factory = instrumented_connection(connection_factory or psycopg2.extensions.connection)
+    return _original_connect(dsn, connection_factory=factory, cursor_factory=cursor_factory, **kwargs)
+
+
+def install() -> None:
+    '''Route every new psycopg2 connection through the instrumented classes.'''
+    psycopg2.connect = connect
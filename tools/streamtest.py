@@ -0,0 +1,181 @@
+'''
+Business: Load test of the chat stream - many SSE subscribers on a running gateway while messages are posted
+Args: --url, --subscribers, --messages, --interval; DATABASE_URL (optional) to count server connections
+Returns: deliveries received, post-to-delivery latency p50/p95/p99/max and database connections in use;
+         exit code 1 when a subscriber missed a message
+
+Usage:
+  DATABASE_URL=postgresql://... python tools/gateway.py --quiet --functions chat &
+  DATABASE_URL=postgresql://... python tools/streamtest.py --subscribers 1000 --messages 50
+'''
+
+import argparse
+import json
+import os
+import selectors
+import socket
+import sys
+import threading
+import time
+import urllib.request
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import percentile
+
+
+def count_connections(dsn: Optional[str]) -> Optional[int]:
+    '''Backends connected to this database, not counting the one asking.'''
+    if not dsn:
+        return None
+    import psycopg2
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute('''
+                SELECT COUNT(*) FROM pg_stat_activity
+                WHERE datname = current_database() AND pid <> pg_backend_pid() AND backend_type = 'client backend'
+            ''')
+            return cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+class Subscribers:
+    '''Holds every SSE connection in one selector thread and timestamps each message id as it arrives.'''
+
+    def __init__(self, host: str, port: int, path: str, count: int):
+        self.selector = selectors.DefaultSelector()
+        self.buffers: Dict[int, bytes] = {}
+        self.received: Dict[int, Dict[int, float]] = {}
+        self.lock = threading.Lock()
+        self.answered = set()
+        self.closed = 0
+        self.running = True
+
+        request = f'GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nAccept: text/event-stream\r\n\r\n'.encode()
+        for _ in range(count):
+            sock = socket.create_connection((host, port))
+            sock.sendall(request)
+            sock.setblocking(False)
+            self.buffers[sock.fileno()] = b''
+            self.selector.register(sock, selectors.EVENT_READ)
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        while self.running:
+            for key, _ in self.selector.select(timeout=0.2):
+                sock = key.fileobj
+                try:
+                    data = sock.recv(65536)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    data = b''
+                if not data:
+                    self.selector.unregister(sock)
+                    sock.close()
+                    self.closed += 1
+                    continue
+                now = time.perf_counter()
+                self.answered.add(key.fd)
+                events = (self.buffers[key.fd] + data).split(b'\n\n')
+                self.buffers[key.fd] = events.pop()
+                for event in events:
+                    for line in event.split(b'\n'):
+                        if not line.startswith(b'data: '):
+                            continue
+                        delta = json.loads(line[6:])
+                        with self.lock:
+                            for message in delta.get('messages', []):
+                                self.received.setdefault(message['id'], {}).setdefault(key.fd, now)
+
+    def ready(self, timeout: float) -> bool:
+        '''Wait until every connection got its response headers, i.e. the gateway handed it to the hub.'''
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if len(self.answered) == len(self.buffers):
+                return True
+            time.sleep(0.05)
+        return False
+
+    def close(self) -> None:
+        self.running = False
+        self.thread.join()
+        for key in list(self.selector.get_map().values()):
+            key.fileobj.close()
+
+
+def post(base_url: str, steam_id: str, text: str) -> int:
+    request = urllib.request.Request(
+        f'{base_url}/chat/',
+        data=json.dumps({'steam_id': steam_id, 'persona_name': 'Stream test', 'message': text}).encode(),
+        method='POST',
+        headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())['id']
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure chat stream fan-out with many subscribers')
+    parser.add_argument('--url', default='http://127.0.0.1:8000', help='base URL of a running tools/gateway.py')
+    parser.add_argument('--subscribers', type=int, default=1000)
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--interval', type=float, default=0.1, help='seconds between posted messages')
+    parser.add_argument('--steam-id', default='76561198999999999', help='author of the posted messages')
+    parser.add_argument('--settle', type=float, default=5.0, help='seconds to wait for the last deliveries')
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    dsn = os.environ.get('DATABASE_URL')
+    connections_idle = count_connections(dsn)
+
+    started = time.perf_counter()
+    subscribers = Subscribers(url.hostname, url.port or 80, '/chat/stream', args.subscribers)
+    if not subscribers.ready(30):
+        print(f'only {len(subscribers.answered)} of {args.subscribers} subscribers got a response')
+    connect_time = time.perf_counter() - started
+    connections_subscribed = count_connections(dsn)
+
+    sent_at: Dict[int, float] = {}
+    connections_busy = None
+    for i in range(args.messages):
+        before = time.perf_counter()
+        message_id = post(args.url.rstrip('/'), args.steam_id, f'stream test {i}')
+        sent_at[message_id] = before
+        if i == args.messages // 2:
+            connections_busy = count_connections(dsn)
+        time.sleep(args.interval)
+
+    deadline = time.monotonic() + args.settle
+    expected = len(sent_at) * args.subscribers
+    while time.monotonic() < deadline:
+        with subscribers.lock:
+            if sum(len(subscribers.received.get(message_id, {})) for message_id in sent_at) >= expected:
+                break
+        time.sleep(0.05)
+    subscribers.close()
+
+    latencies: List[float] = []
+    with subscribers.lock:
+        for message_id, before in sent_at.items():
+            latencies.extend((at - before) * 1000 for at in subscribers.received.get(message_id, {}).values())
+    latencies.sort()
+
+    print(f'subscribers  {args.subscribers} connected in {connect_time:.1f} s, {subscribers.closed} disconnected')
+    print(f'deliveries   {len(latencies)} / {expected} ({len(sent_at)} messages)')
+    print(f'latency ms   p50 {percentile(latencies, 0.5):.1f}  p95 {percentile(latencies, 0.95):.1f}  '
+          f'p99 {percentile(latencies, 0.99):.1f}  max {latencies[-1] if latencies else 0:.1f}')
+    if dsn:
+        print(f'db conns     idle {connections_idle}, subscribed {connections_subscribed}, posting {connections_busy}')
+
+    sys.exit(0 if len(latencies) == expected else 1)
+
+
+if __name__ == '__main__':
+    main()